@@ -1,10 +1,14 @@
-import openai
-from openai import OpenAI
 import asyncio
 from typing import List, Dict, Any, Generator, AsyncGenerator
 import os
+import sys
 from dotenv import load_dotenv
 
+# 统一的大模型客户端位于 AI文章智能总结 目录
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI文章智能总结'))
+
+from llm_client import LLMRequestError, get_llm_client
+
 # 加载环境变量
 load_dotenv()
     
@@ -14,14 +18,9 @@ class DeepSeekClient:
         if api_key is None:
             api_key = os.environ.get('DEEPSEEK_API_KEY')
 
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url="https://api.deepseek.com"
-        )
-        self.async_client = openai.AsyncOpenAI(
-            api_key=api_key,
-            base_url="https://api.deepseek.com"
-        )
+        # 共享连接池的客户端，接口与 openai SDK 的 client.chat.completions.create 一致
+        self.client = get_llm_client("https://api.deepseek.com", api_key)
+        self.async_client = self.client.aio
 
     def chat_completion(self, messages: List[Dict], model: str = "deepseek-chat"):
         """同步聊天完成"""
@@ -47,13 +46,19 @@ class DeepSeekClient:
                 "finish_reason": response.choices[0].finish_reason
             }
 
-        except openai.RateLimitError as e:
-            return {"error": "rate_limit", "message": str(e)}
-        except openai.AuthenticationError as e:
-            return {"error": "auth", "message": str(e)}
+        except LLMRequestError as e:
+            if e.status_code == 429:
+                return {"error": "rate_limit", "message": str(e)}
+            if e.status_code in (401, 403):
+                return {"error": "auth", "message": str(e)}
+            return {"error": "general", "message": str(e)}
         except Exception as e:
             return {"error": "general", "message": str(e)}
 
+    async def aclose(self):
+        """关闭当前事件循环的异步连接池，在 asyncio.run() 的协程结束前调用"""
+        await self.client.aclose()
+
     async def async_chat_completion(self, messages: List[Dict], model: str = "deepseek-chat"):
         """异步聊天完成"""
         try:
@@ -226,6 +231,7 @@ async def async_example():
     
     # 等待所有请求完成
     results = await asyncio.gather(*tasks)
+    await client.aclose()
     
     print(f"总耗时：{time.time() - start:.1f} 秒")
     return results
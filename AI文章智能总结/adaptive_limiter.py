@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应并发控制（AIMD）
+按接口的真实承载能力调整并发数：请求成功且延迟正常时缓慢加性增加，
+遇到 429/5xx/网络错误或 P95 延迟明显升高时乘性减小。
+同时支持多线程（acquire/release）和 asyncio（acquire_async）。
+"""
+
+import asyncio
+import collections
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Optional
+
+
+def is_overload_status(status: Optional[int]) -> bool:
+    """429、5xx 和网络错误（status为None）视为过载信号"""
+    return status is None or status == 429 or status >= 500
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD自适应并发限制器"""
+
+    def __init__(self, initial: int = 2, min_limit: int = 1, max_limit: int = 32,
+                 decrease_factor: float = 0.5, latency_window: int = 50,
+                 latency_ratio: float = 2.0, baseline_alpha: float = 0.2, cooldown: float = 2.0):
+        """
+        初始化限制器
+
+        Args:
+            initial: 初始并发数
+            min_limit: 并发数下限
+            max_limit: 并发数上限
+            decrease_factor: 过载时并发数乘以该系数
+            latency_window: 每个统计窗口的请求数，窗口满后计算一次P95
+            latency_ratio: 窗口P95超过基线P95的多少倍视为延迟升高
+            baseline_alpha: 基线P95的指数加权系数，基线随接口延迟的正常变化上下浮动
+            cooldown: 两次减小之间的最短间隔（秒），避免同一波失败把并发连续减到底
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_ratio = latency_ratio
+        self.baseline_alpha = baseline_alpha
+        self.cooldown = cooldown
+        self.logger = logging.getLogger(__name__)
+
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._latencies: Deque[float] = collections.deque(maxlen=latency_window)
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._async_waiters: Deque = collections.deque()
+        self.stats = {'successes': 0, 'overloads': 0, 'increases': 0, 'decreases': 0}
+
+    @property
+    def limit(self) -> int:
+        """当前允许的并发数"""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self):
+        """阻塞等待一个并发名额（多线程）"""
+        with self._cond:
+            while self._in_flight >= int(self._limit) or self._async_waiters:
+                self._cond.wait()
+            self._in_flight += 1
+
+    async def acquire_async(self):
+        """等待一个并发名额（asyncio）"""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._in_flight < int(self._limit) and not self._async_waiters:
+                self._in_flight += 1
+                return
+            future = loop.create_future()
+            self._async_waiters.append((loop, future))
+        try:
+            # 被唤醒时名额已经在 _wake_waiters 中计入
+            await future
+        except asyncio.CancelledError:
+            with self._cond:
+                if future.done() and not future.cancelled():
+                    self._in_flight -= 1
+                    self._wake_waiters()
+                else:
+                    try:
+                        self._async_waiters.remove((loop, future))
+                    except ValueError:
+                        pass
+            raise
+
+    def release(self, latency: Optional[float] = None, status: Optional[int] = 200):
+        """
+        归还名额并根据结果调整并发数
+
+        Args:
+            latency: 本次请求延迟（秒），None表示不计入延迟统计
+            status: HTTP状态码，None表示网络错误
+        """
+        with self._cond:
+            self._in_flight -= 1
+            if is_overload_status(status):
+                self.stats['overloads'] += 1
+                self._decrease(f"状态码 {status}" if status else "网络错误")
+            elif 200 <= status < 300:
+                self.stats['successes'] += 1
+                if latency is not None:
+                    self._latencies.append(latency)
+                if self._latency_degraded():
+                    self._decrease("P95延迟升高")
+                else:
+                    self._increase()
+            self._wake_waiters()
+
+    def _latency_degraded(self) -> bool:
+        """
+        窗口填满后比较窗口P95与基线P95，然后清空窗口
+
+        基线是各窗口P95的指数加权平均：大模型延迟本身长尾（P95常是中位数的2倍以上），
+        与P95比较才不会在正常波动时误判；基线可以回升，延迟整体变化后不会一直判为升高
+        """
+        if len(self._latencies) < self._latencies.maxlen:
+            return False
+        ordered = sorted(self._latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self._latencies.clear()
+        if self._baseline is None:
+            self._baseline = p95
+            return False
+        degraded = p95 > self._baseline * self.latency_ratio
+        self._baseline += self.baseline_alpha * (p95 - self._baseline)
+        return degraded
+
+    def _increase(self):
+        # 加性增加：每个成功请求增加 1/limit，大约每轮满并发 +1
+        old = int(self._limit)
+        self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+        if int(self._limit) > old:
+            self.stats['increases'] += 1
+            self.logger.debug(f"并发数增加到 {int(self._limit)}")
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+        self._latencies.clear()
+        self.stats['decreases'] += 1
+        self.logger.info(f"{reason}，并发数减小到 {int(self._limit)}")
+
+    def _wake_waiters(self):
+        """在持有锁时调用：把空出的名额优先分给异步等待者，再唤醒线程等待者"""
+        while self._async_waiters and self._in_flight < int(self._limit):
+            loop, future = self._async_waiters.popleft()
+            if future.done():
+                continue
+            self._in_flight += 1
+            loop.call_soon_threadsafe(self._resolve, future)
+        self._cond.notify_all()
+
+    @staticmethod
+    def _resolve(future):
+        if not future.done():
+            future.set_result(None)
+
+    @contextmanager
+    def slot(self):
+        """
+        多线程用法：
+
+            with limiter.slot() as outcome:
+                response = ...
+                outcome['status'] = response.status_code
+
+        outcome 中未设置 status 且代码块抛出异常时按网络错误处理
+        """
+        self.acquire()
+        outcome = {'status': None}
+        started = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            self.release(outcome.get('latency', time.perf_counter() - started), outcome['status'])
+
+    @asynccontextmanager
+    async def aslot(self):
+        """asyncio用法，与 slot() 相同"""
+        await self.acquire_async()
+        outcome = {'status': None}
+        started = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            self.release(outcome.get('latency', time.perf_counter() - started), outcome['status'])
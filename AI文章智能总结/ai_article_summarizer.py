@@ -5,28 +5,41 @@ AI文章智能总结系统
 集成美团Friday大模型，对爬取的AI文章进行智能总结和关键信息提取
 """
 
-import requests
 import json
 import time
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import os
 import sys
 
 # 添加爬虫模块路径
 sys.path.append('../爬取AI咨询')
 
+from llm_cache import LLMCache
+from llm_call import cached_chat
+from llm_stream import StreamMetrics
+from llm_client import get_llm_client
+from checkpoint import JSONLCheckpoint, default_checkpoint_path, prompt_hash
+
+# 提示词模板版本号，修改 create_summary_prompt 的模板后需要提升，使旧的缓存结果失效
+PROMPT_TEMPLATE_VERSION = "article-summary-v1"
+
 class FridayAIClient:
     """美团Friday大模型客户端"""
 
-    def __init__(self, app_id: str):
+    def __init__(self, app_id: str, llm_cache: Optional[LLMCache] = None):
         self.app_id = app_id
         self.base_url = "https://aigc.sankuai.com/v1/openai/native/chat/completions"
         self.headers = {
             'Authorization': f'Bearer {app_id}',
             'Content-Type': 'application/json'
         }
+        # 同一端点共用连接池（HTTP keep-alive），重试和指标由客户端统一处理
+        self.llm_client = get_llm_client(self.base_url, app_id, timeout=30)
+        self.llm_cache = llm_cache
+        # 最近一次流式调用的延迟指标
+        self.last_stream_metrics: Optional[StreamMetrics] = None
 
         # 设置日志
         logging.basicConfig(
@@ -81,49 +94,25 @@ class FridayAIClient:
 
         return prompt
 
-    def call_friday_api(self, prompt: str, max_retries: int = 3) -> Optional[str]:
-        """调用Friday API获取总结"""
-        payload = {
-            "model": "LongCat-Large-32K-Chat",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "stream": False,  # 设置为False以获取完整响应
-            "temperature": 0.7,
-            "max_tokens": 1000
-        }
-
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30
-                )
-
-                if response.status_code == 200:
-                    result = response.json()
-                    if 'choices' in result and len(result['choices']) > 0:
-                        content = result['choices'][0]['message']['content']
-                        return content.strip()
-                    else:
-                        self.logger.warning(f"API响应格式异常: {result}")
-                        return None
-                else:
-                    self.logger.warning(f"API调用失败 (状态码: {response.status_code}): {response.text}")
-
-            except requests.RequestException as e:
-                self.logger.warning(f"API调用异常 (尝试 {attempt + 1}/{max_retries}): {e}")
-
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # 指数退避
-
-        self.logger.error("API调用最终失败")
-        return None
+    def call_friday_api(self, prompt: str, max_retries: int = 3, stream: bool = False,
+                        on_token: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """
+        调用Friday API获取总结
+
+        Args:
+            prompt: 提示词
+            max_retries: 最大重试次数
+            stream: 是否使用流式输出，首字延迟等指标保存在 last_stream_metrics
+            on_token: 流式输出时每收到一段内容调用一次（缓存命中时以完整结果调用一次）
+        """
+        content, metrics = cached_chat(
+            self.llm_client, prompt, "LongCat-Large-32K-Chat", PROMPT_TEMPLATE_VERSION,
+            temperature=0.7, max_tokens=1000, llm_cache=self.llm_cache,
+            max_retries=max_retries, stream=stream, on_token=on_token
+        )
+        if metrics is not None:
+            self.last_stream_metrics = metrics
+        return content
 
     def summarize_article(self, article_data: Dict) -> Dict:
         """对单篇文章进行总结"""
@@ -145,8 +134,8 @@ class FridayAIClient:
 class ArticleSummarizer:
     """文章总结器主类"""
 
-    def __init__(self, app_id: str):
-        self.friday_client = FridayAIClient(app_id)
+    def __init__(self, app_id: str, llm_cache: Optional[LLMCache] = None):
+        self.friday_client = FridayAIClient(app_id, llm_cache)
         self.logger = logging.getLogger(__name__)
 
     def load_articles_from_json(self, json_file: str) -> List[Dict]:
@@ -160,8 +149,13 @@ class ArticleSummarizer:
             self.logger.error(f"加载文章数据失败: {e}")
             return []
 
-    def summarize_articles(self, articles: List[Dict], batch_size: int = 5, delay: float = 2.0) -> List[Dict]:
-        """批量总结文章"""
+    def summarize_articles(self, articles: List[Dict], batch_size: int = 5, delay: float = 2.0,
+                           checkpoint: Optional[JSONLCheckpoint] = None) -> List[Dict]:
+        """
+        批量总结文章
+
+        传入checkpoint时，URL和提示词哈希已在检查点中的文章直接复用结果，新完成的成功结果立即追加写入
+        """
         summarized_articles = []
         total = len(articles)
 
@@ -169,11 +163,22 @@ class ArticleSummarizer:
 
         for i, article in enumerate(articles, 1):
             try:
+                url = article.get('url', '')
+                hash_value = prompt_hash(PROMPT_TEMPLATE_VERSION + self.friday_client.create_summary_prompt(article))
+                if checkpoint is not None:
+                    done = checkpoint.get(url, hash_value)
+                    if done is not None:
+                        self.logger.info(f"处理进度: {i}/{total}（检查点中已完成，跳过）")
+                        summarized_articles.append(done)
+                        continue
+
                 self.logger.info(f"处理进度: {i}/{total}")
 
                 # 总结文章
                 summarized_article = self.friday_client.summarize_article(article)
                 summarized_articles.append(summarized_article)
+                if checkpoint is not None and summarized_article['ai_summary'] != "总结生成失败":
+                    checkpoint.append(url, hash_value, summarized_article)
 
                 # 批次延迟
                 if i % batch_size == 0 and i < total:
@@ -258,8 +263,13 @@ class ArticleSummarizer:
         except Exception as e:
             self.logger.error(f"生成报告失败: {e}")
 
-    def run(self, input_file: str, batch_size: int = 5, delay: float = 2.0):
-        """运行总结流程"""
+    def run(self, input_file: str, batch_size: int = 5, delay: float = 2.0, checkpoint_file: Optional[str] = None):
+        """
+        运行总结流程
+
+        每篇文章完成后立即写入JSONL检查点（默认根据输入文件名生成），
+        中断后重新运行会跳过检查点中已完成的文章。
+        """
         # 加载文章数据
         articles = self.load_articles_from_json(input_file)
         if not articles:
@@ -267,7 +277,11 @@ class ArticleSummarizer:
             return
 
         # 总结文章
-        summarized_articles = self.summarize_articles(articles, batch_size, delay)
+        checkpoint = JSONLCheckpoint(checkpoint_file or default_checkpoint_path(input_file, 'summary'))
+        try:
+            summarized_articles = self.summarize_articles(articles, batch_size, delay, checkpoint)
+        finally:
+            checkpoint.close()
 
         # 保存结果
         self.save_summarized_articles(summarized_articles)
@@ -285,6 +299,8 @@ def main():
     
     BATCH_SIZE = 3  # 批处理大小
     DELAY = 3.0  # 批次间延迟（秒）
+    USE_LLM_CACHE = "--no-cache" not in sys.argv     # --no-cache: 不使用大模型响应缓存
+    REFRESH_LLM_CACHE = "--refresh" in sys.argv      # --refresh: 忽略已有缓存，重新生成并覆盖
 
     try:
         # 检查输入文件是否存在
@@ -294,7 +310,8 @@ def main():
             return
 
         # 创建总结器
-        summarizer = ArticleSummarizer(APP_ID)
+        llm_cache = LLMCache(refresh=REFRESH_LLM_CACHE) if USE_LLM_CACHE else None
+        summarizer = ArticleSummarizer(APP_ID, llm_cache=llm_cache)
 
         # 运行总结
         print("🚀 开始AI文章智能总结...")
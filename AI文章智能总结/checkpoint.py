@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量总结断点续跑
+每完成一篇文章就把结果追加写入JSONL检查点文件，按条数/时间间隔批量fsync；
+重新运行时跳过 URL 和提示词哈希都已在检查点中的文章。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+def prompt_hash(text: str) -> str:
+    """计算提示词（或提示词输入）的哈希"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def default_checkpoint_path(input_file: str, suffix: str) -> str:
+    """根据输入文件名生成检查点文件名（位于当前目录）"""
+    name = os.path.splitext(os.path.basename(input_file))[0]
+    return f'{name}_{suffix}_checkpoint.jsonl'
+
+
+class JSONLCheckpoint:
+    """追加写入的JSONL检查点"""
+
+    def __init__(self, path: str, fsync_every: int = 10, fsync_interval: float = 5.0):
+        """
+        初始化检查点
+
+        Args:
+            path: 检查点文件路径，已存在时加载其中的结果
+            fsync_every: 每写入多少条结果fsync一次
+            fsync_interval: 距上次fsync超过多少秒时立即fsync
+        """
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.logger = logging.getLogger(__name__)
+        self.results: Dict[Tuple[str, str], Dict] = {}
+
+        self._load()
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _load(self):
+        """加载已有检查点；中断时写了一半的最后一行会被截掉，之后追加的记录从新的一行开始"""
+        if not os.path.exists(self.path):
+            return
+        complete_end = 0
+        with open(self.path, 'rb') as f:
+            for line_no, raw in enumerate(f, 1):
+                if not raw.endswith(b'\n'):
+                    self.logger.warning(f"截掉检查点中未写完的第 {line_no} 行")
+                    break
+                complete_end += len(raw)
+                line = raw.decode('utf-8', errors='replace').strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    self.logger.warning(f"跳过检查点中损坏的第 {line_no} 行")
+                    continue
+                self.results[(record['url'], record['prompt_hash'])] = record['result']
+        if complete_end < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(complete_end)
+        self.logger.info(f"从检查点 {self.path} 恢复 {len(self.results)} 条结果")
+
+    def get(self, url: str, hash_value: str) -> Optional[Dict]:
+        """查询已完成的结果"""
+        return self.results.get((url, hash_value))
+
+    def append(self, url: str, hash_value: str, result: Dict):
+        """追加一条已完成的结果"""
+        line = json.dumps({'url': url, 'prompt_hash': hash_value, 'result': result}, ensure_ascii=False)
+        with self._lock:
+            self.results[(url, hash_value)] = result
+            self._file.write(line + '\n')
+            self._pending += 1
+            if (self._pending >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """写入剩余结果并关闭文件"""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
@@ -25,7 +25,12 @@ PROCESS_CONFIG = {
     "batch_size": 3,  # 批处理大小（建议3-5）
     "delay": 3.0,     # 批次间延迟（秒）
     "base_delay": 0.5,  # 基础延迟（秒）
-    "max_retries": 3   # 最大重试次数
+    "max_retries": 3,  # 最大重试次数
+    # 智能总结流水线（smart_summarizer.py）
+    "requests_per_minute": 20,  # Friday接口每分钟请求预算
+    "fetch_workers": 4,         # 下载网页线程数
+    "extract_workers": 2,       # 提取正文线程数
+    "llm_workers": 8            # 大模型调用线程数上限（实际并发由自适应限制器调整）
 }
 
 # 日志配置
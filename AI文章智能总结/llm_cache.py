@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型响应缓存
+以 模型 + 提示词模板版本 + 温度 + 规范化后的提示词 的哈希为键，
+把模型输出保存在SQLite中，同一篇文章重复总结时直接返回上次的结果。
+支持按总大小的LRU淘汰，修改提示词模板时提升模板版本号即可让旧缓存失效。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+DEFAULT_LLM_CACHE_PATH = os.environ.get(
+    'LLM_RESPONSE_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'myworkspace', 'llm_cache.db')
+)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """规范化提示词：统一Unicode形式和换行符，去掉行尾空白和首尾空行"""
+    prompt = unicodedata.normalize('NFC', prompt).replace('\r\n', '\n').replace('\r', '\n')
+    return '\n'.join(line.rstrip() for line in prompt.split('\n')).strip()
+
+
+def make_cache_key(model: str, prompt: str, template_version: str = '', temperature: Optional[float] = None,
+                   **params) -> str:
+    """
+    计算缓存键
+
+    Args:
+        model: 模型名称
+        prompt: 提示词（会先规范化）
+        template_version: 提示词模板版本号
+        temperature: 采样温度
+        **params: 其它会影响输出的参数（如 max_tokens、system 提示词）
+    """
+    payload = {
+        'model': model,
+        'template_version': template_version,
+        'temperature': temperature,
+        'params': params,
+        'prompt': normalize_prompt(prompt),
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """基于SQLite的大模型响应缓存"""
+
+    def __init__(self, db_path: str = DEFAULT_LLM_CACHE_PATH, max_size_bytes: int = 100 * 1024 * 1024,
+                 refresh: bool = False):
+        """
+        初始化响应缓存
+
+        Args:
+            db_path: SQLite缓存文件路径（默认可通过环境变量 LLM_RESPONSE_CACHE 指定）
+            max_size_bytes: 响应文本的总大小上限，超出时按最近访问时间淘汰
+            refresh: 为True时不读取缓存，但仍写入新结果（用于强制刷新）
+        """
+        self.db_path = db_path
+        self.max_size_bytes = max_size_bytes
+        self.refresh = refresh
+        self.logger = logging.getLogger(__name__)
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_access ON responses(last_access)")
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存；refresh模式下总是未命中"""
+        if self.refresh:
+            self.stats['misses'] += 1
+            return None
+        with self._lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+        self.stats['hits'] += 1
+        return row['response']
+
+    def set(self, key: str, response: str, model: str = ''):
+        """保存模型输出；空结果不缓存"""
+        if not response:
+            return
+        now = time.time()
+        with self._lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, model, response, len(response.encode('utf-8')), now, now))
+            self.conn.commit()
+        self.stats['stores'] += 1
+        self.evict()
+
+    def total_size(self) -> int:
+        """缓存中响应文本的总字节数"""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def count(self) -> int:
+        """缓存条目数"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def evict(self):
+        """按最近访问时间淘汰条目，直到总大小不超过上限"""
+        if not self.max_size_bytes:
+            return
+        with self._lock:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_size_bytes:
+                return
+            victims = []
+            for row in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+                if total <= self.max_size_bytes:
+                    break
+                victims.append((row['key'],))
+                total -= row['size']
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            self.conn.commit()
+        self.stats['evictions'] += len(victims)
+        self.logger.info(f"大模型响应缓存淘汰 {len(victims)} 个条目")
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+带响应缓存的大模型调用
+两个总结器的 FridayAIClient 共用：先查响应缓存，未命中时（可选限速后）以普通或SSE流式方式调用，
+成功后写回缓存。
+"""
+
+import logging
+from typing import Callable, Optional, Tuple
+
+from llm_cache import LLMCache, make_cache_key
+from llm_client import LLMClient, LLMRequestError, message_content
+from llm_stream import StreamMetrics, consume_stream
+
+logger = logging.getLogger(__name__)
+
+
+def stream_chat(llm_client: LLMClient, prompt: str, model: str, metrics: StreamMetrics,
+                on_token: Optional[Callable[[str], None]] = None, max_retries: int = 3, **params) -> str:
+    """以SSE流式方式调用，逐段回调，延迟指标记录在 metrics 中"""
+    chunks = llm_client.stream_complete([{"role": "user", "content": prompt}], model,
+                                        metrics=metrics, max_retries=max_retries, **params)
+    content = consume_stream(chunks, on_token).strip()
+    logger.info(f"流式输出完成: {metrics.summary()}")
+    return content
+
+
+def cached_chat(llm_client: LLMClient, prompt: str, model: str, template_version: str,
+                temperature: float, max_tokens: int, llm_cache: Optional[LLMCache] = None,
+                rate_limiter=None, max_retries: int = 3, stream: bool = False,
+                on_token: Optional[Callable[[str], None]] = None) -> Tuple[Optional[str], Optional[StreamMetrics]]:
+    """
+    调用大模型获取回复，失败或回复为空时返回 None
+
+    Args:
+        llm_client: 统一的大模型客户端
+        prompt: 提示词（作为单条user消息发送）
+        model: 模型名称
+        template_version: 提示词模板版本号，参与缓存键
+        temperature: 采样温度
+        max_tokens: 最大生成token数
+        llm_cache: 响应缓存，None表示不使用
+        rate_limiter: 可选的限速器（TokenBucket），只对真正发出的请求限速，缓存命中不消耗配额
+        max_retries: 最大尝试次数
+        stream: 是否使用流式输出
+        on_token: 流式输出时每收到一段内容调用一次（缓存命中时以完整结果调用一次）
+
+    Returns:
+        (回复内容, 流式调用的延迟指标)；非流式调用或缓存命中时指标为 None
+    """
+    cache_key = None
+    if llm_cache is not None:
+        cache_key = make_cache_key(model, prompt, template_version, temperature, max_tokens=max_tokens)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            logger.info("大模型响应缓存命中")
+            if stream and on_token:
+                on_token(cached)
+            return cached, None
+
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+
+    metrics = StreamMetrics(model) if stream else None
+    try:
+        if stream:
+            content = stream_chat(llm_client, prompt, model, metrics, on_token, max_retries,
+                                  temperature=temperature, max_tokens=max_tokens)
+        else:
+            result = llm_client.complete([{"role": "user", "content": prompt}], model, max_retries=max_retries,
+                                         temperature=temperature, max_tokens=max_tokens)
+            content = (message_content(result) or '').strip()
+    except LLMRequestError as e:
+        logger.error(f"API调用最终失败: {e}")
+        return None, metrics
+
+    if not content:
+        logger.warning("API响应内容为空")
+        return None, metrics
+    if cache_key is not None:
+        llm_cache.set(cache_key, content, model)
+    return content, metrics
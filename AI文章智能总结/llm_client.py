@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统一的大模型客户端
+基于 httpx 连接池（安装了 h2 时启用HTTP/2）调用OpenAI兼容的 /chat/completions 接口，
+同一端点的所有调用方共用连接并受同一个连接数上限约束；
+失败时按抖动指数退避重试并遵守 Retry-After，记录每次请求的延迟和token用量。
+
+除了 complete()/acomplete()/stream_complete() 外，还提供与 openai SDK 相同形状的
+client.chat.completions.create(...)，注入openai客户端的代码（如DataFrameTranslator）可以直接替换。
+"""
+
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+
+from llm_stream import StreamMetrics, parse_chat_deltas
+from adaptive_limiter import AdaptiveConcurrencyLimiter
+
+try:
+    import h2  # noqa: F401
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+# 可以重试的HTTP状态码
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMRequestError(Exception):
+    """大模型接口调用失败（重试耗尽或不可重试的错误）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, body: str = ''):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class AttrDict(dict):
+    """支持属性访问的字典，用于模拟openai SDK的响应对象"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @classmethod
+    def wrap(cls, value):
+        if isinstance(value, dict):
+            return cls({k: cls.wrap(v) for k, v in value.items()})
+        if isinstance(value, list):
+            return [cls.wrap(v) for v in value]
+        return value
+
+
+class LLMMetrics:
+    """请求级指标：延迟、尝试次数、状态码、token用量"""
+
+    def __init__(self, max_records: int = 10000):
+        self.max_records = max_records
+        self.records: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, **fields):
+        with self._lock:
+            self.records.append(fields)
+            if len(self.records) > self.max_records:
+                del self.records[:len(self.records) - self.max_records]
+
+    def summary(self) -> Dict:
+        """按 端点+模型 汇总请求数、失败数、平均/P95延迟和token用量"""
+        with self._lock:
+            records = list(self.records)
+        groups: Dict[str, Dict] = {}
+        for r in records:
+            key = f"{r['endpoint']}|{r['model']}"
+            g = groups.setdefault(key, {'endpoint': r['endpoint'], 'model': r['model'], 'requests': 0,
+                                        'errors': 0, 'retries': 0, 'latencies': [],
+                                        'prompt_tokens': 0, 'completion_tokens': 0})
+            g['requests'] += 1
+            g['errors'] += 0 if r['ok'] else 1
+            g['retries'] += r['attempts'] - 1
+            g['latencies'].append(r['latency'])
+            g['prompt_tokens'] += r.get('prompt_tokens') or 0
+            g['completion_tokens'] += r.get('completion_tokens') or 0
+
+        result = {}
+        for key, g in groups.items():
+            latencies = sorted(g.pop('latencies'))
+            g['avg_latency'] = round(sum(latencies) / len(latencies), 3)
+            g['p95_latency'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+            result[key] = g
+        return result
+
+    def export_json(self, path: str):
+        """导出汇总和明细到JSON文件"""
+        with self._lock:
+            records = list(self.records)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.summary(), 'records': records}, f, ensure_ascii=False, indent=2)
+
+
+# 所有客户端共用的默认指标收集器
+DEFAULT_METRICS = LLMMetrics()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或HTTP日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Completions:
+    """openai SDK风格的 chat.completions 接口"""
+
+    def __init__(self, client: 'LLMClient', is_async: bool = False):
+        self._client = client
+        self._is_async = is_async
+
+    def create(self, model: str, messages: List[Dict], stream: bool = False, **params):
+        if self._is_async:
+            return self._acreate(model, messages, stream, **params)
+        if stream:
+            return (AttrDict.wrap({'choices': [{'delta': {'content': chunk}}]})
+                    for chunk in self._client.stream_complete(messages, model, **params))
+        return AttrDict.wrap(self._client.complete(messages, model, **params))
+
+    async def _acreate(self, model, messages, stream, **params):
+        if stream:
+            return self._astream(model, messages, **params)
+        return AttrDict.wrap(await self._client.acomplete(messages, model, **params))
+
+
+    async def _astream(self, model, messages, **params):
+        async for chunk in self._client.astream_complete(messages, model, **params):
+            yield AttrDict.wrap({'choices': [{'delta': {'content': chunk}}]})
+
+
+class _Namespace:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+async def _aparse_chat_deltas(response: httpx.Response, metrics: StreamMetrics) -> AsyncIterator[str]:
+    """异步版本的 parse_chat_deltas：按空行切分事件后逐个解析"""
+    event_lines = []
+    async for line in response.aiter_lines():
+        event_lines.append(line)
+        if not line:
+            for chunk in parse_chat_deltas(event_lines, metrics):
+                yield chunk
+            event_lines = []
+    for chunk in parse_chat_deltas(event_lines, metrics):
+        yield chunk
+
+
+class LLMClient:
+    """带连接池的OpenAI兼容大模型客户端"""
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: float = 60,
+                 max_connections: int = 10, max_keepalive_connections: int = 10,
+                 max_retries: int = 3, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 http2: bool = True, metrics: Optional[LLMMetrics] = None,
+                 headers: Optional[Dict[str, str]] = None,
+                 concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None):
+        """
+        初始化客户端
+
+        Args:
+            base_url: 接口地址，可以是 .../v1 或完整的 .../chat/completions
+            api_key: Bearer令牌（Friday使用AppId）
+            timeout: 单次请求超时（秒）
+            max_connections: 该端点的最大并发连接数
+            max_keepalive_connections: 保持的空闲长连接数
+            max_retries: 最大尝试次数
+            backoff_base: 退避基数（秒），第n次重试最多等待 backoff_base * 2**n
+            backoff_max: 单次退避上限（秒）
+            http2: 安装了 h2 时使用HTTP/2
+            metrics: 指标收集器，默认使用 DEFAULT_METRICS
+            headers: 额外请求头
+            concurrency_limiter: 自适应并发限制器；设置后所有调用方的并发数由它按接口实际承载能力调整，
+                                 max_connections 作为连接池上限
+        """
+        base_url = base_url.rstrip('/')
+        self.url = base_url if base_url.endswith('/chat/completions') else f"{base_url}/chat/completions"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.metrics = metrics or DEFAULT_METRICS
+        self.concurrency_limiter = concurrency_limiter
+        self.logger = logging.getLogger(__name__)
+
+        self.headers = {'Content-Type': 'application/json'}
+        if api_key:
+            self.headers['Authorization'] = f'Bearer {api_key}'
+        self.headers.update(headers or {})
+
+        self._limits = httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_keepalive_connections)
+        self._http2 = http2 and HAS_HTTP2
+        self._client = httpx.Client(headers=self.headers, timeout=timeout, limits=self._limits, http2=self._http2)
+        # 以事件循环对象为键（弱引用），循环被回收后条目自动消失，不会因id复用拿到绑定在已关闭循环上的客户端
+        self._async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = \
+            weakref.WeakKeyDictionary()
+        self._async_lock = threading.Lock()
+
+        # openai SDK风格接口：client.chat.completions.create(...) 与 await client.aio.chat.completions.create(...)
+        self.chat = _Namespace(completions=_Completions(self))
+        self.aio = _Namespace(chat=_Namespace(completions=_Completions(self, is_async=True)))
+
+    def _async_client(self) -> httpx.AsyncClient:
+        """每个事件循环一个AsyncClient（httpx的异步连接不能跨事件循环使用）"""
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                # 已关闭的循环上的连接无法再await关闭，直接丢弃引用
+                for closed in [l for l in self._async_clients if l.is_closed()]:
+                    del self._async_clients[closed]
+                client = httpx.AsyncClient(headers=self.headers, timeout=self.timeout,
+                                           limits=self._limits, http2=self._http2)
+                self._async_clients[loop] = client
+        return client
+
+    @contextmanager
+    def _slot(self):
+        """占用一个并发名额；outcome['status'] 由调用方填写，用于调整并发数"""
+        if self.concurrency_limiter is None:
+            yield {'status': None}
+            return
+        with self.concurrency_limiter.slot() as outcome:
+            yield outcome
+
+    @asynccontextmanager
+    async def _aslot(self):
+        if self.concurrency_limiter is None:
+            yield {'status': None}
+            return
+        async with self.concurrency_limiter.aslot() as outcome:
+            yield outcome
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """计算重试等待时间：优先使用 Retry-After，否则为带完全抖动的指数退避"""
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _payload(messages, model, params) -> Dict:
+        payload = {'model': model, 'messages': messages}
+        payload.update({k: v for k, v in params.items() if v is not None})
+        return payload
+
+    def _record(self, model, started, attempts, ok, status=None, usage=None):
+        usage = usage or {}
+        self.metrics.record(endpoint=self.url, model=model, latency=round(time.perf_counter() - started, 4),
+                            attempts=attempts, ok=ok, status=status,
+                            prompt_tokens=usage.get('prompt_tokens'),
+                            completion_tokens=usage.get('completion_tokens'),
+                            timestamp=time.time())
+
+    def _should_retry(self, attempt: int, max_retries: int, error_desc: str) -> bool:
+        if attempt + 1 >= max_retries:
+            return False
+        self.logger.warning(f"大模型请求失败 (尝试 {attempt + 1}/{max_retries}): {error_desc}")
+        return True
+
+    def complete(self, messages: List[Dict], model: str, max_retries: Optional[int] = None, **params) -> Dict:
+        """
+        同步调用，返回接口的原始JSON（choices/usage/model）
+
+        失败时抛出 LLMRequestError
+        """
+        payload = self._payload(messages, model, params)
+        max_retries = max_retries or self.max_retries
+        started = time.perf_counter()
+        for attempt in range(max_retries):
+            response = None
+            with self._slot() as outcome:
+                try:
+                    response = self._client.post(self.url, json=payload)
+                    outcome['status'] = response.status_code
+                    if response.status_code == 200:
+                        try:
+                            result = response.json()
+                        except ValueError:
+                            # 网关偶尔返回200但内容被截断或是HTML错误页，按可重试错误处理，
+                            # 并发控制按网关错误（502）计入，而不是成功
+                            outcome['status'] = 502
+                            error = LLMRequestError(f"返回内容不是合法JSON: {response.text[:200]}",
+                                                    200, response.text)
+                            retryable = True
+                        else:
+                            self._record(model, started, attempt + 1, True, 200, result.get('usage'))
+                            return result
+                    else:
+                        error = LLMRequestError(f"状态码 {response.status_code}: {response.text[:200]}",
+                                                response.status_code, response.text)
+                        retryable = response.status_code in RETRYABLE_STATUS
+                except httpx.TransportError as e:
+                    error = LLMRequestError(f"{type(e).__name__}: {e}")
+                    retryable = True
+
+            if not retryable or not self._should_retry(attempt, max_retries, str(error)):
+                self._record(model, started, attempt + 1, False, error.status_code)
+                raise error
+            time.sleep(self._backoff(attempt, response))
+
+    async def acomplete(self, messages: List[Dict], model: str, max_retries: Optional[int] = None,
+                        **params) -> Dict:
+        """异步调用，与 complete() 相同"""
+        payload = self._payload(messages, model, params)
+        max_retries = max_retries or self.max_retries
+        client = self._async_client()
+        started = time.perf_counter()
+        for attempt in range(max_retries):
+            response = None
+            async with self._aslot() as outcome:
+                try:
+                    response = await client.post(self.url, json=payload)
+                    outcome['status'] = response.status_code
+                    if response.status_code == 200:
+                        try:
+                            result = response.json()
+                        except ValueError:
+                            # 网关偶尔返回200但内容被截断或是HTML错误页，按可重试错误处理，
+                            # 并发控制按网关错误（502）计入，而不是成功
+                            outcome['status'] = 502
+                            error = LLMRequestError(f"返回内容不是合法JSON: {response.text[:200]}",
+                                                    200, response.text)
+                            retryable = True
+                        else:
+                            self._record(model, started, attempt + 1, True, 200, result.get('usage'))
+                            return result
+                    else:
+                        error = LLMRequestError(f"状态码 {response.status_code}: {response.text[:200]}",
+                                                response.status_code, response.text)
+                        retryable = response.status_code in RETRYABLE_STATUS
+                except httpx.TransportError as e:
+                    error = LLMRequestError(f"{type(e).__name__}: {e}")
+                    retryable = True
+
+            if not retryable or not self._should_retry(attempt, max_retries, str(error)):
+                self._record(model, started, attempt + 1, False, error.status_code)
+                raise error
+            await asyncio.sleep(self._backoff(attempt, response))
+
+    def stream_complete(self, messages: List[Dict], model: str, metrics: Optional[StreamMetrics] = None,
+                    max_retries: Optional[int] = None, **params) -> Iterator[str]:
+        """
+        流式调用（生成器），逐段产出内容
+
+        只在收到第一段内容之前重试；之后中断直接抛出 LLMRequestError，避免重复输出
+        """
+        payload = self._payload(messages, model, dict(params, stream=True))
+        max_retries = max_retries or self.max_retries
+        metrics = metrics or StreamMetrics(model)
+        started = time.perf_counter()
+        for attempt in range(max_retries):
+            response = None
+            attempt_started = time.perf_counter()
+            with self._slot() as outcome:
+                try:
+                    with self._client.stream('POST', self.url, json=payload) as response:
+                        # 并发控制按首包延迟统计，名额在流结束后才归还
+                        outcome['status'] = response.status_code
+                        outcome['latency'] = time.perf_counter() - attempt_started
+                        if response.status_code == 200:
+                            yield from parse_chat_deltas(response.iter_lines(), metrics)
+                            metrics.finish()
+                            self._record(model, started, attempt + 1, True, 200,
+                                         {'completion_tokens': metrics.tokens})
+                            return
+                        response.read()
+                        error = LLMRequestError(f"状态码 {response.status_code}: {response.text[:200]}",
+                                                response.status_code, response.text)
+                        retryable = response.status_code in RETRYABLE_STATUS
+                except httpx.TransportError as e:
+                    outcome['status'] = None
+                    error = LLMRequestError(f"{type(e).__name__}: {e}")
+                    retryable = metrics.chunks == 0
+
+            if not retryable or not self._should_retry(attempt, max_retries, str(error)):
+                self._record(model, started, attempt + 1, False, error.status_code)
+                raise error
+            time.sleep(self._backoff(attempt, response))
+
+    async def astream_complete(self, messages: List[Dict], model: str, metrics: Optional[StreamMetrics] = None,
+                               max_retries: Optional[int] = None, **params) -> AsyncIterator[str]:
+        """异步流式调用，与 stream_complete() 相同"""
+        payload = self._payload(messages, model, dict(params, stream=True))
+        max_retries = max_retries or self.max_retries
+        metrics = metrics or StreamMetrics(model)
+        client = self._async_client()
+        started = time.perf_counter()
+        for attempt in range(max_retries):
+            response = None
+            attempt_started = time.perf_counter()
+            async with self._aslot() as outcome:
+                try:
+                    async with client.stream('POST', self.url, json=payload) as response:
+                        outcome['status'] = response.status_code
+                        outcome['latency'] = time.perf_counter() - attempt_started
+                        if response.status_code == 200:
+                            async for chunk in _aparse_chat_deltas(response, metrics):
+                                yield chunk
+                            metrics.finish()
+                            self._record(model, started, attempt + 1, True, 200,
+                                         {'completion_tokens': metrics.tokens})
+                            return
+                        await response.aread()
+                        error = LLMRequestError(f"状态码 {response.status_code}: {response.text[:200]}",
+                                                response.status_code, response.text)
+                        retryable = response.status_code in RETRYABLE_STATUS
+                except httpx.TransportError as e:
+                    outcome['status'] = None
+                    error = LLMRequestError(f"{type(e).__name__}: {e}")
+                    retryable = metrics.chunks == 0
+
+            if not retryable or not self._should_retry(attempt, max_retries, str(error)):
+                self._record(model, started, attempt + 1, False, error.status_code)
+                raise error
+            await asyncio.sleep(self._backoff(attempt, response))
+
+    async def aclose(self):
+        """关闭当前事件循环的异步连接池；在 asyncio.run() 的协程结束前调用"""
+        with self._async_lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """关闭同步连接池，并丢弃已关闭事件循环上的异步连接池"""
+        self._client.close()
+        with self._async_lock:
+            for closed in [l for l in self._async_clients if l.is_closed()]:
+                del self._async_clients[closed]
+
+
+_shared_clients: Dict[tuple, LLMClient] = {}
+_shared_lock = threading.Lock()
+
+
+def get_llm_client(base_url: str, api_key: Optional[str] = None, adaptive: bool = True, **kwargs) -> LLMClient:
+    """
+    获取某个端点的共享客户端
+
+    同一 (base_url, api_key) 只创建一个连接池和一个自适应并发限制器（adaptive=True时，
+    上限为 max_connections），共用该端点的所有调用方一起按接口实际承载能力调整并发；
+    参数只在首次创建时生效
+    """
+    key = (base_url.rstrip('/'), api_key)
+    with _shared_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            if adaptive and 'concurrency_limiter' not in kwargs:
+                kwargs['concurrency_limiter'] = AdaptiveConcurrencyLimiter(
+                    max_limit=kwargs.get('max_connections', 10))
+            client = LLMClient(base_url, api_key, **kwargs)
+            _shared_clients[key] = client
+        return client
+
+
+def message_content(result: Dict) -> Optional[str]:
+    """从接口返回中取出第一条回复内容"""
+    choices = result.get('choices') or []
+    if not choices:
+        return None
+    return (choices[0].get('message') or {}).get('content')
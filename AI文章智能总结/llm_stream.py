@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型流式输出（SSE）
+增量解析OpenAI兼容接口的 text/event-stream 响应，按生成器或回调方式逐段产出内容，
+并记录首字延迟（TTFT）和生成速度，便于比较不同模型的响应延迟。
+"""
+
+import json
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+
+class StreamMetrics:
+    """单次流式调用的延迟指标"""
+
+    def __init__(self, model: str = ''):
+        self.model = model
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks = 0
+        self.chars = 0
+        # 服务端在最后一个数据块中返回usage时使用真实token数
+        self.completion_tokens: Optional[int] = None
+
+    def on_chunk(self, text: str):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+        self.chars += len(text)
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """首字延迟（秒）"""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total_time(self) -> Optional[float]:
+        """总耗时（秒）"""
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    @property
+    def tokens(self) -> int:
+        """生成的token数；没有usage时以数据块数近似（OpenAI兼容接口通常每块一个token）"""
+        return self.completion_tokens if self.completion_tokens is not None else self.chunks
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        """首字之后的生成速度（token/秒）"""
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return self.tokens / elapsed if elapsed > 0 else None
+
+    def to_dict(self) -> Dict:
+        return {
+            'model': self.model,
+            'ttft_seconds': round(self.ttft, 3) if self.ttft is not None else None,
+            'total_seconds': round(self.total_time, 3) if self.total_time is not None else None,
+            'tokens': self.tokens,
+            'tokens_per_sec': round(self.tokens_per_sec, 2) if self.tokens_per_sec is not None else None,
+            'chars': self.chars,
+        }
+
+    def summary(self) -> str:
+        """一行可读的指标摘要"""
+        ttft = f"{self.ttft:.2f}s" if self.ttft is not None else "-"
+        speed = f"{self.tokens_per_sec:.1f} token/s" if self.tokens_per_sec is not None else "-"
+        total = f"{self.total_time:.2f}s" if self.total_time is not None else "-"
+        return f"首字延迟 {ttft}，生成速度 {speed}，总耗时 {total}，{self.tokens} tokens"
+
+
+def iter_sse_data(lines: Iterable) -> Iterator[str]:
+    """
+    从SSE行流中解析出每个事件的data字段
+
+    多行data按规范用换行拼接；遇到 [DONE] 结束
+    """
+    data_lines = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.rstrip('\r')
+        if not line:
+            if data_lines:
+                data = '\n'.join(data_lines)
+                data_lines = []
+                if data.strip() == '[DONE]':
+                    return
+                yield data
+            continue
+        if line.startswith(':'):
+            continue  # 注释/心跳
+        if line.startswith('data:'):
+            data_lines.append(line[5:].lstrip(' '))
+    if data_lines:
+        data = '\n'.join(data_lines)
+        if data.strip() != '[DONE]':
+            yield data
+
+
+def parse_chat_deltas(lines: Iterable, metrics: Optional[StreamMetrics] = None) -> Iterator[str]:
+    """从SSE行流中逐段产出 choices[0].delta.content"""
+    for data in iter_sse_data(lines):
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        usage = event.get('usage')
+        if metrics is not None and usage and usage.get('completion_tokens') is not None:
+            metrics.completion_tokens = usage['completion_tokens']
+        for choice in event.get('choices') or []:
+            content = (choice.get('delta') or {}).get('content')
+            if content:
+                if metrics is not None:
+                    metrics.on_chunk(content)
+                yield content
+
+
+def consume_stream(chunks: Iterable[str], on_token: Optional[Callable[[str], None]] = None,
+                   on_complete: Optional[Callable[[str], None]] = None) -> str:
+    """
+    消费流式片段（回调模式），返回完整文本
+
+    Args:
+        chunks: 流式片段生成器
+        on_token: 每收到一个片段时调用
+        on_complete: 生成结束后以完整文本调用
+    """
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        if on_token:
+            on_token(chunk)
+    full_text = ''.join(parts)
+    if on_complete:
+        on_complete(full_text)
+    return full_text
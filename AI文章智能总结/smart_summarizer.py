@@ -6,22 +6,55 @@
 """
 
 import requests
-from bs4 import BeautifulSoup
 import json
 import time
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import os
+import queue
 import sys
+import threading
 
 # 添加爬虫模块路径
-sys.path.append('../爬取AI咨询')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '爬取AI咨询'))
+
+from http_cache import HTTPCache
+from html_backend import extract_main_content
+from rate_limiter import TokenBucket
+from llm_cache import LLMCache
+from llm_call import cached_chat
+from llm_stream import StreamMetrics
+from llm_client import DEFAULT_METRICS, get_llm_client
+from checkpoint import JSONLCheckpoint, default_checkpoint_path, prompt_hash
+
+# 提示词模板版本号，修改 create_summary_prompt 的模板后需要提升，使旧的缓存结果失效
+PROMPT_TEMPLATE_VERSION = "smart-summary-v1"
+
+# 流水线阶段之间传递的结束标记
+_STAGE_DONE = object()
+
 
 class SmartWebReader:
     """智能网页读取器"""
 
-    def __init__(self):
+    # 针对AI工具集网站优化的内容选择器（按优先级排列，一次遍历同时匹配）
+    CONTENT_SELECTORS = [
+        '.entry-content',           # WordPress标准内容区域
+        '.post-content',            # 文章内容区域
+        '.article-content',         # 文章内容
+        '.content',                 # 通用内容区域
+        'article .content',         # 文章标签内的内容
+        '.main-content',            # 主要内容区域
+        '.post-body',               # 文章主体
+        '.single-content',          # 单页内容
+        '[class*="content"]',       # 包含content的类名
+        'main article',             # 主要文章区域
+        '.wp-content'               # WordPress内容
+    ]
+
+    def __init__(self, http_cache: Optional[HTTPCache] = None):
+        self.http_cache = http_cache
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -48,7 +81,10 @@ class SmartWebReader:
         """获取页面内容"""
         for attempt in range(max_retries):
             try:
-                response = self.session.get(url, timeout=15)
+                if self.http_cache:
+                    response = self.http_cache.fetch(self.session, url, timeout=15)
+                else:
+                    response = self.session.get(url, timeout=15)
                 response.raise_for_status()
                 response.encoding = 'utf-8'
                 return response.text
@@ -62,57 +98,13 @@ class SmartWebReader:
 
     def extract_article_content(self, html_content: str, url: str) -> str:
         """从HTML中提取文章内容"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # 针对AI工具集网站优化的内容选择器
-        content_selectors = [
-            '.entry-content',           # WordPress标准内容区域
-            '.post-content',            # 文章内容区域
-            '.article-content',         # 文章内容
-            '.content',                 # 通用内容区域
-            'article .content',         # 文章标签内的内容
-            '.main-content',            # 主要内容区域
-            '.post-body',               # 文章主体
-            '.single-content',          # 单页内容
-            '[class*="content"]',       # 包含content的类名
-            'main article',             # 主要文章区域
-            '.wp-content'               # WordPress内容
-        ]
-
-        content = ''
-        for selector in content_selectors:
-            content_elem = soup.select_one(selector)
-            if content_elem:
-                # 移除不需要的元素
-                for unwanted in content_elem(["script", "style", "nav", "footer", "header", ".sidebar", ".related", ".comments", ".navigation"]):
-                    unwanted.decompose()
-
-                # 提取文本内容
-                content = content_elem.get_text(separator='\n', strip=True)
-
-                # 清理多余的空行
-                content = '\n'.join(line.strip() for line in content.split('\n') if line.strip())
-
-                if len(content) > 200:  # 确保内容有足够长度
-                    break
-
-        # 如果没有找到合适的内容，尝试从整个页面提取
-        if not content or len(content) < 100:
-            # 移除不需要的标签
-            for unwanted in soup(["script", "style", "nav", "footer", "header", ".sidebar", ".menu", ".navigation"]):
-                unwanted.decompose()
-
-            # 尝试从body或main标签提取
-            body_content = soup.find('body') or soup.find('main')
-            if body_content:
-                content = body_content.get_text(separator='\n', strip=True)
-                content = '\n'.join(line.strip() for line in content.split('\n') if line.strip())
-
-        # 限制内容长度，避免过长
-        if len(content) > 4000:
-            content = content[:4000] + "...[内容已截断]"
-
-        return content if content else "无法获取文章详细内容"
+        return extract_main_content(
+            html_content,
+            content_selectors=self.CONTENT_SELECTORS,
+            unwanted_tags=["script", "style", "nav", "footer", "header", ".sidebar", ".related", ".comments", ".navigation"],
+            fallback_unwanted_tags=["script", "style", "nav", "footer", "header", ".sidebar", ".menu", ".navigation"],
+            max_length=4000,
+        )
 
     def read_article_realtime(self, article_url: str) -> str:
         """实时读取文章内容"""
@@ -130,13 +122,20 @@ class SmartWebReader:
 class FridayAIClient:
     """美团Friday大模型客户端"""
 
-    def __init__(self, app_id: str):
+    def __init__(self, app_id: str, llm_cache: Optional[LLMCache] = None):
         self.app_id = app_id
         self.base_url = "https://aigc.sankuai.com/v1/openai/native/chat/completions"
         self.headers = {
             'Authorization': f'Bearer {app_id}',
             'Content-Type': 'application/json'
         }
+        # 同一端点共用连接池（HTTP keep-alive），重试和指标由客户端统一处理
+        self.llm_client = get_llm_client(self.base_url, app_id, timeout=30)
+        self.llm_cache = llm_cache
+        # 最近一次流式调用的延迟指标
+        self.last_stream_metrics: Optional[StreamMetrics] = None
+        # 可选的限速器，只对真正发出的请求限速，缓存命中不消耗配额
+        self.rate_limiter: Optional[TokenBucket] = None
 
         # 设置日志
         self.logger = logging.getLogger(__name__)
@@ -183,56 +182,33 @@ class FridayAIClient:
 
         return prompt
 
-    def call_friday_api(self, prompt: str, max_retries: int = 3) -> Optional[str]:
-        """调用Friday API获取总结"""
-        payload = {
-            "model": "LongCat-Large-32K-Chat",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "stream": False,
-            "temperature": 0.7,
-            "max_tokens": 1000
-        }
-
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30
-                )
-
-                if response.status_code == 200:
-                    result = response.json()
-                    if 'choices' in result and len(result['choices']) > 0:
-                        content = result['choices'][0]['message']['content']
-                        return content.strip()
-                    else:
-                        self.logger.warning(f"API响应格式异常: {result}")
-                        return None
-                else:
-                    self.logger.warning(f"API调用失败 (状态码: {response.status_code}): {response.text}")
-
-            except requests.RequestException as e:
-                self.logger.warning(f"API调用异常 (尝试 {attempt + 1}/{max_retries}): {e}")
-
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-
-        self.logger.error("API调用最终失败")
-        return None
+    def call_friday_api(self, prompt: str, max_retries: int = 3, stream: bool = False,
+                        on_token: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """
+        调用Friday API获取总结
+
+        Args:
+            prompt: 提示词
+            max_retries: 最大重试次数
+            stream: 是否使用流式输出，首字延迟等指标保存在 last_stream_metrics
+            on_token: 流式输出时每收到一段内容调用一次（缓存命中时以完整结果调用一次）
+        """
+        content, metrics = cached_chat(
+            self.llm_client, prompt, "LongCat-Large-32K-Chat", PROMPT_TEMPLATE_VERSION,
+            temperature=0.7, max_tokens=1000, llm_cache=self.llm_cache, rate_limiter=self.rate_limiter,
+            max_retries=max_retries, stream=stream, on_token=on_token
+        )
+        if metrics is not None:
+            self.last_stream_metrics = metrics
+        return content
 
 class SmartArticleSummarizer:
     """智能文章总结器主类"""
 
-    def __init__(self, app_id: str):
-        self.web_reader = SmartWebReader()
-        self.friday_client = FridayAIClient(app_id)
+    def __init__(self, app_id: str, http_cache: Optional[HTTPCache] = None,
+                 llm_cache: Optional[LLMCache] = None):
+        self.web_reader = SmartWebReader(http_cache)
+        self.friday_client = FridayAIClient(app_id, llm_cache)
         self.logger = logging.getLogger(__name__)
 
     def load_articles_from_json(self, json_file: str) -> List[Dict]:
@@ -246,6 +222,25 @@ class SmartArticleSummarizer:
             self.logger.error(f"加载文章数据失败: {e}")
             return []
 
+    def _build_result(self, article_data: Dict, realtime_content: str, summary: Optional[str]) -> Dict:
+        """构建单篇文章的总结结果"""
+        result = article_data.copy()
+        result['ai_summary'] = summary or "总结生成失败"
+        result['realtime_content_length'] = len(realtime_content)
+        result['content_source'] = "realtime" if realtime_content != "无法获取文章内容" else "failed"
+        result['summary_generated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return result
+
+    @staticmethod
+    def _build_failed_result(article_data: Dict, error: Exception) -> Dict:
+        """构建处理失败的文章结果"""
+        failed_article = article_data.copy()
+        failed_article['ai_summary'] = f"总结生成失败: {str(error)}"
+        failed_article['realtime_content_length'] = 0
+        failed_article['content_source'] = "error"
+        failed_article['summary_generated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return failed_article
+
     def summarize_article_smart(self, article_data: Dict) -> Dict:
         """智能总结单篇文章（实时获取内容）"""
         self.logger.info(f"开始智能总结文章: {article_data.get('title', 'Unknown')}")
@@ -263,61 +258,187 @@ class SmartArticleSummarizer:
         # 调用AI进行总结
         summary = self.friday_client.call_friday_api(prompt)
 
-        # 构建结果
-        result = article_data.copy()
-        result['ai_summary'] = summary or "总结生成失败"
-        result['realtime_content_length'] = len(realtime_content)
-        result['content_source'] = "realtime" if realtime_content != "无法获取文章内容" else "failed"
-        result['summary_generated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return self._build_result(article_data, realtime_content, summary)
 
-        return result
+    def _fetch_stage(self, item: Dict):
+        """流水线第一阶段：下载网页"""
+        article_url = item['article'].get('url', '')
+        item['html'] = self.web_reader.get_page_content(article_url) if article_url else None
 
-    def summarize_articles_smart(self, articles: List[Dict], batch_size: int = 3, delay: float = 3.0) -> List[Dict]:
-        """智能批量总结文章"""
-        summarized_articles = []
+    def _extract_stage(self, item: Dict):
+        """流水线第二阶段：提取正文"""
+        article_url = item['article'].get('url', '')
+        if not article_url:
+            item['content'] = "无法获取文章链接"
+        elif not item['html']:
+            item['content'] = "无法获取文章内容"
+        else:
+            item['content'] = self.web_reader.extract_article_content(item['html'], article_url)
+        item['html'] = None  # 尽早释放HTML
+
+    def _llm_stage(self, item: Dict):
+        """流水线第三阶段：调用大模型（按每分钟请求预算限速，缓存命中不计入）"""
+        prompt = self.friday_client.create_summary_prompt(item['article'], item['content'])
+        summary = self.friday_client.call_friday_api(prompt)
+        item['result'] = self._build_result(item['article'], item['content'], summary)
+        item['succeeded'] = bool(summary)
+
+    @staticmethod
+    def _checkpoint_hash(article_data: Dict) -> str:
+        """
+        检查点使用的提示词哈希
+
+        实时正文要下载后才知道，这里只用模板版本和文章基本信息计算，
+        模板或基本信息变化时文章会被重新总结
+        """
+        fields = [article_data.get(k, '') for k in ('title', 'category', 'publish_time', 'url', 'description')]
+        return prompt_hash(json.dumps([PROMPT_TEMPLATE_VERSION] + fields, ensure_ascii=False))
+
+    @staticmethod
+    def _run_stage(func, in_queue: queue.Queue, out_queue: Optional[queue.Queue],
+                   workers: int, downstream_workers: int = 0) -> List[threading.Thread]:
+        """
+        启动一个流水线阶段的工作线程
+
+        每个线程从in_queue取任务处理后放入out_queue；队列有容量上限，下游处理不过来时上游会被阻塞（背压）。
+        收到结束标记后，最后一个退出的线程向下游发送同样数量的结束标记。
+        """
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                item = in_queue.get()
+                if item is _STAGE_DONE:
+                    with lock:
+                        remaining[0] -= 1
+                        last = remaining[0] == 0
+                    if last and out_queue is not None:
+                        for _ in range(downstream_workers):
+                            out_queue.put(_STAGE_DONE)
+                    return
+                if item.get('error') is None:
+                    try:
+                        func(item)
+                    except Exception as e:
+                        item['error'] = e
+                if out_queue is not None:
+                    out_queue.put(item)
+                    continue
+                # 最后一个阶段：回调出错只记录日志，工作线程不能退出，否则上游会一直阻塞
+                try:
+                    item['on_done'](item)
+                except Exception as e:
+                    logging.getLogger(__name__).error(f"处理完成回调失败: {e}", exc_info=True)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+        for t in threads:
+            t.start()
+        return threads
+
+    def summarize_articles_smart(self, articles: List[Dict],
+                                 requests_per_minute: float = 20,
+                                 fetch_workers: int = 4,
+                                 extract_workers: int = 2,
+                                 llm_workers: int = 4,
+                                 queue_size: int = 8,
+                                 checkpoint: Optional[JSONLCheckpoint] = None) -> List[Dict]:
+        """
+        智能批量总结文章（并发流水线）
+
+        下载网页、提取正文、调用大模型三个阶段各自有独立的线程池，通过有界队列连接，
+        网络下载和大模型调用可以重叠进行。大模型调用按 requests_per_minute 限速。
+        返回结果的顺序与输入一致。
+
+        Args:
+            articles: 文章列表
+            requests_per_minute: Friday接口每分钟请求预算
+            fetch_workers: 下载网页线程数
+            extract_workers: 提取正文线程数
+            llm_workers: 大模型调用线程数
+            queue_size: 阶段之间队列的容量上限
+            checkpoint: 断点续跑检查点；已在检查点中的文章直接复用结果，新完成的成功结果追加写入
+        """
         total = len(articles)
+        results: List[Optional[Dict]] = [None] * total
 
         self.logger.info(f"开始智能总结 {total} 篇文章...")
         print(f"🚀 开始智能总结 {total} 篇文章...")
         print("📖 每篇文章都会实时获取最新内容进行分析")
-
-        for i, article in enumerate(articles, 1):
-            try:
-                print(f"\n📄 处理进度: {i}/{total} - {article.get('title', 'Unknown')[:50]}...")
-
-                # 智能总结文章
-                summarized_article = self.summarize_article_smart(article)
-                summarized_articles.append(summarized_article)
-
-                # 显示处理结果
-                content_length = summarized_article.get('realtime_content_length', 0)
-                content_source = summarized_article.get('content_source', 'unknown')
-
+        print(f"⚙️ 流水线: 下载 {fetch_workers} 线程 / 提取 {extract_workers} 线程 / 大模型 {llm_workers} 线程，"
+              f"限速 {requests_per_minute} 次/分钟")
+
+        # 已在检查点中的文章直接复用结果
+        pending = []
+        for index, article in enumerate(articles):
+            hash_value = self._checkpoint_hash(article)
+            done = checkpoint.get(article.get('url', ''), hash_value) if checkpoint is not None else None
+            if done is not None:
+                results[index] = done
+            else:
+                pending.append((index, article, hash_value))
+        if checkpoint is not None:
+            print(f"♻️ 检查点: {checkpoint.path}，已完成 {total - len(pending)} 篇，待处理 {len(pending)} 篇")
+
+        completed = [total - len(pending)]
+        progress_lock = threading.Lock()
+
+        def on_done(item):
+            index, article = item['index'], item['article']
+            if item.get('error') is not None:
+                self.logger.error(f"处理文章失败 ({index + 1}/{total}): {item['error']}")
+                results[index] = self._build_failed_result(article, item['error'])
+            else:
+                results[index] = item['result']
+                if checkpoint is not None and item.get('succeeded'):
+                    checkpoint.append(article.get('url', ''), item['checkpoint_hash'], item['result'])
+
+            with progress_lock:
+                completed[0] += 1
+                print(f"\n📄 处理进度: {completed[0]}/{total} - {article.get('title', 'Unknown')[:50]}...")
+                content_source = results[index].get('content_source', 'unknown')
                 if content_source == "realtime":
-                    print(f"   ✅ 成功获取实时内容 ({content_length} 字符)")
+                    print(f"   ✅ 成功获取实时内容 ({results[index].get('realtime_content_length', 0)} 字符)")
+                elif content_source == "error":
+                    print(f"   ❌ 处理失败: {item['error']}")
                 else:
                     print(f"   ⚠️ 内容获取失败，使用基本信息")
 
-                # 批次延迟
-                if i % batch_size == 0 and i < total:
-                    print(f"   ⏳ 批次处理完成，等待 {delay} 秒...")
-                    time.sleep(delay)
-                else:
-                    time.sleep(1)  # 基础延迟
-
-            except Exception as e:
-                self.logger.error(f"处理文章失败 ({i}/{total}): {e}")
-                # 添加失败的文章
-                failed_article = article.copy()
-                failed_article['ai_summary'] = f"总结生成失败: {str(e)}"
-                failed_article['realtime_content_length'] = 0
-                failed_article['content_source'] = "error"
-                failed_article['summary_generated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                summarized_articles.append(failed_article)
-                print(f"   ❌ 处理失败: {str(e)}")
-
-        self.logger.info(f"智能总结完成！成功处理 {len(summarized_articles)} 篇文章")
-        return summarized_articles
+        fetch_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        extract_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        llm_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+
+        # 限速只作用于本次批量总结，结束后恢复，之后直接调用 call_friday_api 不受影响
+        previous_rate_limiter = self.friday_client.rate_limiter
+        self.friday_client.rate_limiter = TokenBucket.per_minute(requests_per_minute)
+        try:
+            threads = (
+                self._run_stage(self._fetch_stage, fetch_queue, extract_queue, fetch_workers, extract_workers)
+                + self._run_stage(self._extract_stage, extract_queue, llm_queue, extract_workers, llm_workers)
+                + self._run_stage(self._llm_stage, llm_queue, None, llm_workers)
+            )
+
+            for index, article, hash_value in pending:
+                fetch_queue.put({'index': index, 'article': article, 'error': None,
+                                 'checkpoint_hash': hash_value, 'on_done': on_done})
+            for _ in range(fetch_workers):
+                fetch_queue.put(_STAGE_DONE)
+
+            for t in threads:
+                t.join()
+        finally:
+            self.friday_client.rate_limiter = previous_rate_limiter
+
+        llm_cache = self.friday_client.llm_cache
+        if llm_cache is not None:
+            print(f"\n💾 大模型响应缓存: 命中 {llm_cache.stats['hits']} 次，未命中 {llm_cache.stats['misses']} 次")
+        for stats in DEFAULT_METRICS.summary().values():
+            print(f"📈 {stats['model']}: {stats['requests']} 次请求（失败 {stats['errors']}，重试 {stats['retries']}），"
+                  f"平均延迟 {stats['avg_latency']}s，P95 {stats['p95_latency']}s，"
+                  f"tokens {stats['prompt_tokens']}+{stats['completion_tokens']}")
+
+        self.logger.info(f"智能总结完成！成功处理 {len(results)} 篇文章")
+        return results
 
     def save_smart_results(self, articles: List[Dict], output_file: Optional[str] = None):
         """保存智能总结结果"""
@@ -391,8 +512,14 @@ class SmartArticleSummarizer:
         except Exception as e:
             self.logger.error(f"生成报告失败: {e}")
 
-    def run_smart_summary(self, input_file: str, batch_size: int = 3, delay: float = 3.0):
-        """运行智能总结流程"""
+    def run_smart_summary(self, input_file: str, requests_per_minute: float = 20,
+                          checkpoint_file: Optional[str] = None, **pipeline_options):
+        """
+        运行智能总结流程
+
+        每篇文章完成后立即写入JSONL检查点（默认根据输入文件名生成），
+        中断后重新运行会跳过检查点中已完成的文章。
+        """
         # 加载文章数据
         articles = self.load_articles_from_json(input_file)
         if not articles:
@@ -403,7 +530,12 @@ class SmartArticleSummarizer:
         print("🔄 将为每篇文章实时获取最新内容进行AI总结")
 
         # 智能总结文章
-        summarized_articles = self.summarize_articles_smart(articles, batch_size, delay)
+        checkpoint = JSONLCheckpoint(checkpoint_file or default_checkpoint_path(input_file, 'smart'))
+        try:
+            summarized_articles = self.summarize_articles_smart(articles, requests_per_minute,
+                                                                checkpoint=checkpoint, **pipeline_options)
+        finally:
+            checkpoint.close()
 
         # 保存结果
         self.save_smart_results(summarized_articles)
@@ -418,8 +550,14 @@ def main():
     # 配置参数
     APP_ID = "21910615279495929878"  # 你的AppID
     INPUT_FILE = "../爬取AI咨询/basic_articles_20250814_212345.json"  # 基本信息文件路径
-    BATCH_SIZE = 2  # 批处理大小（实时获取内容较慢，建议减小）
-    DELAY = 4.0     # 批次间延迟（秒）
+    REQUESTS_PER_MINUTE = 20  # Friday接口每分钟请求预算
+    PIPELINE_OPTIONS = {
+        "fetch_workers": 4,    # 下载网页线程数
+        "extract_workers": 2,  # 提取正文线程数
+        "llm_workers": 8,      # 大模型调用线程数上限（实际并发由自适应限制器按接口承载能力调整）
+    }
+    USE_LLM_CACHE = "--no-cache" not in sys.argv     # --no-cache: 不使用大模型响应缓存
+    REFRESH_LLM_CACHE = "--refresh" in sys.argv      # --refresh: 忽略已有缓存，重新生成并覆盖
 
     try:
         # 检查输入文件是否存在
@@ -429,14 +567,15 @@ def main():
             print("   选择 '3. ⚡ 仅获取基本信息' 选项")
             return
 
-        # 创建智能总结器
-        summarizer = SmartArticleSummarizer(APP_ID)
+        # 创建智能总结器（与爬虫共用HTTP缓存，刚爬取过的页面只需304校验）
+        llm_cache = LLMCache(refresh=REFRESH_LLM_CACHE) if USE_LLM_CACHE else None
+        summarizer = SmartArticleSummarizer(APP_ID, http_cache=HTTPCache(), llm_cache=llm_cache)
 
         # 运行智能总结
         print("🧠 启动智能AI文章总结系统...")
         print("📖 特点：实时获取网页内容，确保分析最新信息")
 
-        summarized_articles = summarizer.run_smart_summary(INPUT_FILE, BATCH_SIZE, DELAY)
+        summarized_articles = summarizer.run_smart_summary(INPUT_FILE, REQUESTS_PER_MINUTE, **PIPELINE_OPTIONS)
 
         if summarized_articles:
             print(f"\n✅ 智能总结完成！共处理 {len(summarized_articles)} 篇文章")
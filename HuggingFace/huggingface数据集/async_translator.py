@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+异步翻译引擎
+基于asyncio并发翻译DataFrame列：信号量限制同时进行的请求数，令牌桶限制每分钟token数，
+重试等待不占用线程；同步接口在Jupyter（已有事件循环）和普通脚本中都能直接调用，
+所有同步调用共用一个常驻后台事件循环。
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# 令牌桶限速器位于 爬取AI咨询 目录
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '爬取AI咨询'))
+
+from rate_limiter import TokenBucket
+from translate_helper import (SYSTEM_PROMPT, LLMCache, client_retries, estimate_tokens, normalize_source,
+                              translation_memory_key)
+
+try:
+    from tqdm.auto import tqdm
+    HAS_TQDM = True
+except ImportError:  # 没有安装tqdm时只输出日志
+    HAS_TQDM = False
+
+logger = logging.getLogger(__name__)
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """常驻后台线程中的事件循环，首次使用时启动"""
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='async-translator-loop', daemon=True).start()
+            _background_loop = loop
+        return _background_loop
+
+
+def run_sync(coro):
+    """
+    在同步代码中运行协程
+
+    所有调用都提交到同一个常驻后台事件循环：Jupyter（已有运行中的事件循环）中也能调用，
+    并且用户传入的 AsyncOpenAI 客户端的连接始终绑定在这个循环上，多次调用之间可以复用
+    """
+    loop = _get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync 不能在后台事件循环内部调用，请直接 await 对应的异步方法")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result()
+    except BaseException:
+        # 被中断（如KeyboardInterrupt）时取消后台循环中的任务
+        future.cancel()
+        raise
+
+
+class AsyncTranslator:
+    """异步DataFrame翻译器"""
+
+    def __init__(self, client, model_name: str = "LongCat-Flash-Chat", max_concurrency: int = 100,
+                 tokens_per_minute: Optional[int] = None, max_retries: int = 3,
+                 translation_memory: Optional[LLMCache] = None):
+        """
+        初始化翻译器
+
+        Args:
+            client: AsyncOpenAI 客户端，或 create_pooled_client 创建的统一客户端（使用其 .aio 异步接口）
+            model_name: 使用的模型名称
+            max_concurrency: 同时进行的请求数上限
+            tokens_per_minute: 每分钟token预算（按输入和预估输出估算），None表示不限制
+            max_retries: 每条文本的最大尝试次数（统一客户端自己重试，此时只调用一次）
+            translation_memory: 持久化翻译记忆（见 translate_helper.open_translation_memory）
+        """
+        # 统一客户端：用完后由 close() 关闭它在后台事件循环中的异步连接池
+        self._pooled_client = client if client_retries(client) else None
+        self.client = getattr(client, 'aio', client)
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.max_retries = 1 if self._pooled_client is not None else max_retries
+        self.translation_memory = translation_memory
+        # 桶容量为10秒的预算，避免启动时一次性打满整分钟的额度
+        self.token_bucket = (TokenBucket.per_minute(tokens_per_minute, capacity=tokens_per_minute / 6)
+                             if tokens_per_minute else None)
+
+    @staticmethod
+    def estimate_request_tokens(text: str) -> int:
+        """预估一次请求消耗的token数：系统提示词 + 原文 + 译文（按原文的2倍估计）"""
+        return estimate_tokens(SYSTEM_PROMPT) + 3 * estimate_tokens(text)
+
+    async def translate_text(self, text: str, semaphore: Optional[asyncio.Semaphore] = None) -> str:
+        """
+        翻译单个文本
+
+        重试之间的等待不占用并发名额；重试用尽后抛出最后一次的异常
+        """
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": text}
+        ]
+        for attempt in range(self.max_retries):
+            if self.token_bucket is not None:
+                await self.token_bucket.acquire_async(self.estimate_request_tokens(text))
+            try:
+                if semaphore is None:
+                    response = await self._create(messages)
+                else:
+                    async with semaphore:
+                        response = await self._create(messages)
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                logger.warning(f"翻译失败 (尝试 {attempt + 1}/{self.max_retries}): {e}")
+                await asyncio.sleep(2 ** attempt)  # 指数退避
+
+    async def aclose(self):
+        """关闭统一客户端在当前事件循环中的异步连接池（下次调用时自动重建）"""
+        if self._pooled_client is not None:
+            await self._pooled_client.aclose()
+
+    def close(self):
+        """同步接口，在后台事件循环中执行 aclose()"""
+        run_sync(self.aclose())
+
+    async def _create(self, messages):
+        return await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            max_tokens=2048,
+            temperature=0.3
+        )
+
+    async def translate_texts(self, texts: List[str], desc: str = "翻译进度") -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        并发翻译一组文本
+
+        Returns:
+            (译文字典, 错误信息字典)，键都是原文
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        translations: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        progress = tqdm(total=len(texts), desc=desc, unit="条") if HAS_TQDM else None
+
+        async def worker(text: str):
+            try:
+                translations[text] = await self.translate_text(text, semaphore)
+                if self.translation_memory is not None:
+                    self.translation_memory.set(translation_memory_key(self.model_name, text),
+                                                translations[text], model=self.model_name)
+            except Exception as e:
+                errors[text] = f"{type(e).__name__}: {e}"
+                logger.error(f"翻译最终失败: {text[:50]}... ({errors[text]})")
+            if progress is not None:
+                progress.update(1)
+                progress.set_postfix({'成功': len(translations), '失败': len(errors)})
+
+        try:
+            await asyncio.gather(*(worker(text) for text in texts))
+        finally:
+            if progress is not None:
+                progress.close()
+        return translations, errors
+
+    async def translate_column_async(self, df: pd.DataFrame, source_column: str,
+                                     target_column: Optional[str] = None,
+                                     error_column: Optional[str] = None,
+                                     batch_size: Optional[int] = None, copy: bool = True) -> pd.DataFrame:
+        """
+        翻译DataFrame中指定列的内容（协程版本）
+
+        相同的原文只翻译一次；翻译失败的行译文为空值，异常信息写入 error_column
+
+        Args:
+            df: 源DataFrame
+            source_column: 要翻译的列名
+            target_column: 翻译结果列名，默认为 source_column + '_zh'
+            error_column: 错误信息列名，默认为 target_column + '_error'
+            batch_size: 只处理前多少行，None表示全部
+            copy: 为False时直接在df上写入结果列，不复制整个DataFrame
+
+        Returns:
+            包含翻译结果和错误信息的新DataFrame
+        """
+        if source_column not in df.columns:
+            raise ValueError(f"列 '{source_column}' 不存在于DataFrame中")
+        target_column = target_column or f"{source_column}_zh"
+        error_column = error_column or f"{target_column}_error"
+
+        df_result = df.copy() if copy else df
+        df_to_process = df_result.head(batch_size) if batch_size is not None else df_result
+
+        # 规范化并去重，查找翻译记忆
+        sources = df_to_process[source_column]
+        normalized = sources[sources.notna()].map(normalize_source)
+        # 只有空白的原文规范化后为空串，与空文本一样不翻译，结果为空字符串
+        normalized = normalized[normalized != ""]
+        unique_texts = normalized.unique().tolist()
+        translations: Dict[str, str] = {}
+        if self.translation_memory is not None:
+            for text in unique_texts:
+                cached = self.translation_memory.get(translation_memory_key(self.model_name, text))
+                if cached is not None:
+                    translations[text] = cached
+        pending = [text for text in unique_texts if text not in translations]
+        logger.info(f"开始翻译 {len(sources)} 条记录：去重后 {len(unique_texts)} 条，"
+                    f"翻译记忆命中 {len(translations)} 条，需要翻译 {len(pending)} 条（并发上限 {self.max_concurrency}）")
+
+        translated, errors = await self.translate_texts(pending, desc=f"翻译 {source_column}")
+        translations.update(translated)
+
+        # 按规范化原文映射回所有行：空文本为空字符串，失败的行为空值
+        df_result.loc[df_to_process.index, target_column] = (
+            normalized.map(translations).reindex(df_to_process.index, fill_value=''))
+        df_result.loc[df_to_process.index, error_column] = (
+            normalized.map(errors).reindex(df_to_process.index))
+
+        failed_rows = int(df_result.loc[df_to_process.index, error_column].notna().sum())
+        logger.info(f"翻译完成！结果保存在列 '{target_column}' 中，失败 {failed_rows} 行（见列 '{error_column}'）")
+        return df_result
+
+    def translate_column(self, df: pd.DataFrame, source_column: str, target_column: Optional[str] = None,
+                         error_column: Optional[str] = None, batch_size: Optional[int] = None) -> pd.DataFrame:
+        """同步接口，参数同 translate_column_async"""
+        return run_sync(self.translate_column_async(df, source_column, target_column, error_column, batch_size))
+
+    async def translate_multiple_columns_async(self, df: pd.DataFrame, column_mapping: dict,
+                                               batch_size: Optional[int] = None) -> pd.DataFrame:
+        """翻译多个列，column_mapping 为 {源列名: 目标列名}"""
+        df_result = df.copy()
+        for source_col, target_col in column_mapping.items():
+            await self.translate_column_async(df_result, source_col, target_col,
+                                              batch_size=batch_size, copy=False)
+        return df_result
+
+    def translate_multiple_columns(self, df: pd.DataFrame, column_mapping: dict,
+                                   batch_size: Optional[int] = None) -> pd.DataFrame:
+        """同步接口，参数同 translate_multiple_columns_async"""
+        return run_sync(self.translate_multiple_columns_async(df, column_mapping, batch_size))
+
+
+def translate_dataframe_column_async(df, client, source_column, target_column=None, max_concurrency=100,
+                                     tokens_per_minute=None, batch_size=None, model_name="LongCat-Flash-Chat",
+                                     translation_memory=None):
+    """
+    便捷函数：用异步引擎翻译DataFrame中的指定列（同步调用，Jupyter中也可直接使用）
+
+    Args:
+        df: 源DataFrame
+        client: AsyncOpenAI 客户端或 create_pooled_client 创建的客户端
+        source_column: 要翻译的列名
+        target_column: 目标列名（可选）
+        max_concurrency: 同时进行的请求数上限
+        tokens_per_minute: 每分钟token预算（可选）
+        batch_size: 处理行数（可选）
+        model_name: 模型名称
+        translation_memory: 持久化翻译记忆（可选）
+
+    Returns:
+        翻译后的DataFrame（失败行的异常信息在 目标列名_error 列中）
+    """
+    translator = AsyncTranslator(client, model_name, max_concurrency=max_concurrency,
+                                 tokens_per_minute=tokens_per_minute, translation_memory=translation_memory)
+    try:
+        return translator.translate_column(df, source_column, target_column, batch_size=batch_size)
+    finally:
+        translator.close()
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+大文件分块翻译
+按块读取 xlsx / CSV / Parquet，边读边翻译边写出，内存占用只与块大小有关；
+每写完一块就记录已完成的行数和输出位置，中断后重新运行从下一块继续。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 预读线程的结束标记
+_READ_DONE = object()
+
+
+def _iter_csv(path: str, chunksize: int, skip_rows: int) -> Iterator[pd.DataFrame]:
+    # skiprows 从第1行开始跳过，保留表头
+    yield from pd.read_csv(path, chunksize=chunksize, skiprows=range(1, skip_rows + 1))
+
+
+def _iter_parquet(path: str, chunksize: int, skip_rows: int) -> Iterator[pd.DataFrame]:
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        if skip_rows >= batch.num_rows:
+            skip_rows -= batch.num_rows
+            continue
+        chunk = batch.to_pandas()
+        if skip_rows:
+            chunk = chunk.iloc[skip_rows:].reset_index(drop=True)
+            skip_rows = 0
+        yield chunk
+
+
+def _iter_excel(path: str, chunksize: int, skip_rows: int, sheet_name: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    # read_only模式按行流式读取，不会把整个工作表载入内存
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        header = [str(cell) for cell in next(sheet.iter_rows(max_row=1, values_only=True))]
+        rows = []
+        for row in sheet.iter_rows(min_row=skip_rows + 2, values_only=True):
+            rows.append(row)
+            if len(rows) >= chunksize:
+                yield pd.DataFrame(rows, columns=header)
+                rows = []
+        if rows:
+            yield pd.DataFrame(rows, columns=header)
+    finally:
+        workbook.close()
+
+
+def iter_file_chunks(path: str, chunksize: int = 1000, skip_rows: int = 0,
+                     sheet_name: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    按块读取表格文件
+
+    Args:
+        path: 输入文件（.csv / .parquet / .xlsx）
+        chunksize: 每块行数
+        skip_rows: 跳过开头多少行数据（不含表头），用于断点续跑
+        sheet_name: xlsx的工作表名，默认第一个
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return _iter_csv(path, chunksize, skip_rows)
+    if ext == '.parquet':
+        return _iter_parquet(path, chunksize, skip_rows)
+    if ext in ('.xlsx', '.xlsm'):
+        return _iter_excel(path, chunksize, skip_rows, sheet_name)
+    raise ValueError(f"不支持的输入文件格式: {ext}")
+
+
+def _prefetch(chunks: Iterator[pd.DataFrame], size: int) -> Iterator[pd.DataFrame]:
+    """后台线程预读后面的块，读取与翻译重叠进行；队列有界，内存中最多 size+1 块"""
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # 带超时地放入，消费方已退出时不会永远阻塞在满队列上
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+            put(_READ_DONE)
+        except Exception as e:
+            put(e)
+        finally:
+            # 关闭读取生成器，释放输入文件
+            chunks.close()
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _READ_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # 翻译出错或提前退出时通知预读线程停止，并等它关闭文件
+        stop.set()
+        thread.join()
+
+
+class ChunkCheckpoint:
+    """分块翻译的进度文件（JSON），每块写完后原子替换"""
+
+    def __init__(self, path: str, source: str, column_mapping: Dict[str, str]):
+        """
+        加载或新建进度
+
+        Args:
+            path: 进度文件路径
+            source: 输入文件路径
+            column_mapping: 列映射，与已有进度不一致时拒绝续跑
+        """
+        self.path = path
+        self.state = {
+            'source': os.path.abspath(source),
+            'columns': column_mapping,
+            'rows_done': 0,
+            'chunks_done': 0,
+            'output_bytes': 0,
+            'finished': False,
+        }
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('source') != self.state['source'] or saved.get('columns') != column_mapping:
+                raise ValueError(f"进度文件 {path} 与当前任务不一致，请删除后重新运行")
+            self.state.update(saved)
+            logger.info(f"从进度文件恢复：已完成 {self.rows_done} 行（{self.state['chunks_done']} 块）")
+
+    @property
+    def rows_done(self) -> int:
+        return self.state['rows_done']
+
+    def save(self, rows: int, output_bytes: int = 0, finished: bool = False):
+        """记录又完成了 rows 行；先写临时文件再替换，进度文件不会写坏"""
+        self.state['rows_done'] += rows
+        self.state['chunks_done'] += 1 if rows else 0
+        self.state['output_bytes'] = output_bytes or self.state['output_bytes']
+        self.state['finished'] = finished
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class ChunkWriter:
+    """
+    增量写出翻译结果
+
+    .csv / .jsonl 追加写入同一个文件；.parquet 写成目录下的分块文件（pd.read_parquet 可直接读取整个目录）
+    """
+
+    def __init__(self, path: str, resume_bytes: int = 0, resume_chunks: int = 0):
+        self.path = path
+        self.format = os.path.splitext(path)[1].lower().lstrip('.')
+        if self.format not in ('csv', 'jsonl', 'parquet'):
+            raise ValueError(f"不支持的输出文件格式: .{self.format}（支持 .csv / .jsonl / .parquet）")
+        self.chunk_index = resume_chunks
+
+        if self.format == 'parquet':
+            os.makedirs(path, exist_ok=True)
+            self._file = None
+        else:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size < resume_bytes:
+                raise ValueError(f"输出文件 {path} 只有 {size} 字节，少于进度记录的 {resume_bytes} 字节，"
+                                 f"无法续跑；请删除进度文件后重新运行")
+            self._file = open(path, 'a+b')
+            # 中断时可能写了一部分的块：截断到上次记录的位置
+            self._file.truncate(resume_bytes)
+            self._file.seek(resume_bytes)
+
+    def write(self, chunk: pd.DataFrame) -> int:
+        """写入一块并落盘，返回输出文件当前的字节数（parquet返回0）"""
+        if self.format == 'parquet':
+            chunk.to_parquet(os.path.join(self.path, f'part-{self.chunk_index:05d}.parquet'), index=False)
+            self.chunk_index += 1
+            return 0
+
+        if self.format == 'csv':
+            text = chunk.to_csv(index=False, header=self._file.tell() == 0)
+        else:
+            text = chunk.to_json(orient='records', lines=True, force_ascii=False)
+            if not text.endswith('\n'):
+                text += '\n'
+        self._file.write(text.encode('utf-8'))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.chunk_index += 1
+        return self._file.tell()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+async def _translate_chunks_async(chunks: Iterator[pd.DataFrame], translator, column_mapping: Dict[str, str],
+                                  save) -> None:
+    """在一个事件循环中依次翻译所有块；取下一块（可能等待预读）放到线程池中，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, None)
+        if chunk is None:
+            return
+        save(chunk, await translator.translate_multiple_columns_async(chunk, column_mapping))
+
+
+def translate_file(input_path: str, output_path: str, translator, column_mapping: Dict[str, str],
+                   chunksize: int = 1000, sheet_name: Optional[str] = None,
+                   checkpoint_path: Optional[str] = None, prefetch: int = 2) -> str:
+    """
+    分块翻译表格文件
+
+    Args:
+        input_path: 输入文件（.csv / .parquet / .xlsx）
+        output_path: 输出文件（.csv / .jsonl / .parquet目录）
+        translator: DataFrameTranslator 或 AsyncTranslator（后者所有块在同一个事件循环中翻译）
+        column_mapping: 列映射字典 {源列名: 目标列名}
+        chunksize: 每块行数
+        sheet_name: xlsx的工作表名
+        checkpoint_path: 进度文件路径，默认为 output_path + '.progress.json'
+        prefetch: 预读的块数
+
+    Returns:
+        输出文件路径
+    """
+    checkpoint = ChunkCheckpoint(checkpoint_path or output_path.rstrip('/\\') + '.progress.json',
+                                 input_path, column_mapping)
+    if checkpoint.state['finished']:
+        logger.info(f"{input_path} 已全部翻译完成（{checkpoint.rows_done} 行），结果在 {output_path}")
+        return output_path
+
+    # 生成器在第一次取块时才打开文件、启动预读线程
+    chunks = _prefetch(iter_file_chunks(input_path, chunksize, checkpoint.rows_done, sheet_name), prefetch)
+    writer = ChunkWriter(output_path, checkpoint.state['output_bytes'], checkpoint.state['chunks_done'])
+    started = time.time()
+    rows_this_run = 0
+
+    def save(chunk: pd.DataFrame, translated: pd.DataFrame):
+        nonlocal rows_this_run
+        output_bytes = writer.write(translated)
+        checkpoint.save(len(chunk), output_bytes)
+        rows_this_run += len(chunk)
+        elapsed = time.time() - started
+        logger.info(f"已完成 {checkpoint.rows_done} 行（本次 {rows_this_run} 行，"
+                    f"{rows_this_run / elapsed:.1f} 行/秒）")
+
+    try:
+        if hasattr(translator, 'translate_multiple_columns_async'):
+            # 异步翻译器：所有块在同一个事件循环中翻译，而不是每块各起一个事件循环
+            from async_translator import run_sync
+            run_sync(_translate_chunks_async(chunks, translator, column_mapping, save))
+        else:
+            for chunk in chunks:
+                save(chunk, translator.translate_multiple_columns(chunk, column_mapping))
+        checkpoint.save(0, finished=True)
+    finally:
+        chunks.close()
+        writer.close()
+
+    logger.info(f"翻译完成！共 {checkpoint.rows_done} 行，结果保存在 {output_path}")
+    return output_path
@@ -163,7 +163,19 @@ def simple_translate_column(df, client, source_column, target_column=None, batch
 
 # 使用示例：
 """
-# 方法1: 推荐使用（支持并发，效率高）
+# 方法0: 异步引擎（数据量大时推荐）
+# 几百个请求同时进行，重试等待不占线程，tqdm显示进度；失败行的异常信息写入 act_zh_error 列
+from async_translator import translate_dataframe_column_async
+df_translated = translate_dataframe_column_async(
+    df=df,
+    client=client,              # AsyncOpenAI 客户端，或 translate_helper.create_pooled_client(...)
+    source_column='act',
+    target_column='act_zh',
+    max_concurrency=100,        # 同时进行的请求数上限
+    tokens_per_minute=200000    # 每分钟token预算（可选）
+)
+
+# 方法1: 线程池并发（少量数据）
 df_translated = translate_dataframe_column(
     df=df,                      # 你的DataFrame
     client=client,              # 你的API客户端
@@ -191,6 +203,7 @@ df_translated.to_csv('translated_data.csv', index=False)
 
 print("翻译工具已加载完成！")
 print("使用方法：")
-print("1. translate_dataframe_column() - 推荐使用，支持并发")
+print("0. async_translator.translate_dataframe_column_async() - 异步引擎，数据量大时推荐")
+print("1. translate_dataframe_column() - 线程池并发")
 print("2. simple_translate_column() - 简化版本，适合小数据量")
 print("\n请参考代码末尾的使用示例")
@@ -1,30 +1,158 @@
 import pandas as pd
+import collections
+import json
 import logging
+import os
+import re
+import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
-from typing import Optional, List, Union
+from typing import Dict, Optional, List, Union
+
+# 统一的大模型客户端位于 AI文章智能总结 目录
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'AI文章智能总结'))
+
+from adaptive_limiter import AdaptiveConcurrencyLimiter
+from llm_cache import LLMCache, make_cache_key, normalize_prompt
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 单条翻译的系统提示词
+SYSTEM_PROMPT = "你是一名英语翻译专家，请将以下内容翻译为中文，保持原文的语义和语调"
+
+# 批量翻译的系统提示词：输入输出都是带编号的JSON数组，便于逐行校验
+BATCH_SYSTEM_PROMPT = (
+    "你是一名英语翻译专家。你会收到一个JSON数组，每个元素形如 {\"id\": 编号, \"text\": 英文内容}。"
+    "请把每个 text 翻译为中文，保持原文的语义和语调。"
+    "只输出一个JSON数组，每个元素形如 {\"id\": 编号, \"zh\": 中文译文}，编号与输入一一对应，不要输出任何其他内容。"
+)
+
+# 翻译记忆默认位置（可通过环境变量 TRANSLATION_MEMORY 指定），跨运行、跨notebook共享
+DEFAULT_TRANSLATION_MEMORY_PATH = os.environ.get(
+    'TRANSLATION_MEMORY',
+    os.path.join(os.path.expanduser('~'), '.cache', 'myworkspace', 'translation_memory.db')
+)
+# 修改翻译提示词时提升版本号，让旧的翻译记忆失效
+TRANSLATION_TEMPLATE_VERSION = "translate-zh-v1"
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+
+def client_retries(client) -> bool:
+    """是否为自带退避重试的统一客户端（llm_client.LLMClient）；这类客户端外层不再重试，避免上游请求次数成倍放大"""
+    return hasattr(client, 'complete') and hasattr(client, 'max_retries')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计token数：中日韩字符按1个token，其余按4个字符1个token"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def normalize_source(text: str) -> str:
+    """规范化原文：在 normalize_prompt 的基础上合并行内连续空白"""
+    return re.sub(r'[ \t]+', ' ', normalize_prompt(str(text)))
+
+
+def is_failed_translation(text: str) -> bool:
+    """翻译失败时返回的占位文本，不写入翻译记忆"""
+    return text.startswith('[翻译失败') or text.startswith('[处理失败')
+
+
+def translation_memory_key(model_name: str, source: str, system_prompt: str = SYSTEM_PROMPT) -> str:
+    """翻译记忆的键（source为规范化后的原文）"""
+    return make_cache_key(model_name, source, TRANSLATION_TEMPLATE_VERSION, 0.3, system=system_prompt)
+
+
+def open_translation_memory(path: str = DEFAULT_TRANSLATION_MEMORY_PATH, refresh: bool = False) -> LLMCache:
+    """
+    打开持久化的翻译记忆
+
+    Args:
+        path: SQLite文件路径
+        refresh: 为True时忽略已有译文重新翻译（新结果仍会写入）
+    """
+    return LLMCache(path, refresh=refresh)
+
+
+def plan_batches(texts: List[str], max_batch_tokens: int = 1000, max_batch_rows: int = 40) -> List[List[int]]:
+    """
+    按token预算把文本分组，返回每组的下标列表
+
+    空文本不参与分组；单条超过预算的文本单独成组（走单条翻译）
+    """
+    groups, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        if pd.isna(text) or text == "":
+            continue
+        tokens = estimate_tokens(str(text))
+        if tokens >= max_batch_tokens:
+            groups.append([i])
+            continue
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_rows):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def parse_batch_response(content: str) -> dict:
+    """解析批量翻译的返回，得到 {编号: 译文}；格式不对的元素忽略"""
+    content = content.strip()
+    # 去掉模型可能加上的 ```json 代码块标记以及前后的说明文字
+    start, end = content.find('['), content.rfind(']')
+    if start == -1 or end <= start:
+        return {}
+    try:
+        items = json.loads(content[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    results = {}
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and isinstance(item.get('zh'), str) and item['zh'].strip():
+            try:
+                results[int(item.get('id'))] = item['zh'].strip()
+            except (TypeError, ValueError):
+                continue
+    return results
+
+
 class DataFrameTranslator:
     """DataFrame翻译器类"""
 
-    def __init__(self, client, model_name="LongCat-Flash-Chat"):
+    def __init__(self, client, model_name="LongCat-Flash-Chat", concurrency_limiter=None,
+                 translation_memory: Optional[LLMCache] = None, memo_size: int = 50000):
         """
         初始化翻译器
 
         Args:
             client: API客户端对象
             model_name: 使用的模型名称
+            concurrency_limiter: 自适应并发限制器；默认使用客户端自带的（create_pooled_client创建的客户端），
+                                 没有时新建一个，并发数随接口的429/5xx和延迟自动调整
+            translation_memory: 持久化翻译记忆（见 open_translation_memory），None时只在本次运行内去重
+            memo_size: 本次运行内保留的最近译文条数，超出后淘汰最早的（分块翻译大文件时保持内存恒定）
         """
         self.client = client
         self.model_name = model_name
+        self._client_retries = client_retries(client)
+        client_limiter = getattr(client, 'concurrency_limiter', None)
+        # 客户端自带限制器时由客户端在每次HTTP请求上控制，这里不再重复占用名额
+        self._owns_limiter = client_limiter is None
+        self.concurrency_limiter = concurrency_limiter or client_limiter or AdaptiveConcurrencyLimiter()
         self.system_message = {
             "role": "system",
-            "content": "你是一名英语翻译专家，请将以下内容翻译为中文，保持原文的语义和语调"
+            "content": SYSTEM_PROMPT
         }
+        self.translation_memory = translation_memory
+        # 本次运行内的译文（规范化原文 -> 译文），多列翻译时共享
+        self._memo: Dict[str, str] = collections.OrderedDict()
+        self.memo_size = memo_size
 
     def translate_text(self, text: str, max_retries: int = 3) -> str:
         """
@@ -32,13 +160,15 @@ class DataFrameTranslator:
 
         Args:
             text: 要翻译的文本
-            max_retries: 最大重试次数
+            max_retries: 最大重试次数（统一客户端自己重试，此时只调用一次）
 
         Returns:
             翻译后的中文文本
         """
         if pd.isna(text) or text == "":
             return ""
+        if self._client_retries:
+            max_retries = 1
 
         for attempt in range(max_retries):
             try:
@@ -47,13 +177,7 @@ class DataFrameTranslator:
                     {"role": "user", "content": str(text)}
                 ]
 
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=messages,
-                    max_tokens=2048,
-                    temperature=0.3,  # 降低温度以获得更一致的翻译
-                    stream=False
-                )
+                response = self._create_completion(messages)
 
                 result = response.choices[0].message.content.strip()
                 logger.info(f"翻译成功: {str(text)[:50]}... -> {result[:50]}...")
@@ -67,24 +191,136 @@ class DataFrameTranslator:
                     logger.error(f"翻译最终失败: {text[:100]}...")
                     return f"[翻译失败: {str(e)}]"
 
+    def translate_batch(self, texts: List[str], max_retries: int = 3) -> List[str]:
+        """
+        一次请求翻译多条文本
+
+        按编号JSON数组协议发送，逐条校验返回；缺失或解析失败的行单独调用 translate_text 重新翻译
+
+        Args:
+            texts: 要翻译的文本列表（非空）
+            max_retries: 批量请求的最大重试次数（统一客户端自己重试，此时只调用一次）
+
+        Returns:
+            与输入等长的译文列表
+        """
+        if self._client_retries:
+            max_retries = 1
+        payload = json.dumps([{"id": i + 1, "text": str(t)} for i, t in enumerate(texts)], ensure_ascii=False)
+        messages = [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": payload}
+        ]
+        input_tokens = sum(estimate_tokens(str(t)) for t in texts)
+        max_tokens = min(4096, 2 * input_tokens + 64 * len(texts) + 256)
+
+        parsed = {}
+        for attempt in range(max_retries):
+            try:
+                response = self._create_completion(messages, max_tokens=max_tokens)
+                parsed = parse_batch_response(response.choices[0].message.content)
+                break
+            except Exception as e:
+                logger.warning(f"批量翻译失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+                if attempt < max_retries - 1:
+                    time.sleep(2 ** attempt)  # 指数退避
+
+        results = []
+        missing = 0
+        for i, text in enumerate(texts):
+            if i + 1 in parsed:
+                results.append(parsed[i + 1])
+            else:
+                missing += 1
+                results.append(self.translate_text(text))
+        if missing:
+            logger.warning(f"批量翻译 {len(texts)} 条中有 {missing} 条解析失败，已改为单条翻译")
+        else:
+            logger.info(f"批量翻译成功: {len(texts)} 条，约 {input_tokens} tokens")
+        return results
+
+    def _memory_key(self, source: str) -> str:
+        return translation_memory_key(self.model_name, source, self.system_message['content'])
+
+    def lookup_translations(self, sources: List[str]) -> Dict[str, str]:
+        """从本次运行的结果和翻译记忆中查找已有译文（sources为规范化后的原文）"""
+        found = {}
+        for source in sources:
+            if source in self._memo:
+                found[source] = self._memo[source]
+            elif self.translation_memory is not None:
+                cached = self.translation_memory.get(self._memory_key(source))
+                if cached is not None:
+                    found[source] = self._memo[source] = cached
+        return found
+
+    def remember_translation(self, source: str, translation: str):
+        """记录译文；失败的占位文本不记录，下次运行会重新翻译"""
+        if is_failed_translation(translation):
+            return
+        self._memo[source] = translation
+        while len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        if self.translation_memory is not None:
+            self.translation_memory.set(self._memory_key(source), translation, model=self.model_name)
+
+    def _translate_group(self, texts: List[str]) -> List[str]:
+        """单条走 translate_text，多条走 translate_batch"""
+        if len(texts) == 1:
+            return [self.translate_text(texts[0])]
+        return self.translate_batch(texts)
+
+    def _create_completion(self, messages, max_tokens: int = 2048):
+        """调用接口；客户端没有自带限制器时由翻译器的限制器控制并发"""
+        def create():
+            return self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=0.3,  # 降低温度以获得更一致的翻译
+                stream=False
+            )
+
+        if not self._owns_limiter:
+            return create()
+        with self.concurrency_limiter.slot() as outcome:
+            try:
+                response = create()
+            except Exception as e:
+                # openai SDK 的异常带 status_code；没有时按网络错误处理
+                outcome['status'] = getattr(e, 'status_code', None)
+                raise
+            outcome['status'] = 200
+            return response
+
     def translate_column(self,
                         df: pd.DataFrame,
                         source_column: str,
                         target_column: Optional[str] = None,
-                        max_workers: int = 3,
-                        batch_size: Optional[int] = None) -> pd.DataFrame:
+                        max_workers: Optional[int] = None,
+                        batch_size: Optional[int] = None,
+                        batched: bool = False,
+                        max_batch_tokens: int = 1000,
+                        copy: bool = True) -> pd.DataFrame:
         """
         翻译DataFrame中指定列的内容
 
+        原文先规范化再去重，每个不同的原文只翻译一次，已在翻译记忆中的直接复用；
+        batched为True时按token预算把多条短文本合并为一次请求，系统提示词只发送一次，
+        适合大量短文本（如提示词数据集）
+
         Args:
             df: 源DataFrame
             source_column: 要翻译的列名
             target_column: 翻译结果存储的列名，如果为None则为 source_column + '_zh'
-            max_workers: 并发线程数
+            max_workers: 线程数上限；实际并发由自适应限制器决定，None时取限制器的上限
             batch_size: 批处理大小，如果为None则处理所有行
+            batched: 是否合并多行为一次请求
+            max_batch_tokens: 合并请求时每批输入文本的token预算
+            copy: 为False时直接在df上写入结果列，不复制整个DataFrame
 
         Returns:
-            包含翻译结果的新DataFrame
+            包含翻译结果的DataFrame
         """
         # 验证输入
         if source_column not in df.columns:
@@ -95,7 +331,7 @@ class DataFrameTranslator:
             target_column = f"{source_column}_zh"
 
         # 创建副本
-        df_result = df.copy()
+        df_result = df.copy() if copy else df
 
         # 确定处理范围
         if batch_size is not None:
@@ -103,59 +339,76 @@ class DataFrameTranslator:
         else:
             df_to_process = df_result
 
-        # 获取需要翻译的文本列表
-        texts_to_translate = df_to_process[source_column].tolist()
-        indices = df_to_process.index.tolist()
-
-        logger.info(f"开始翻译 {len(texts_to_translate)} 条记录...")
+        # 规范化并去重，查找已有译文
+        sources = df_to_process[source_column]
+        normalized = sources[sources.notna()].map(normalize_source)
+        # 只有空白的原文规范化后为空串，与空文本一样不翻译，结果为空字符串
+        normalized = normalized[normalized != ""]
+        unique_texts = normalized.unique().tolist()
+        translations = self.lookup_translations(unique_texts)
+        texts_to_translate = [text for text in unique_texts if text not in translations]
+
+        if max_workers is None:
+            max_workers = self.concurrency_limiter.max_limit
+        logger.info(f"开始翻译 {len(sources)} 条记录：去重后 {len(unique_texts)} 条，"
+                    f"已有译文 {len(translations)} 条，需要翻译 {len(texts_to_translate)} 条"
+                    f"（线程数上限 {max_workers}，当前并发 {self.concurrency_limiter.limit}）...")
+
+        # 分组：批量模式按token预算合并，否则每行一组
+        if batched:
+            groups = plan_batches(texts_to_translate, max_batch_tokens)
+            logger.info(f"批量模式: {len(groups)} 个请求（每批约 {max_batch_tokens} tokens）")
+        else:
+            groups = [[i] for i in range(len(texts_to_translate))]
 
         # 并发翻译
-        translated_texts = [''] * len(texts_to_translate)
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # 提交翻译任务
-            future_to_index = {
-                executor.submit(self.translate_text, text): i
-                for i, text in enumerate(texts_to_translate)
+            future_to_group = {
+                executor.submit(self._translate_group, [texts_to_translate[i] for i in group]): group
+                for group in groups
             }
 
             # 收集结果
             completed = 0
-            for future in as_completed(future_to_index):
-                idx = future_to_index[future]
+            for future in as_completed(future_to_group):
+                group = future_to_group[future]
                 try:
-                    result = future.result()
-                    translated_texts[idx] = result
-                    completed += 1
-
-                    # 显示进度
-                    if completed % 5 == 0 or completed == len(texts_to_translate):
-                        logger.info(f"翻译进度: {completed}/{len(texts_to_translate)}")
-
+                    for idx, result in zip(group, future.result()):
+                        translations[texts_to_translate[idx]] = result
+                        self.remember_translation(texts_to_translate[idx], result)
                 except Exception as e:
-                    logger.error(f"处理第{idx}条记录时出错: {e}")
-                    translated_texts[idx] = f"[处理失败: {str(e)}]"
+                    logger.error(f"处理第{group[0]}条起的 {len(group)} 条记录时出错: {e}")
+                    for idx in group:
+                        translations[texts_to_translate[idx]] = f"[处理失败: {str(e)}]"
+                completed += len(group)
 
-        # 将翻译结果添加到DataFrame
-        for i, original_idx in enumerate(indices):
-            df_result.loc[original_idx, target_column] = translated_texts[i]
+                # 显示进度
+                logger.info(f"翻译进度: {completed}/{len(texts_to_translate)}")
 
-        logger.info(f"翻译完成！结果保存在列 '{target_column}' 中")
+        # 按规范化原文映射回所有行（空文本为空字符串）
+        translated = normalized.map(translations).reindex(df_to_process.index, fill_value='')
+        df_result.loc[df_to_process.index, target_column] = translated
+
+        logger.info(f"翻译完成！结果保存在列 '{target_column}' 中，最终并发 {self.concurrency_limiter.limit}")
         return df_result
 
     def translate_multiple_columns(self,
                                  df: pd.DataFrame,
                                  column_mapping: dict,
-                                 max_workers: int = 3,
-                                 batch_size: Optional[int] = None) -> pd.DataFrame:
+                                 max_workers: Optional[int] = None,
+                                 batch_size: Optional[int] = None,
+                                 batched: bool = False) -> pd.DataFrame:
         """
         翻译多个列
 
         Args:
             df: 源DataFrame
             column_mapping: 列映射字典 {源列名: 目标列名}
-            max_workers: 并发线程数
+            max_workers: 线程数上限，None时由自适应限制器决定
             batch_size: 批处理大小
+            batched: 是否合并多行为一次请求
 
         Returns:
             包含所有翻译结果的DataFrame
@@ -169,15 +422,34 @@ class DataFrameTranslator:
                 source_col,
                 target_col,
                 max_workers=max_workers,
-                batch_size=batch_size
+                batch_size=batch_size,
+                batched=batched,
+                copy=False  # 已经复制过一次，各列直接写入同一个副本
             )
 
         return df_result
 
 
+def create_pooled_client(base_url: str, api_key: Optional[str] = None, max_connections: int = 10):
+    """
+    创建带连接池的大模型客户端
+
+    返回对象支持 client.chat.completions.create(...)，可直接传给 DataFrameTranslator；
+    多线程翻译时复用长连接，失败按 Retry-After / 抖动退避自动重试
+
+    Args:
+        base_url: OpenAI兼容接口地址（如 https://aigc.sankuai.com/v1/openai/native）
+        api_key: API密钥（Friday使用AppId）
+        max_connections: 该端点的最大并发连接数，建议不小于 max_workers
+    """
+    from llm_client import get_llm_client
+    return get_llm_client(base_url, api_key, max_connections=max_connections)
+
+
 # 使用示例函数
 def translate_dataframe_column(df, client, source_column, target_column=None,
-                             max_workers=3, batch_size=None, model_name="LongCat-Flash-Chat"):
+                             max_workers=3, batch_size=None, model_name="LongCat-Flash-Chat",
+                             translation_memory=None):
     """
     便捷函数：翻译DataFrame中的指定列
 
@@ -189,11 +461,12 @@ def translate_dataframe_column(df, client, source_column, target_column=None,
         max_workers: 并发数
         batch_size: 批处理大小
         model_name: 模型名称
+        translation_memory: 持久化翻译记忆（可选，见 open_translation_memory）
 
     Returns:
         翻译后的DataFrame
     """
-    translator = DataFrameTranslator(client, model_name)
+    translator = DataFrameTranslator(client, model_name, translation_memory=translation_memory)
     return translator.translate_column(df, source_column, target_column, max_workers, batch_size)
 
 
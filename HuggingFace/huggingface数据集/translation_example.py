@@ -2,7 +2,7 @@
 
 # 导入必要的库
 import pandas as pd
-from translate_helper import DataFrameTranslator, translate_dataframe_column, batch_translate_column
+from translate_helper import DataFrameTranslator, translate_dataframe_column, batch_translate_column, open_translation_memory
 
 # 假设你已经有了client对象和df数据
 # client = ... (你的API客户端)
@@ -12,8 +12,9 @@ from translate_helper import DataFrameTranslator, translate_dataframe_column, ba
 def example_class_based_translation(df, client):
     """使用DataFrameTranslator类进行翻译"""
 
-    # 创建翻译器实例
-    translator = DataFrameTranslator(client, model_name="LongCat-Flash-Chat")
+    # 创建翻译器实例；翻译记忆保存已翻译过的原文，重复运行或换notebook时直接复用
+    translator = DataFrameTranslator(client, model_name="LongCat-Flash-Chat",
+                                     translation_memory=open_translation_memory())
 
     # 翻译单个列
     # 将'act'列翻译为中文，结果保存在'act_zh'列
@@ -22,7 +23,8 @@ def example_class_based_translation(df, client):
         source_column='act',           # 要翻译的列名
         target_column='act_zh',        # 翻译结果列名（可选，默认为源列名_zh）
         max_workers=3,                 # 并发线程数
-        batch_size=20                  # 处理前20行
+        batch_size=20,                 # 处理前20行
+        batched=True                   # 多条短文本合并为一次请求（按token预算分批）
     )
 
     return df_translated
@@ -96,11 +98,34 @@ def example_apply_method(df, client):
 
     return df_copy
 
+# 方法5: 大文件分块翻译（边读边写，内存恒定，中断后重新运行自动续跑）
+def example_file_translation(client):
+    """分块翻译整个文件"""
+    from async_translator import AsyncTranslator
+    from file_translator import translate_file
+
+    translator = AsyncTranslator(client, max_concurrency=100,
+                                 translation_memory=open_translation_memory())
+    # 进度记录在 chatgptprompts_zh.csv.progress.json 中
+    try:
+        return translate_file(
+            'chatgptprompts.xlsx',        # 输入：.xlsx / .csv / .parquet
+            'chatgptprompts_zh.csv',      # 输出：.csv / .jsonl / .parquet（目录）
+            translator,
+            {'act': 'act_zh', 'prompt': 'prompt_zh'},
+            chunksize=1000
+        )
+    finally:
+        translator.close()  # 关闭异步连接池
+
 # 实际使用示例
 if __name__ == "__main__":
     # 假设你有以下数据和客户端
     # df = pd.read_csv('your_data.csv')  # 你的数据
     # client = YourAPIClient()           # 你的API客户端
+    # 或使用带连接池的统一客户端（多线程翻译时复用长连接）：
+    # from translate_helper import create_pooled_client
+    # client = create_pooled_client("https://aigc.sankuai.com/v1/openai/native", "你的AppID")
 
     # 示例数据（用于测试）
     sample_data = {
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BD维度聚合新开客户挖掘流水线
+把 BD维度聚合新开客户挖掘.ipynb 中逐个单元格手动执行的分析整理为可导入的函数和命令行：
+BD聚集阈值 → 二级标签展开 → 标签下BD聚集 → 同BD新老客户配对 → 收货距离和地址相似度 → 距离分桶 → 聚集客户筛选。
+输入转存为Parquet，配对打分结果按输入文件和参数缓存，只调整阈值重新运行时不会重复计算。
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from distance_calculate import GeoDistanceCalculator
+from text_similar import AddressCache, calculate_similarity_scores
+
+logger = logging.getLogger(__name__)
+
+# 修改配对或打分逻辑后提升版本号，让旧的缓存失效
+PIPELINE_VERSION = 'bd-aggregation-v1'
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'BD_PIPELINE_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'myworkspace', 'bd_pipeline')
+)
+
+NEW_PERIOD_28D = '近28天新开'
+NEW_PERIOD_56D = '近29~56天新开'
+FINISHED_NEW_PERIOD = '走完新客期'
+
+BD_KEYS = ['area_name', 'org_name', 'first_bd_name']
+# 转为分类类型的字符串键
+CATEGORY_COLUMNS = ['area_name', 'org_name', 'first_bd_name', 'new_begin_period', 'is_achieve_new_period']
+
+PAIR_COLUMNS = ['customer_id', 'first_arranged_ord_date', 'first_arranged_ord_belong_bd_id',
+                'delivery_address', 'longitude', 'latitude']
+RELATED_COLUMNS = {
+    'customer_id': 'related_customer_id',
+    'first_arranged_ord_date': 'related_cust_first_ord_date',
+    'delivery_address': 'related_address',
+    'longitude': 'related_longitude',
+    'latitude': 'related_latitude',
+}
+REPORT_COLUMNS = ['customer_id', 'poi_name', 'new_begin_period', 'first_arranged_ord_dt', 'first_bd_name',
+                  'org_name', 'is_yellow_line_cust', 'is_strategy_triggered', 'delivery_address',
+                  'poi_delivery_distance', 'related_customer_id', 'related_cust_first_ord_date',
+                  'related_address', '新老客收货距离', '新老客收货地址相似度']
+DISTANCE_BINS = [-1, 100, 200, 300, 400, 500, 600, 700, 800, 900, 1000, 1500, 2000, 3000, 5000, 10000, np.inf]
+
+
+def file_signature(path: str) -> str:
+    """按路径、大小和修改时间生成文件签名，文件变化后缓存自动失效"""
+    stat = os.stat(path)
+    raw = f'{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def read_table(path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """读取 .parquet / .xlsx / .csv；xlsx和csv第一次读取后转存为Parquet，之后直接读Parquet"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        return pd.read_parquet(path)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    parquet_path = os.path.join(cache_dir, f'{name}-{file_signature(path)}.parquet')
+    if os.path.exists(parquet_path):
+        return pd.read_parquet(parquet_path)
+    df = pd.read_excel(path) if ext in ('.xlsx', '.xls') else pd.read_csv(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    df.to_parquet(parquet_path, index=False)
+    logger.info(f"已转存为Parquet: {parquet_path}")
+    return df
+
+
+def load_customers(path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """加载命中标签的新开客户，只保留近两个新开周期，字符串键转为分类类型"""
+    df = read_table(path, cache_dir)
+    df = df[df['new_begin_period'].isin([NEW_PERIOD_28D, NEW_PERIOD_56D])].reset_index(drop=True)
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+
+def _hit_rates(df: pd.DataFrame) -> Dict[str, float]:
+    """黄线、红线命中率（分母为黄线标记为0/1的客户数）"""
+    customers = df.loc[df['is_yellow_line_cust'].isin([0, 1]), 'customer_id'].nunique()
+    if not customers:
+        return {'yellow_rate': np.nan, 'red_rate': np.nan, 'customers': 0}
+    return {
+        'yellow_rate': df['is_yellow_line_cust'].sum() / customers,
+        'red_rate': df['is_strategy_triggered'].sum() / customers,
+        'customers': customers,
+    }
+
+
+def hit_rates(df: pd.DataFrame) -> Dict[str, float]:
+    """命中标签的客户中，命中黄线客户占比、命中红线客户占比"""
+    return _hit_rates(df)
+
+
+def bd_customer_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """每个BD名下的新开客户数（cust_cnt），降序"""
+    counts = (df.groupby(BD_KEYS, observed=True)['customer_id'].nunique()
+              .rename('cust_cnt').reset_index().sort_values('cust_cnt', ascending=False))
+    return counts.reset_index(drop=True)
+
+
+def threshold_report(df: pd.DataFrame, bd_counts: pd.DataFrame, thresholds: Iterable[int] = range(1, 30)) -> pd.DataFrame:
+    """
+    BD聚集阈值分析：名下新开客户数不少于阈值的BD，其两个新开周期客户的黄线、红线命中率
+    """
+    merged = df.merge(bd_counts, on=BD_KEYS, how='left')
+    merged = merged[merged['is_yellow_line_cust'].isin([0, 1])]
+    rows = []
+    for threshold in thresholds:
+        selected = merged[merged['cust_cnt'] >= threshold]
+        row = {'threshold': threshold, 'bd_cnt': int((bd_counts['cust_cnt'] >= threshold).sum())}
+        for label, period in (('56d', NEW_PERIOD_56D), ('28d', NEW_PERIOD_28D)):
+            rates = _hit_rates(selected[selected['new_begin_period'] == period])
+            row[f'yellow_rate_{label}'] = rates['yellow_rate']
+            row[f'red_rate_{label}'] = rates['red_rate']
+            row[f'cust_cnt_{label}'] = rates['customers']
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def explode_level2_tags(df: pd.DataFrame) -> pd.DataFrame:
+    """把 level2Tags（形如 ["A","B"] 的字符串）展开为每个标签一行"""
+    tags = df['level2Tags'].astype(str).str.strip('[]').str.replace('"', '').str.split(',')
+    expanded = df.assign(level2Tags=tags).explode('level2Tags', ignore_index=True)
+    expanded['level2Tags'] = expanded['level2Tags'].str.strip().astype('category')
+    return expanded
+
+
+def tag_customer_counts(expand_df: pd.DataFrame) -> pd.Series:
+    """每个二级标签下的客户数，降序"""
+    return (expand_df.groupby('level2Tags', observed=True)['customer_id'].nunique()
+            .sort_values(ascending=False))
+
+
+def select_tag_rows(expand_df: pd.DataFrame, tag_counts: pd.Series, min_tag_customers: int = 10) -> pd.DataFrame:
+    """
+    保留客户数不少于 min_tag_customers 的二级标签，并统计每个周期、每个BD在这些标签下的客户数（second_expand_bd_cnt）
+
+    注：notebook中 (second_tag_cust_cnt['customer_id'] >= 10).index 实际选中了全部标签，
+    min_tag_customers=0 可复现该结果
+    """
+    tags = tag_counts[tag_counts >= min_tag_customers].index
+    selected = expand_df[expand_df['level2Tags'].isin(tags)].drop_duplicates()
+    keys = ['new_begin_period'] + BD_KEYS
+    bd_cnt = (selected.groupby(keys, observed=True)['customer_id'].nunique()
+              .rename('second_expand_bd_cnt').reset_index())
+    return selected.merge(bd_cnt, on=keys, how='left').sort_values('first_bd_name', ascending=False)
+
+
+def build_customer_pairs(tag_df: pd.DataFrame, require_finished: bool = True) -> pd.DataFrame:
+    """
+    近28天新开客户与同一BD（first_arranged_ord_belong_bd_id）名下的其他近28天、近29~56天新开客户配对
+
+    Args:
+        tag_df: select_tag_rows 的结果
+        require_finished: 是否只取走完新客期的近28天新开客户作为左侧
+    """
+    is_28d = tag_df['new_begin_period'] == NEW_PERIOD_28D
+    left = tag_df[is_28d & (tag_df['is_achieve_new_period'] == FINISHED_NEW_PERIOD)] if require_finished else tag_df[is_28d]
+    related_28d = tag_df.loc[is_28d, PAIR_COLUMNS].rename(columns=RELATED_COLUMNS)
+    related_56d = tag_df.loc[tag_df['new_begin_period'] == NEW_PERIOD_56D, PAIR_COLUMNS].rename(columns=RELATED_COLUMNS)
+
+    pairs = pd.concat([
+        left.merge(related_28d, on='first_arranged_ord_belong_bd_id', how='left'),
+        left.merge(related_56d, on='first_arranged_ord_belong_bd_id', how='left'),
+    ], ignore_index=True)
+    pairs = pairs[pairs['customer_id'] != pairs['related_customer_id']]
+    return pairs.drop_duplicates().reset_index(drop=True)
+
+
+def score_pairs(pairs: pd.DataFrame, address_cache: Optional[AddressCache] = None) -> pd.DataFrame:
+    """计算新老客收货距离、收货地址相似度和数值相似度（相同/包含记为1）"""
+    pairs = pairs.copy()
+    pairs['新老客收货距离'] = GeoDistanceCalculator.calculate_distances(
+        pairs['latitude'], pairs['longitude'], pairs['related_latitude'], pairs['related_longitude'])
+    pairs['delivery_address'] = pairs['delivery_address'].fillna('').astype(str)
+    pairs['related_address'] = pairs['related_address'].fillna('').astype(str)
+    pairs['新老客收货地址相似度'] = calculate_similarity_scores(
+        pairs['delivery_address'], pairs['related_address'], cache=address_cache)
+    pairs['数值相似度'] = numeric_similarity(pairs['新老客收货地址相似度'])
+    return pairs
+
+
+def numeric_similarity(similarity: pd.Series) -> pd.Series:
+    """相同、包含记为1，其余为数值"""
+    return pd.to_numeric(similarity.where(~similarity.isin(['相同', '包含']), 1), errors='coerce')
+
+
+def scored_pairs_cached(customers: pd.DataFrame, source_signature: str, min_tag_customers: int = 10,
+                        require_finished: bool = True, cache_dir: str = DEFAULT_CACHE_DIR,
+                        refresh: bool = False) -> pd.DataFrame:
+    """
+    标签展开 → 配对 → 打分，结果按 输入文件签名 + 参数 缓存为Parquet
+
+    只调整距离、相似度、关联客户数等阈值时直接读取缓存
+    """
+    key = hashlib.sha1(json.dumps({
+        'version': PIPELINE_VERSION,
+        'source': source_signature,
+        'min_tag_customers': min_tag_customers,
+        'require_finished': require_finished,
+    }, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    cache_path = os.path.join(cache_dir, f'scored_pairs-{key}.parquet')
+    if os.path.exists(cache_path) and not refresh:
+        logger.info(f"读取缓存的配对结果: {cache_path}")
+        pairs = pd.read_parquet(cache_path)
+        # 相似度列只缓存了 相同/包含 标签，数值从 数值相似度 还原
+        labels = pairs['新老客收货地址相似度']
+        pairs['新老客收货地址相似度'] = labels.astype(object).where(labels.notna(), pairs['数值相似度'])
+        return pairs
+
+    expand_df = explode_level2_tags(customers)
+    tag_df = select_tag_rows(expand_df, tag_customer_counts(expand_df), min_tag_customers)
+    pairs = build_customer_pairs(tag_df, require_finished)
+    logger.info(f"配对完成: {len(pairs)} 对，开始计算距离和地址相似度")
+    address_cache = AddressCache()
+    try:
+        pairs = score_pairs(pairs, address_cache)
+    finally:
+        address_cache.close()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    similarity = pairs['新老客收货地址相似度']
+    labels = similarity.where(similarity.isin(['相同', '包含'])).astype('string')
+    pairs.assign(新老客收货地址相似度=labels).to_parquet(cache_path, index=False)
+    return pairs
+
+
+def distance_buckets(pairs: pd.DataFrame) -> pd.Series:
+    """新老客收货距离分桶计数"""
+    return pd.cut(pairs['新老客收货距离'], bins=DISTANCE_BINS).value_counts().sort_index()
+
+
+def near_pairs(pairs: pd.DataFrame, max_distance: float = 200) -> pd.DataFrame:
+    """收货距离不超过 max_distance 米的配对，按距离升序"""
+    columns = [c for c in REPORT_COLUMNS + ['数值相似度'] if c in pairs.columns]
+    return pairs.loc[pairs['新老客收货距离'] <= max_distance, columns].sort_values('新老客收货距离')
+
+
+def clustered_customers(pairs: pd.DataFrame, min_related: int = 3, min_similarity: float = 0.5,
+                        near_distance: float = 50) -> List:
+    """
+    聚集客户：地址相似度不低于 min_similarity 或距离不超过 near_distance 米的关联客户不少于 min_related 个
+
+    关联客户按 related_customer_id 去重计数（notebook中按配对行数计数，同一客户命中多个标签时会重复）
+    """
+    matched = pairs[(pairs['数值相似度'] >= min_similarity) | (pairs['新老客收货距离'] <= near_distance)]
+    related_cnt = matched.groupby('customer_id')['related_customer_id'].nunique()
+    return related_cnt[related_cnt >= min_related].index.tolist()
+
+
+def run_pipeline(input_path: str, output_path: Optional[str] = None, max_distance: float = 200,
+                 near_distance: float = 50, min_similarity: float = 0.5, min_related: int = 3,
+                 min_tag_customers: int = 10, require_finished: bool = True,
+                 cache_dir: str = DEFAULT_CACHE_DIR, refresh: bool = False) -> Dict:
+    """
+    运行完整流水线
+
+    Returns:
+        各步骤结果：hit_rates, bd_counts, threshold_report, pairs, distance_buckets, near_pairs,
+        clustered_customers, result（聚集客户的配对明细）
+    """
+    customers = load_customers(input_path, cache_dir)
+    bd_counts = bd_customer_counts(customers)
+    pairs = scored_pairs_cached(customers, file_signature(input_path), min_tag_customers,
+                                require_finished, cache_dir, refresh)
+    near = near_pairs(pairs, max_distance)
+    clustered = clustered_customers(near, min_related, min_similarity, near_distance)
+    result = near[near['customer_id'].isin(clustered)
+                  & ((near['数值相似度'] >= min_similarity) | (near['新老客收货距离'] <= near_distance))].drop_duplicates()
+
+    if output_path:
+        ext = os.path.splitext(output_path)[1].lower()
+        if ext == '.parquet':
+            result.assign(新老客收货地址相似度=result['新老客收货地址相似度'].astype(str)).to_parquet(output_path, index=False)
+        elif ext == '.csv':
+            result.to_csv(output_path, index=False)
+        else:
+            result.to_excel(output_path, index=False)
+
+    return {
+        'hit_rates': hit_rates(customers),
+        'bd_counts': bd_counts,
+        'threshold_report': threshold_report(customers, bd_counts),
+        'pairs': pairs,
+        'distance_buckets': distance_buckets(pairs),
+        'near_pairs': near,
+        'clustered_customers': clustered,
+        'result': result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BD维度聚合新开客户挖掘')
+    parser.add_argument('input', help='命中标签的新开客户明细（.parquet / .xlsx / .csv）')
+    parser.add_argument('-o', '--output', help='聚集客户配对明细的输出文件（.xlsx / .csv / .parquet）')
+    parser.add_argument('--max-distance', type=float, default=200, help='配对明细保留的最大收货距离（米）')
+    parser.add_argument('--near-distance', type=float, default=50, help='视为关联的收货距离（米）')
+    parser.add_argument('--min-similarity', type=float, default=0.5, help='视为关联的地址相似度')
+    parser.add_argument('--min-related', type=int, default=3, help='聚集客户的最少关联客户数')
+    parser.add_argument('--min-tag-customers', type=int, default=10, help='参与分析的二级标签最少客户数')
+    parser.add_argument('--all-new', action='store_true', help='近28天新开客户不限制走完新客期')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='中间结果缓存目录')
+    parser.add_argument('--refresh', action='store_true', help='忽略缓存重新配对打分')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = run_pipeline(args.input, args.output, args.max_distance, args.near_distance, args.min_similarity,
+                           args.min_related, args.min_tag_customers, not args.all_new, args.cache_dir, args.refresh)
+
+    rates = results['hit_rates']
+    print(f"📊 命中标签的客户 {rates['customers']} 个，黄线命中率 {rates['yellow_rate']:.2%}，红线命中率 {rates['red_rate']:.2%}")
+    print("\n📈 BD聚集阈值分析:")
+    print(results['threshold_report'].to_string(index=False, float_format=lambda x: f'{x:.2%}'))
+    print("\n📏 新老客收货距离分布:")
+    print(results['distance_buckets'].to_string())
+    print(f"\n🎯 聚集客户 {len(results['clustered_customers'])} 个，配对明细 {len(results['result'])} 行")
+    if args.output:
+        print(f"💾 结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
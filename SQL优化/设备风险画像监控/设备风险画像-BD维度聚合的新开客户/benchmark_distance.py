@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+距离计算基准测试
+在随机生成的点对上比较 DataFrame.apply 逐行调用标量方法 与 向量化方法 的耗时和误差，
+以及同BD下笛卡尔积再过滤 与 radius_join 网格分桶 的耗时
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from distance_calculate import GeoDistanceCalculator, radius_join
+
+
+def make_pairs(n, seed=0):
+    """在一个城市范围内（约50公里）随机生成n个点对"""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(31.0, 31.5, size=n)
+    lon = rng.uniform(121.2, 121.7, size=n)
+    return pd.DataFrame({
+        'latitude': lat,
+        'longitude': lon,
+        'related_latitude': lat + rng.normal(0, 0.01, size=n),
+        'related_longitude': lon + rng.normal(0, 0.01, size=n),
+    })
+
+
+def make_customers(n, bd_count, seed):
+    """随机生成n个客户，平均分到bd_count个BD名下"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'customer_id': np.arange(n),
+        'first_bd_name': rng.integers(0, bd_count, size=n),
+        'latitude': rng.uniform(31.0, 31.5, size=n),
+        'longitude': rng.uniform(121.2, 121.7, size=n),
+    })
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='距离计算基准测试')
+    parser.add_argument('-n', '--pairs', type=int, default=1_000_000, help='点对数量')
+    parser.add_argument('--customers', type=int, default=20_000, help='半径连接测试中每侧的客户数')
+    parser.add_argument('--bds', type=int, default=50, help='半径连接测试中的BD数')
+    parser.add_argument('--radius', type=float, default=50, help='半径连接的半径（米）')
+    args = parser.parse_args()
+
+    df = make_pairs(args.pairs)
+    print(f"📏 {len(df):,} 个点对")
+
+    scalar, scalar_time = timed(lambda: df.apply(
+        lambda x: GeoDistanceCalculator.calculate_distance(
+            x['latitude'], x['longitude'], x['related_latitude'], x['related_longitude']), axis=1).to_numpy())
+    print(f"apply + 标量方法:   {scalar_time:8.3f}s")
+
+    for dtype in ('float64', 'float32'):
+        vector, vector_time = timed(lambda: GeoDistanceCalculator.calculate_distances(
+            df['latitude'], df['longitude'], df['related_latitude'], df['related_longitude'], dtype=dtype))
+        max_error = float(np.max(np.abs(vector.astype('float64') - scalar)))
+        print(f"向量化 ({dtype}):  {vector_time:8.3f}s  加速 {scalar_time / vector_time:7.1f}x  最大误差 {max_error:.4f}m")
+
+    # 一个点对多个点
+    _, broadcast_time = timed(lambda: GeoDistanceCalculator.calculate_distances(
+        31.23, 121.47, df['related_latitude'], df['related_longitude']))
+    print(f"一对多广播:         {broadcast_time:8.3f}s")
+
+    # 半径连接：同BD下全量笛卡尔积再过滤 vs 网格分桶
+    new_cust = make_customers(args.customers, args.bds, seed=1)
+    old_cust = make_customers(args.customers, args.bds, seed=2)
+    print(f"\n📍 半径连接：{args.customers:,} x {args.customers:,} 个客户，{args.bds} 个BD，半径 {args.radius}m")
+
+    def cross_join():
+        pairs = new_cust.merge(old_cust, on='first_bd_name', suffixes=('', '_related'))
+        pairs['distance'] = GeoDistanceCalculator.calculate_distances(
+            pairs['latitude'], pairs['longitude'], pairs['latitude_related'], pairs['longitude_related'])
+        return pairs[pairs['distance'] <= args.radius]
+
+    crossed, cross_time = timed(cross_join)
+    joined, join_time = timed(lambda: radius_join(new_cust, old_cust, args.radius, by='first_bd_name'))
+    same = len(crossed) == len(joined)
+    print(f"笛卡尔积 + 过滤:    {cross_time:8.3f}s  {len(crossed):,} 对")
+    print(f"radius_join:        {join_time:8.3f}s  {len(joined):,} 对  加速 {cross_time / join_time:7.1f}x  结果一致: {same}")
+
+
+if __name__ == "__main__":
+    main()
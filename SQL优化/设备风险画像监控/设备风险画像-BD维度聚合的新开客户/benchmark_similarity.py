@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+地址相似候选对筛选基准测试
+在随机生成的模板化地址（"XX路N号M号楼"）上检查 AddressNgramIndex.candidate_pairs：
+不限制 max_postings 时结果与两两比较完全一致；默认 max_postings 时检查的地址对数远小于 n(n-1)/2，
+且共享路名的相似地址对一个不漏。
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from text_similar import AddressNgramIndex
+
+CHARS = '东西南北中华人民建设解放和平幸福光明长江黄河金桥张江川沙浦锦绣世纪花木龙阳高科'
+
+
+def make_addresses(n, road_count=300, seed=0):
+    """随机生成n个模板化地址"""
+    rng = random.Random(seed)
+    roads = [''.join(rng.choice(CHARS) for _ in range(2)) for _ in range(road_count)]
+    return [f"上海市浦东新区{rng.choice(roads)}路{rng.randint(1, 300)}号{rng.randint(1, 30)}号楼"
+            for _ in range(n)]
+
+
+def brute_force_pairs(index, threshold):
+    """两两比较，得到与 candidate_pairs 判定条件相同的全部条目对"""
+    pairs = set()
+    for a, b in itertools.combinations(range(len(index.keys)), 2):
+        g1, g2 = index.grams[a], index.grams[b]
+        shared = len(g1 & g2)
+        if shared / (len(g1) + len(g2) - shared) >= threshold or shared == min(len(g1), len(g2)):
+            pairs.add((a, b))
+    return pairs
+
+
+def expected_same_road(index):
+    """同一条路、楼号相同、门牌号只差一位数字以内的地址对（应当被筛出的典型重复地址）"""
+    groups = {}
+    for k, key in enumerate(index.keys):
+        road, _, rest = key.partition('路')
+        number, _, building = rest.partition('号')
+        groups.setdefault((road, building), []).append((k, number))
+    for members in groups.values():
+        for (a, na), (b, nb) in itertools.combinations(members, 2):
+            if len(na) == len(nb) and sum(x != y for x, y in zip(na, nb)) <= 1:
+                yield min(a, b), max(a, b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='地址相似候选对筛选基准测试')
+    parser.add_argument('--exact-n', type=int, default=1500, help='与两两比较对照的地址数')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 4000, 8000, 16000], help='规模测试的地址数')
+    parser.add_argument('--threshold', type=float, default=0.3, help='Jaccard阈值')
+    parser.add_argument('--max-postings', type=int, default=1000, help='规模测试使用的 max_postings')
+    args = parser.parse_args()
+
+    index = AddressNgramIndex(make_addresses(args.exact_n))
+    expected = brute_force_pairs(index, args.threshold)
+    got = {(a, b) for a, b, _ in index.candidate_pairs(args.threshold, max_postings=None)}
+    print(f"🔍 {len(index.keys):,} 个地址，不限制 max_postings：候选对 {len(got):,}，"
+          f"两两比较 {len(expected):,}，结果一致: {got == expected}")
+
+    print(f"\n📈 max_postings={args.max_postings}")
+    for n in args.sizes:
+        index = AddressNgramIndex(make_addresses(n, seed=n))
+        started = time.perf_counter()
+        got = {(a, b) for a, b, _ in index.candidate_pairs(args.threshold, args.max_postings)}
+        elapsed = time.perf_counter() - started
+        all_pairs = len(index.keys) * (len(index.keys) - 1) // 2
+        # 路名相同且只差门牌号/楼号的地址对
+        same_road = set(expected_same_road(index))
+        found = len(same_road & got)
+        print(f"{n:>7,} 个地址: 检查 {index.examined:>12,} 对（全部的 {index.examined / all_pairs:6.2%}），"
+              f"候选 {len(got):>10,} 对，{elapsed:6.2f}s，同路名相似对召回 {found}/{len(same_road)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 ## 1.ADDRESS_DISTANCE_NEAR
 from math import sin, asin, cos, radians, sqrt
 
+try:
+    import numpy as np
+except ImportError:  # 只用标量方法时不需要numpy
+    np = None
+
 class GeoDistanceCalculator:
     """
     地理距离计算器，用于计算两个地理坐标点之间的距离。
@@ -29,4 +34,93 @@ class GeoDistanceCalculator:
         c = 2 * asin(sqrt(a))
         # 计算最终距离
         distance = GeoDistanceCalculator.EARTH_RADIUS * c
-        return distance
\ No newline at end of file
+        return distance
+
+    @staticmethod
+    def calculate_distances(lat1, lon1, lat2, lon2, dtype='float64'):
+        """
+        批量计算坐标点之间的距离（向量化，一次计算所有点对）。
+
+        参数:
+        lat1, lon1 -- 第一组地点的纬度和经度（数组、pandas Series或标量）
+        lat2, lon2 -- 第二组地点的纬度和经度，形状与第一组相同，或为标量（一个点对多个点）
+        dtype -- 计算精度，'float32' 更省内存、更快，误差在米级；'float64' 与标量方法一致
+
+        返回:
+        距离数组，单位为米；任一坐标为空值时结果为NaN。
+        """
+        if np is None:
+            raise ImportError("calculate_distances 需要安装numpy")
+        lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=dtype)) for v in (lat1, lon1, lat2, lon2))
+        # 根据半正矢公式计算两点间的距离
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        # 浮点误差可能让a略大于1，先截断
+        c = 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+        return (GeoDistanceCalculator.EARTH_RADIUS * c).astype(dtype, copy=False)
+
+
+def radius_join(left, right, radius, by=None, left_coords=('latitude', 'longitude'),
+                right_coords=('latitude', 'longitude'), suffixes=('', '_related'), distance_column='distance'):
+    """
+    半径连接：返回 left 与 right 中距离不超过 radius 米的所有点对。
+
+    先把点按网格分桶（格子边长不小于 radius），每个左侧点只与自身及相邻8个格子内的右侧点计算距离，
+    候选集规模与结果规模相当，避免先做全量笛卡尔积再按距离过滤。
+
+    参数:
+    left, right -- 两个DataFrame
+    radius -- 半径，单位为米
+    by -- 分区键（列名或列名列表，如 first_bd_name），只在键相同的点之间连接
+    left_coords, right_coords -- (纬度列, 经度列)
+    suffixes -- 两侧同名列的后缀，同 pd.merge
+    distance_column -- 距离列名
+
+    返回:
+    点对DataFrame（左侧列 + 右侧列 + 距离列）；坐标为空的行不参与连接；不处理跨180°经线的情况。
+    """
+    if np is None:
+        raise ImportError("radius_join 需要安装numpy")
+    import pandas as pd
+
+    by = [by] if isinstance(by, str) else list(by or [])
+    left_lat, left_lon = left_coords
+    right_lat, right_lon = right_coords
+    left = left[left[left_lat].notna() & left[left_lon].notna()].reset_index(drop=True)
+    right = right[right[right_lat].notna() & right[right_lon].notna()].reset_index(drop=True)
+
+    # 纬度方向的格子高度；经度方向按数据中最高纬度放宽，保证格子宽度处处不小于radius
+    lat_step = np.degrees(radius / GeoDistanceCalculator.EARTH_RADIUS)
+    max_abs_lat = max([np.abs(df[col]).max() for df, col in ((left, left_lat), (right, right_lat)) if len(df)] or [0])
+    lon_step = lat_step / np.cos(np.radians(min(max_abs_lat, 85.0)))
+
+    def cells(df, lat_col, lon_col, pos_col):
+        keys = df[by].copy()
+        keys['_cell_y'] = np.floor(df[lat_col].to_numpy(dtype='float64') / lat_step).astype('int64')
+        keys['_cell_x'] = np.floor(df[lon_col].to_numpy(dtype='float64') / lon_step).astype('int64')
+        keys[pos_col] = np.arange(len(df))
+        return keys
+
+    right_cells = cells(right, right_lat, right_lon, '_right_pos')
+    left_cells = cells(left, left_lat, left_lon, '_left_pos')
+    # 每个左侧点展开到3x3邻域格子；右侧点只属于一个格子，所以每个点对最多出现一次
+    left_cells = pd.concat([left_cells.assign(_cell_y=left_cells['_cell_y'] + dy, _cell_x=left_cells['_cell_x'] + dx)
+                            for dy in (-1, 0, 1) for dx in (-1, 0, 1)], ignore_index=True)
+    candidates = left_cells.merge(right_cells, on=by + ['_cell_y', '_cell_x'])
+
+    left_pos = candidates['_left_pos'].to_numpy()
+    right_pos = candidates['_right_pos'].to_numpy()
+    distance = GeoDistanceCalculator.calculate_distances(
+        left[left_lat].to_numpy()[left_pos], left[left_lon].to_numpy()[left_pos],
+        right[right_lat].to_numpy()[right_pos], right[right_lon].to_numpy()[right_pos])
+    keep = distance <= radius
+    left_pos, right_pos = left_pos[keep], right_pos[keep]
+
+    # 拼接两侧的列，同名列按suffixes重命名（与pd.merge一致，分区键只保留一份）
+    right_part = right.drop(columns=by).iloc[right_pos].reset_index(drop=True)
+    overlap = set(left.columns) & set(right_part.columns)
+    result = pd.concat([
+        left.iloc[left_pos].reset_index(drop=True).rename(columns={c: c + suffixes[0] for c in overlap}),
+        right_part.rename(columns={c: c + suffixes[1] for c in overlap}),
+    ], axis=1)
+    result[distance_column] = distance[keep]
+    return result
@@ -3,13 +3,91 @@ from typing import List
 from collections import Counter
 import Levenshtein
 
+import itertools
+import math
+import os
 import re
-from typing import List
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
 import addressparser
 
+try:
+    # rapidfuzz>=3.6 提供逐对批量计算的 cpdist（C++实现，多线程）
+    from rapidfuzz.distance import Levenshtein as RapidLevenshtein
+    from rapidfuzz.process import cpdist
+    HAS_RAPIDFUZZ = True
+except ImportError:
+    HAS_RAPIDFUZZ = False
+
+# 标准化地址缓存的默认位置（可通过环境变量 ADDRESS_CACHE 指定），跨notebook运行共享
+DEFAULT_ADDRESS_CACHE_PATH = os.environ.get(
+    'ADDRESS_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'myworkspace', 'address_cache.db')
+)
+
+
+class AddressCache:
+    """
+    标准化地址的持久化缓存（SQLite），条目数超过上限时按最近访问时间淘汰。
+    """
+
+    def __init__(self, db_path: str = DEFAULT_ADDRESS_CACHE_PATH, max_entries: int = 500000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS addresses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_addresses_access ON addresses(last_access)")
+        self.conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """批量查询，返回命中的 {key: value}"""
+        found = {}
+        now = time.time()
+        # SQLite单条语句的参数个数有限制，分批查询
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f"SELECT key, value FROM addresses WHERE key IN ({placeholders})", batch).fetchall()
+            found.update(rows)
+            self.conn.executemany("UPDATE addresses SET last_access = ? WHERE key = ?",
+                                  [(now, key) for key, _ in rows])
+        self.conn.commit()
+        return found
+
+    def set_many(self, mapping: Dict[str, str]):
+        """批量写入，写入后按上限淘汰"""
+        now = time.time()
+        self.conn.executemany("INSERT OR REPLACE INTO addresses (key, value, last_access) VALUES (?, ?, ?)",
+                              [(key, value, now) for key, value in mapping.items()])
+        count = self.conn.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute("""
+                DELETE FROM addresses WHERE key IN (
+                    SELECT key FROM addresses ORDER BY last_access ASC LIMIT ?
+                )
+            """, (count - self.max_entries,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
 class AddressProcessor:
     # 可配置的特殊区域列表
     SPECIAL_AREAS = ['开发区', '高新区']
+    # 预编译的正则
+    BRACKETS_PATTERN = re.compile(r'（[^）]+）')
+    NON_WORD_PATTERN = re.compile(r'[^a-zA-Z0-9\u4e00-\u9fa5]')
 
     @staticmethod
     def preprocess(address: str) -> str:
@@ -31,7 +109,7 @@ class AddressProcessor:
         移除括号及括号内的内容。
         """
         address = AddressProcessor.normalize_brackets(address)
-        return re.sub(r'（[^）]+）', '', address)
+        return AddressProcessor.BRACKETS_PATTERN.sub('', address)
 
     @staticmethod
     def retain_alphanumeric_and_chinese(address: str) -> str:
@@ -39,7 +117,7 @@ class AddressProcessor:
         保留字母、数字和中文字符，移除其他字符。
         """
         address = AddressProcessor.remove_brackets_content(address)
-        return re.sub(r'[^a-zA-Z0-9\u4e00-\u9fa5]', '', address)
+        return AddressProcessor.NON_WORD_PATTERN.sub('', address)
 
     @staticmethod
     def parse(address: str) -> str:
@@ -74,17 +152,103 @@ class AddressProcessor:
         # 移除特殊区域
         return cls.remove_special_areas(parsed)
 
+    @classmethod
+    def process_batch(cls, addresses: Iterable[str], cache: Optional[AddressCache] = None) -> List[str]:
+        """
+        批量处理地址，结果与逐个调用 process 相同。
+        输入先去重，缓存中没有的地址清洗后一次性交给 addressparser.transform 解析。
+        """
+        addresses = list(addresses)
+        unique = list(dict.fromkeys(addresses))
+        # 特殊区域列表变化时旧的缓存结果不再适用
+        prefix = '|'.join(cls.SPECIAL_AREAS) + '#'
+        cached = cache.get_many([prefix + a for a in unique]) if cache is not None else {}
+        results = {a: cached[prefix + a] for a in unique if prefix + a in cached}
+
+        cleaned = {a: cls.retain_alphanumeric_and_chinese(cls.preprocess(a)) for a in unique if a not in results}
+        to_parse = list(dict.fromkeys(c for c in cleaned.values() if c.strip()))
+        parsed = dict(zip(to_parse, addressparser.transform(to_parse)['地名'].tolist())) if to_parse else {}
+        new_results = {a: cls.remove_special_areas(parsed[c]) if c.strip() else '' for a, c in cleaned.items()}
+
+        if cache is not None and new_results:
+            cache.set_many({prefix + a: v for a, v in new_results.items()})
+        results.update(new_results)
+        return [results[a] for a in addresses]
+
 
 def calculate_similarity_score(addr1: str, addr2: str) -> str:
     processed_addr1 = AddressProcessor.process(addr1)
     processed_addr2 = AddressProcessor.process(addr2)
-    
+    return similarity_of_processed(processed_addr1, processed_addr2)
+
+def calculate_similarity_scores(addrs1: Iterable[str], addrs2: Iterable[str],
+                                cache: Optional[AddressCache] = None, workers: int = -1) -> list:
+    """
+    批量计算地址对的相似度，结果与逐对调用 calculate_similarity_score 相同
+    （唯一的区别：两个地址标准化后都为空时返回NaN，而不是抛出除零异常）。
+
+    每个不同的地址只标准化一次，相同的标准化地址对只计算一次，
+    需要编辑距离的地址对交给 levenshtein_distances 批量并行计算。
+    """
+    addrs1, addrs2 = list(addrs1), list(addrs2)
+    unique = list(dict.fromkeys(addrs1 + addrs2))
+    processed = dict(zip(unique, AddressProcessor.process_batch(unique, cache)))
+    scores = score_processed_pairs(((processed[a], processed[b]) for a, b in zip(addrs1, addrs2)), workers)
+    return [scores[(processed[a], processed[b])] for a, b in zip(addrs1, addrs2)]
+
+def score_processed_pairs(pairs: Iterable[Tuple[str, str]], workers: int = -1) -> dict:
+    """对已标准化的地址对批量计算相似度，返回 {(地址1, 地址2): 结果}，相同的地址对只计算一次"""
+    scores = {}
+    need_distance = []
+    for pair in dict.fromkeys(pairs):
+        result = _similarity_without_distance(*pair)
+        if result is None:
+            need_distance.append(pair)
+        else:
+            scores[pair] = result
+    distances = levenshtein_distances([p[0] for p in need_distance], [p[1] for p in need_distance], workers)
+    for (p1, p2), distance in zip(need_distance, distances):
+        total = len(p1) + len(p2)
+        scores[(p1, p2)] = 1 - distance / total if total else float('nan')
+    return scores
+
+def _levenshtein_chunk(pairs):
+    return [Levenshtein.distance(a, b) for a, b in pairs]
+
+def levenshtein_distances(strs1: List[str], strs2: List[str], workers: int = -1) -> List[int]:
+    """
+    逐对批量计算编辑距离。
+    安装了rapidfuzz时用 cpdist 多线程计算，否则地址对较多时分块交给多进程。
+    workers 为 -1 时使用全部CPU核。
+    """
+    if not strs1:
+        return []
+    if HAS_RAPIDFUZZ:
+        return cpdist(strs1, strs2, scorer=RapidLevenshtein.distance, workers=workers).tolist()
+    pairs = list(zip(strs1, strs2))
+    workers = (os.cpu_count() or 1) if workers == -1 else workers
+    if workers <= 1 or len(pairs) < 10000:
+        return _levenshtein_chunk(pairs)
+    size = -(-len(pairs) // (workers * 4))
+    chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [d for chunk in executor.map(_levenshtein_chunk, chunks) for d in chunk]
+
+def _similarity_without_distance(processed_addr1: str, processed_addr2: str):
+    """不需要编辑距离就能确定的结果（nan、相同、包含），其余返回None"""
     if 'nan' in (processed_addr1, processed_addr2):
         return 0
     
     min_len = min(len(processed_addr1), len(processed_addr2))
     if min_len >= 4 and (processed_addr1 in processed_addr2 or processed_addr2 in processed_addr1):
         return '相同' if processed_addr1 == processed_addr2 else '包含'
+    return None
+
+def similarity_of_processed(processed_addr1: str, processed_addr2: str):
+    """对已标准化的两个地址计算相似度"""
+    result = _similarity_without_distance(processed_addr1, processed_addr2)
+    if result is not None:
+        return result
     
     # return Levenshtein.ratio(processed_addr1, processed_addr2)
     return 1 - Levenshtein.distance(processed_addr1, processed_addr2) / (len(processed_addr1) + len(processed_addr2))
@@ -95,10 +259,138 @@ def compare_shipping_addresses(addr1: str, addr2: str, addr3: str, addr4: str) -
         (addr2, addr3), (addr2, addr4)
     ]
     scores = [calculate_similarity_score(a, b) for a, b in comparisons]
-    
+    return combine_scores(scores)
+
+def compare_shipping_addresses_bulk(addrs1: Iterable[str], addrs2: Iterable[str], addrs3: Iterable[str],
+                                    addrs4: Iterable[str], cache: Optional[AddressCache] = None,
+                                    workers: int = -1) -> list:
+    """
+    批量版 compare_shipping_addresses：每行的4组比较合并成一次批量计算，结果与逐行调用相同。
+    """
+    addrs1, addrs2, addrs3, addrs4 = list(addrs1), list(addrs2), list(addrs3), list(addrs4)
+    n = len(addrs1)
+    scores = calculate_similarity_scores(addrs1 + addrs1 + addrs2 + addrs2,
+                                         addrs3 + addrs4 + addrs3 + addrs4, cache, workers)
+    # 第i行的4个比较结果位于 i, n+i, 2n+i, 3n+i
+    return [combine_scores(scores[i::n]) for i in range(n)]
+
+def combine_scores(scores: list):
+    """合并多组比较结果：相同 > 包含 > 最大的数值相似度"""
     if '相同' in scores:
         return '相同'
     if '包含' in scores:
         return '包含'
     # print(scores)
-    return max((score for score in scores if isinstance(score, float)), default=0)
\ No newline at end of file
+    return max((score for score in scores if isinstance(score, float)), default=0)
+
+class AddressNgramIndex:
+    """
+    标准化地址的字符n-gram倒排索引。
+    用于在整个区域内找出可能相似的地址对（候选对），只对候选对计算精确的编辑距离相似度。
+    """
+
+    def __init__(self, addresses: Iterable[str], n: int = 2, cache: Optional[AddressCache] = None):
+        """
+        参数:
+        addresses -- 原始地址列表
+        n -- n-gram长度，2为二元组，3为三元组
+        cache -- 标准化地址缓存
+        """
+        self.n = n
+        self.addresses = list(addresses)
+        # 标准化结果相同的原始地址合并为一个条目：{标准化地址: [原始地址下标]}
+        self.groups: Dict[str, List[int]] = {}
+        for i, processed in enumerate(AddressProcessor.process_batch(self.addresses, cache)):
+            self.groups.setdefault(processed, []).append(i)
+        self.keys = [p for p in self.groups if p and p != 'nan']
+        self.grams = [self.ngrams(p) for p in self.keys]
+        self.examined = 0
+        # 倒排表中的条目编号按升序追加
+        self.postings: Dict[str, List[int]] = {}
+        for k, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(k)
+
+    def ngrams(self, text: str) -> set:
+        if len(text) <= self.n:
+            return {text}
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def candidate_pairs(self, jaccard_threshold: float = 0.3, max_postings: Optional[int] = 1000):
+        """
+        生成候选对 (条目1, 条目2, jaccard)，条目1 < 条目2。
+        较短地址的n-gram全部出现在较长地址中（可能是"包含"关系）时，即使Jaccard低于阈值也保留。
+
+        使用前缀过滤：每个条目的n-gram按出现的条目数从少到多排序，Jaccard不低于t的两个条目
+        在各自前 len - ceil(t*len) + 1 个n-gram中必有一个相同，所以只对这些较少见的n-gram建倒排表。
+        地址很短、模板化（门牌号、"号楼"）时前缀里仍有常见n-gram，再用 max_postings 跳过，
+        每个条目检查的候选数不超过 前缀长度 * max_postings，总开销随地址数线性增长。
+        检查过的条目对数记录在 self.examined。
+
+        参数:
+        jaccard_threshold -- n-gram集合的Jaccard相似度阈值；短地址只差一两个数字时Jaccard较低，
+                             要找出相似度0.9以上的地址对建议用0.3左右的二元组阈值
+        max_postings -- 出现在超过这么多条目中的n-gram不参与生成候选，None表示不限制（结果精确，但模板化的
+                        地址会退化为接近两两比较）；只靠门牌号、"号楼"等常见n-gram相似的地址对会被漏掉，
+                        共享路名、小区名等较少见n-gram的地址对不受影响
+        """
+        def skipped(gram):
+            return max_postings is not None and len(self.postings[gram]) > max_postings
+
+        # 按全局出现次数排序，次数相同按n-gram本身排序，保证所有条目使用同一顺序
+        ordered = [sorted(grams, key=lambda g: (len(self.postings[g]), g)) for grams in self.grams]
+
+        # 包含关系：短条目的全部n-gram都在长条目中，长条目必然出现在短条目最少见n-gram的倒排表中
+        contained: Dict[int, set] = {}
+        for k, grams in enumerate(self.grams):
+            if skipped(ordered[k][0]):
+                continue
+            for other in self.postings[ordered[k][0]]:
+                if other != k and len(self.grams[other]) >= len(grams) and grams <= self.grams[other]:
+                    contained.setdefault(max(k, other), set()).add(min(k, other))
+
+        # 逐个条目先用前缀查询已建索引的条目，再把自己的前缀加入索引，每个候选对只出现一次
+        prefix_postings: Dict[str, List[int]] = {}
+        self.examined = 0
+        for k, grams in enumerate(self.grams):
+            prefix = ordered[k][:len(grams) - math.ceil(jaccard_threshold * len(grams) - 1e-9) + 1]
+            seen = set(contained.get(k, ()))
+            for gram in prefix:
+                if not skipped(gram):
+                    seen.update(prefix_postings.setdefault(gram, []))
+            for gram in prefix:
+                prefix_postings.setdefault(gram, []).append(k)
+
+            self.examined += len(seen)
+            for other in seen:
+                other_grams = self.grams[other]
+                shared = len(grams & other_grams)
+                jaccard = shared / (len(grams) + len(other_grams) - shared)
+                if jaccard >= jaccard_threshold or shared == min(len(grams), len(other_grams)):
+                    yield other, k, jaccard
+
+
+def search_similar_addresses(addresses: Iterable[str], jaccard_threshold: float = 0.3, n: int = 2,
+                             cache: Optional[AddressCache] = None, workers: int = -1,
+                             max_postings: Optional[int] = 1000) -> List[Tuple[int, int, object]]:
+    """
+    在一批地址中查找相似的地址对：先用n-gram倒排索引按Jaccard阈值筛出候选对，再计算精确相似度。
+    max_postings 的含义见 AddressNgramIndex.candidate_pairs。
+
+    返回:
+    [(下标1, 下标2, 相似度)]，下标1 < 下标2，相似度语义与 calculate_similarity_score 相同；
+    标准化后完全相同的地址两两成对返回。
+    """
+    index = AddressNgramIndex(addresses, n, cache)
+    candidates = [(index.keys[a], index.keys[b])
+                  for a, b, _ in index.candidate_pairs(jaccard_threshold, max_postings)]
+    duplicates = [p for p in index.keys if len(index.groups[p]) > 1]
+    scores = score_processed_pairs(candidates + [(p, p) for p in duplicates], workers)
+
+    results = []
+    for p in duplicates:
+        results.extend((i, j, scores[(p, p)]) for i, j in itertools.combinations(index.groups[p], 2))
+    for p1, p2 in candidates:
+        results.extend((min(i, j), max(i, j), scores[(p1, p2)])
+                       for i in index.groups[p1] for j in index.groups[p2])
+    return results
@@ -1,28 +1,155 @@
-from typing import Any
-import httpx
-from mcp.server.fastmcp import FastMCP
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator
 
-# Initialize FastMCP server
-mcp = FastMCP("weather")
+import httpx
+from mcp.server.fastmcp import Context, FastMCP
 
 # Constants
 NWS_API_BASE = "https://api.weather.gov"
 USER_AGENT = "weather-app/1.0"
+POINTS_TTL = 24 * 3600  # /points grid mappings almost never change
+DEFAULT_TTL = 60  # forecasts and alerts without cache headers
+MAX_TTL = 3600
+ALERTS_PAGE_SIZE = 10
 
-async def make_nws_request(url: str) -> dict[str, Any] | None:
-    """Make a request to the NWS API with proper error handling."""
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept": "application/geo+json"
-    }
-    async with httpx.AsyncClient() as client:
+
+class NWSClient:
+    """NWS API client shared for the server lifetime.
+
+    Keeps one pooled httpx.AsyncClient, caches successful responses
+    (honoring Cache-Control/Expires) and coalesces concurrent requests
+    for the same URL into a single upstream call.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._client: httpx.AsyncClient | None = None
+        self._cache: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.upstream_requests = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT, "Accept": "application/geo+json"},
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, url: str, ttl: float | None = None) -> dict[str, Any] | None:
+        """GET a JSON document, served from cache when fresh.
+
+        Args:
+            url: Full request URL
+            ttl: Fixed cache lifetime in seconds; None means use the response's cache headers
+        """
+        cached = self._cache.get(url)
+        if cached is not None:
+            expires_at, data = cached
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(url)
+                return data
+            del self._cache[url]
+
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._fetch(url, ttl))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # shield: one caller being cancelled must not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url: str, ttl: float | None) -> dict[str, Any] | None:
+        self.upstream_requests += 1
         try:
-            response = await client.get(url, headers=headers, timeout=30.0)
+            response = await self.client.get(url)
             response.raise_for_status()
-            return response.json()
+            data = response.json()
         except Exception:
             return None
 
+        lifetime = ttl if ttl is not None else cache_lifetime(response.headers)
+        if lifetime > 0:
+            self._cache[url] = (time.monotonic() + lifetime, data)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return data
+
+
+def cache_lifetime(headers: httpx.Headers) -> float:
+    """Seconds a response may be cached according to Cache-Control/Expires."""
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match:
+        return min(int(match.group(1)), MAX_TTL)
+    if "expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["expires"])
+            now = parsedate_to_datetime(headers["date"]) if "date" in headers else None
+            seconds = expires.timestamp() - (now.timestamp() if now else time.time())
+            return max(0, min(seconds, MAX_TTL))
+        except (TypeError, ValueError):
+            return 0
+    return DEFAULT_TTL
+
+
+nws = NWSClient()
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Close the pooled HTTP client when the server shuts down."""
+    try:
+        yield
+    finally:
+        await nws.aclose()
+
+
+# Initialize FastMCP server
+mcp = FastMCP("weather", lifespan=lifespan)
+
+
+async def make_nws_request(url: str, ttl: float | None = None) -> dict[str, Any] | None:
+    """Make a request to the NWS API with proper error handling."""
+    return await nws.get(url, ttl)
+
+async def report_progress(ctx: Context | None, progress: float, total: float, message: str) -> None:
+    """Send a progress notification when the tool is called through MCP."""
+    if ctx is not None:
+        await ctx.report_progress(progress, total, message)
+
+
+def parse_cursor(cursor: str | None, page_size: int = 1) -> tuple[int, str | None]:
+    """Cursors are opaque to clients; internally they are "offset:snapshot".
+
+    The snapshot is the "updated" stamp of the alert list the offset refers to, so a
+    cursor is rejected once the live list has changed instead of skipping or repeating alerts.
+    """
+    if page_size < 1:
+        raise ValueError(f"page_size must be >= 1, got {page_size}")
+    if not cursor:
+        return 0, None
+    offset, _, snapshot = cursor.partition(":")
+    if not offset.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return int(offset), snapshot or None
+
+
 def format_alert(feature: dict) -> str:
     """Format an alert feature into a readable string."""
     props = feature["properties"]
@@ -35,26 +162,46 @@ Instructions: {props.get('instruction', 'No specific instructions provided')}
 """
 
 @mcp.tool()
-async def get_alerts(state: str) -> str:
-    """Get weather alerts for a US state.
+async def get_alerts(state: str, cursor: str | None = None, page_size: int = ALERTS_PAGE_SIZE,
+                     ctx: Context | None = None) -> str:
+    """Get weather alerts for a US state, one page at a time.
 
     Args:
         state: Two-letter US state code (e.g. CA, NY)
+        cursor: Cursor returned by the previous page; omit for the first page.
+            A cursor expires when the live alert list changes (NWS updates it every minute or so).
+        page_size: Number of alerts per page
     """
+    start, snapshot = parse_cursor(cursor, page_size)
+    await report_progress(ctx, 0, 2, f"Fetching alerts for {state}")
     url = f"{NWS_API_BASE}/alerts/active/area/{state}"
     data = await make_nws_request(url)
 
     if not data or "features" not in data:
         return "Unable to fetch alerts or no alerts found."
 
-    if not data["features"]:
+    features = data["features"]
+    if not features:
         return "No active alerts for this state."
-
-    alerts = [format_alert(feature) for feature in data["features"]]
-    return "\n---\n".join(alerts)
+    updated = data.get("updated", "")
+    if snapshot is not None and snapshot != updated:
+        return ("The active alert list has changed since the previous page; "
+                "call get_alerts again without a cursor to start over.")
+
+    page = features[start:start + page_size]
+    if not page:
+        return f"No more alerts (cursor is past the {len(features)} active alerts)."
+    await report_progress(ctx, 1, 2, f"Formatting alerts {start + 1}-{start + len(page)} of {len(features)}")
+    alerts = [format_alert(feature) for feature in page]
+    end = start + len(page)
+    footer = f"\nShowing alerts {start + 1}-{end} of {len(features)}."
+    if end < len(features):
+        footer += f' More alerts available: call get_alerts again with cursor="{end}:{updated}".'
+    await report_progress(ctx, 2, 2, "Done")
+    return "\n---\n".join(alerts) + footer
 
 @mcp.tool()
-async def get_forecast(latitude: float, longitude: float) -> str:
+async def get_forecast(latitude: float, longitude: float, ctx: Context | None = None) -> str:
     """Get weather forecast for a location.
 
     Args:
@@ -62,14 +209,16 @@ async def get_forecast(latitude: float, longitude: float) -> str:
         longitude: Longitude of the location
     """
     # First get the forecast grid endpoint
+    await report_progress(ctx, 0, 2, "Looking up forecast grid")
     points_url = f"{NWS_API_BASE}/points/{latitude},{longitude}"
-    points_data = await make_nws_request(points_url)
+    points_data = await make_nws_request(points_url, ttl=POINTS_TTL)
 
     if not points_data:
         return "Unable to fetch forecast data for this location."
 
     # Get the forecast URL from the points response
     forecast_url = points_data["properties"]["forecast"]
+    await report_progress(ctx, 1, 2, "Fetching forecast")
     forecast_data = await make_nws_request(forecast_url)
 
     if not forecast_data:
@@ -87,6 +236,7 @@ Forecast: {period['detailedForecast']}
 """
         forecasts.append(forecast)
 
+    await report_progress(ctx, 2, 2, "Done")
     return "\n---\n".join(forecasts)
 
 if __name__ == "__main__":
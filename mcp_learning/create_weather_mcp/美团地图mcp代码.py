@@ -1,17 +1,244 @@
+import asyncio
+import json
 import os
-import os
+import sqlite3
+import sys
+import time
+from contextlib import asynccontextmanager
 from typing import List, Union
 
 import httpx
 from mcp.server.fastmcp import FastMCP, Context
 
-# 创建MCP服务器实例
-mcp = FastMCP("meituan-map")
+# 令牌桶限速器位于 爬取AI咨询 目录
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '爬取AI咨询'))
+
+from rate_limiter import TokenBucket
+
+# 地址标准化、直线距离复用设备风险画像中的 AddressProcessor、GeoDistanceCalculator
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'SQL优化',
+                             '设备风险画像监控', '设备风险画像-BD维度聚合的新开客户'))
+
+from distance_calculate import GeoDistanceCalculator
+
+try:
+    from text_similar import AddressProcessor
+    HAS_ADDRESS_PROCESSOR = True
+except ImportError:  # 缺少 addressparser 等依赖时只做空白和标点清洗
+    HAS_ADDRESS_PROCESSOR = False
 
 # 设置API密钥，从美团地图开放平台获取
 api_key = os.getenv('MEITUAN_MAPS_API_KEY')
 api_url = "https://lbsapi.meituan.com"
 
+# 每秒请求数上限（所有工具共享），按开放平台账号的QPS配额设置
+MAX_QPS = float(os.getenv('MEITUAN_MAPS_QPS', '20'))
+# 批量工具的最大条数和每页默认条数
+MAX_BATCH_SIZE = 5000
+BATCH_PAGE_SIZE = 200
+
+# 地理编码缓存（可通过环境变量 MEITUAN_GEO_CACHE 指定位置）
+DEFAULT_GEO_CACHE_PATH = os.getenv(
+    'MEITUAN_GEO_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'myworkspace', 'meituan_geo_cache.db')
+)
+GEOCODE_TTL = 30 * 24 * 3600  # 地址对应的坐标很少变化
+REGEO_TTL = 7 * 24 * 3600  # 周边POI会变化，过期时间短一些
+ROUTE_TTL = 24 * 3600
+# 逆地理编码、路线按坐标保留的小数位数缓存，5位约1米
+REGEO_PRECISION = 5
+# 路线矩阵每页的最大点对数和默认起点数
+MAX_MATRIX_PAIRS = 10000
+MATRIX_PAGE_SIZE = 50
+ROUTE_STRATEGIES = {"driving": "RECOMMEND", "riding": "S"}
+
+_http_client: httpx.AsyncClient = None
+_rate_limiter = TokenBucket(MAX_QPS, capacity=MAX_QPS)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """服务器生命周期内共享的连接池客户端"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+    return _http_client
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """服务器关闭时释放连接池"""
+    try:
+        yield
+    finally:
+        if _http_client is not None:
+            await _http_client.aclose()
+        geo_cache.close()
+
+
+# 创建MCP服务器实例
+mcp = FastMCP("meituan-map", lifespan=lifespan)
+
+
+async def request_api(path: str, params: dict) -> dict:
+    """经过QPS限速和共享连接池调用美团地图API，返回JSON结果"""
+    await _rate_limiter.acquire_async()
+    response = await get_http_client().get(f"{api_url}{path}", params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+async def gather_unique(items: list, call, max_concurrency: int, ctx: Context = None) -> List[dict]:
+    """
+    对去重后的输入并发调用 call，按输入顺序返回结果
+
+    每条结果为 {"result": ..., "error": None} 或 {"result": None, "error": "..."}，单条失败不影响其他条；
+    传入 ctx 时每完成一条发送一次进度通知
+    """
+    unique = list(dict.fromkeys(items))
+    semaphore = asyncio.Semaphore(max_concurrency)
+    done = 0
+
+    async def run(item):
+        nonlocal done
+        async with semaphore:
+            try:
+                outcome = {"result": await call(item), "error": None}
+            except Exception as e:
+                outcome = {"result": None, "error": str(e)}
+        done += 1
+        if ctx is not None:
+            await ctx.report_progress(done, len(unique), f"{done}/{len(unique)}")
+        return outcome
+
+    outcomes = dict(zip(unique, await asyncio.gather(*(run(item) for item in unique))))
+    return [outcomes[item] for item in items]
+
+
+def parse_cursor(cursor: str = None, page_size: int = 1) -> int:
+    """游标对调用方不透明，内部为输入列表的偏移量；同时检查 page_size，为0时 next_cursor 不前进会导致调用方死循环"""
+    if page_size < 1:
+        raise Exception(f"page_size must be >= 1, got {page_size}")
+    if not cursor:
+        return 0
+    if not str(cursor).isdigit():
+        raise Exception(f"Invalid cursor: {cursor}")
+    return int(cursor)
+
+
+def page_info(start: int, size: int, total: int) -> dict:
+    """分页信息，next_cursor 为 None 表示已是最后一页"""
+    end = start + size
+    return {"total": total, "cursor": str(start), "next_cursor": str(end) if end < total else None}
+
+
+class GeoCache:
+    """
+    地理编码结果的持久化缓存（SQLite），每条记录带过期时间，并统计命中情况
+    """
+
+    def __init__(self, db_path: str = DEFAULT_GEO_CACHE_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geo_cache (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+        # 按类型（geocode/regeo）统计本次运行的命中、未命中和过期次数
+        self.stats = {}
+
+    def _count(self, kind: str, field: str):
+        counters = self.stats.setdefault(kind, {"hits": 0, "misses": 0, "expired": 0})
+        counters[field] += 1
+
+    def get(self, kind: str, key: str):
+        """查询缓存，未命中或已过期返回None"""
+        row = self.conn.execute("SELECT value, expires_at FROM geo_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count(kind, "misses")
+            return None
+        if row[1] <= time.time():
+            self._count(kind, "expired")
+            self._count(kind, "misses")
+            self.conn.execute("DELETE FROM geo_cache WHERE key = ?", (key,))
+            self.conn.commit()
+            return None
+        self._count(kind, "hits")
+        return json.loads(row[0])
+
+    def set(self, kind: str, key: str, value: dict, ttl: float):
+        self.conn.execute("INSERT OR REPLACE INTO geo_cache (key, kind, value, expires_at) VALUES (?, ?, ?, ?)",
+                          (key, kind, json.dumps(value, ensure_ascii=False), time.time() + ttl))
+        self.conn.commit()
+
+    def purge_expired(self) -> int:
+        """删除已过期的记录，返回删除条数"""
+        deleted = self.conn.execute("DELETE FROM geo_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        self.conn.commit()
+        return deleted
+
+    def summary(self) -> dict:
+        """缓存条目数和本次运行的命中率"""
+        entries = dict(self.conn.execute("SELECT kind, COUNT(*) FROM geo_cache GROUP BY kind").fetchall())
+        kinds = {}
+        for kind, counters in self.stats.items():
+            lookups = counters["hits"] + counters["misses"]
+            kinds[kind] = {**counters, "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None}
+        return {"db_path": self.db_path, "entries": entries, "stats": kinds}
+
+    def close(self):
+        self.conn.close()
+
+
+geo_cache = GeoCache()
+
+
+def normalize_address(address: str) -> str:
+    """地址标准化（去首尾空格、括号内容和标点），作为缓存键"""
+    if HAS_ADDRESS_PROCESSOR:
+        return AddressProcessor.retain_alphanumeric_and_chinese(AddressProcessor.preprocess(address))
+    return "".join(ch for ch in address if ch.isalnum())
+
+
+def geocode_cache_key(address: str, city: str = None, scenario: str = None) -> str:
+    return f"geocode|{city or ''}|{scenario or ''}|{normalize_address(address)}"
+
+
+def round_location(location: str) -> str:
+    """坐标 "lng,lat" 四舍五入到 REGEO_PRECISION 位小数，格式不合法时按原文"""
+    try:
+        lng, lat = (float(v) for v in location.split(","))
+        return f"{lng:.{REGEO_PRECISION}f},{lat:.{REGEO_PRECISION}f}"
+    except ValueError:
+        return location.strip()
+
+
+def regeo_cache_key(location: str, radius: int, scenario: str, limit: int) -> str:
+    return f"regeo|{round_location(location)}|{radius}|{scenario}|{limit}"
+
+
+def straight_distance(origin: str, destination: str) -> float:
+    """两个 "lng,lat" 坐标之间的直线距离（米）"""
+    lng1, lat1 = (float(v) for v in origin.split(","))
+    lng2, lat2 = (float(v) for v in destination.split(","))
+    return GeoDistanceCalculator.calculate_distance(lat1, lng1, lat2, lng2)
+
+
+def route_summary(result: dict) -> dict:
+    """从路线规划结果中取第一条路线的距离（米）和时长（秒）"""
+    routes = result.get("routes") or result.get("route", {}).get("paths") or []
+    if not routes:
+        raise Exception("No route found")
+    return {"distance": routes[0].get("distance"), "duration": routes[0].get("duration")}
+
 
 @mcp.tool()
 async def geocoding_v1(
@@ -36,8 +263,13 @@ async def geocoding_v1(
         # 获取API密钥
         if not api_key:
             raise Exception("API key is not set")
+
+        cache_key = geocode_cache_key(address, city, scenario)
+        cached = geo_cache.get("geocode", cache_key)
+        if cached is not None:
+            return cached
+
         # 调用美团API
-        url = f"{api_url}/v1/location/geo"
         params = {
             "key": api_key,
             "address": address,
@@ -50,10 +282,7 @@ async def geocoding_v1(
         if scenario:
             params["scenario"] = scenario
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            result = response.json()
+        result = await request_api("/v1/location/geo", params)
 
         if result.get("status") != 200:
             error_msg = result.get("msg", "unknown error")
@@ -75,6 +304,7 @@ async def geocoding_v1(
             }
             filtered_result["geocodes"].append(filtered_geocode)
 
+        geo_cache.set("geocode", cache_key, filtered_result, GEOCODE_TTL)
         return filtered_result
 
     except httpx.HTTPError as e:
@@ -107,7 +337,11 @@ async def regeo_v1(
         if not api_key:
             raise Exception("API key is not set")
 
-        url = f"{api_url}/v1/location/regeo"
+        cache_key = regeo_cache_key(location, radius, scenario, limit)
+        cached = geo_cache.get("regeo", cache_key)
+        if cached is not None:
+            return cached
+
         params = {
             "key": api_key,
             "location": location,
@@ -118,10 +352,7 @@ async def regeo_v1(
             "from": "py_mcp"
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            result = response.json()
+        result = await request_api("/v1/location/regeo", params)
 
         if result.get("status") != 200:
             error_msg = result.get("msg", "unknown error")
@@ -136,6 +367,8 @@ async def regeo_v1(
                     del poi["dpid"]
                 if "type" in poi:
                     del poi["type"]
+
+        geo_cache.set("regeo", cache_key, result, REGEO_TTL)
         return result
 
     except httpx.HTTPError as e:
@@ -144,6 +377,108 @@ async def regeo_v1(
         raise Exception(f"Failed to parse response: {str(e)}") from e
 
 
+@mcp.resource("cache://geo/stats")
+def geo_cache_stats() -> str:
+    """地理编码/逆地理编码缓存的条目数和命中率（JSON）"""
+    return json.dumps(geo_cache.summary(), ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+async def batch_geocoding_v1(
+        addresses: List[str],
+        city: str = None,
+        scenario: str = "GENERAL",
+        max_concurrency: int = 10,
+        cursor: str = None,
+        page_size: int = BATCH_PAGE_SIZE,
+        ctx: Context = None,
+) -> dict:
+    """
+    Name:
+        批量地理编码服务
+
+    Description:
+        将一批结构化地址转换为经纬度坐标。相同地址只请求一次，结果按输入顺序返回，单条失败不影响其他地址。
+        每次调用只处理一页（page_size 条），返回 next_cursor 时用相同参数和该游标继续请求下一页。
+
+    Args:
+        addresses: 结构化地址列表，每条格式同 geocoding_v1 的 address
+        city: 查询所在的城市，支持city汉字的形式
+        scenario: 应用场景(GENERAL/POICHECK/COMPATIBILITY/POIMINING)，默认GENERAL
+        max_concurrency: 同时进行的请求数上限，默认为 10（总请求速率另受服务器QPS限制）
+        cursor: 上一页返回的 next_cursor，第一页不传
+        page_size: 每页条数，默认为 200
+    """
+    if len(addresses) > MAX_BATCH_SIZE:
+        raise Exception(f"Too many addresses: {len(addresses)} > {MAX_BATCH_SIZE}")
+
+    start = parse_cursor(cursor, page_size)
+    page = addresses[start:start + page_size]
+    outcomes = await gather_unique(
+        page, lambda address: geocoding_v1(address, city, scenario), max_concurrency, ctx)
+    results = [
+        {
+            "index": start + i,
+            "address": address,
+            "geocodes": outcome["result"]["geocodes"] if outcome["result"] else [],
+            "error": outcome["error"],
+        }
+        for i, (address, outcome) in enumerate(zip(page, outcomes))
+    ]
+    failed = sum(1 for r in results if r["error"])
+    return {"count": len(results), "success": len(results) - failed, "failed": failed,
+            **page_info(start, len(page), len(addresses)), "results": results}
+
+
+@mcp.tool()
+async def batch_regeo_v1(
+        locations: List[str],
+        radius: int = 50,
+        scenario: str = "GENERAL",
+        limit: int = 10,
+        max_concurrency: int = 10,
+        cursor: str = None,
+        page_size: int = BATCH_PAGE_SIZE,
+        ctx: Context = None,
+) -> dict:
+    """
+    Name:
+        批量位置描述（逆地理编码）服务
+
+    Description:
+        将一批经纬度坐标转换为结构化地址。相同坐标只请求一次，结果按输入顺序返回，单条失败不影响其他坐标。
+        每次调用只处理一页（page_size 条），返回 next_cursor 时用相同参数和该游标继续请求下一页。
+
+    Args:
+        locations: 经纬度坐标列表，每条格式为 "lng,lat"
+        radius: 搜索半径，默认为50，最大为200，单位：米
+        scenario: 应用场景，默认为 GENERAL
+        limit: 每个坐标的返回条数，默认为 10，最大值为 20
+        max_concurrency: 同时进行的请求数上限，默认为 10（总请求速率另受服务器QPS限制）
+        cursor: 上一页返回的 next_cursor，第一页不传
+        page_size: 每页条数，默认为 200
+    """
+    if len(locations) > MAX_BATCH_SIZE:
+        raise Exception(f"Too many locations: {len(locations)} > {MAX_BATCH_SIZE}")
+
+    start = parse_cursor(cursor, page_size)
+    page = locations[start:start + page_size]
+    outcomes = await gather_unique(
+        page, lambda location: regeo_v1(location, radius, scenario, limit), max_concurrency, ctx)
+    results = [
+        {
+            "index": start + i,
+            "location": location,
+            "regeocode": outcome["result"].get("regeocode", []) if outcome["result"] else [],
+            "error": outcome["error"],
+        }
+        for i, (location, outcome) in enumerate(zip(page, outcomes))
+    ]
+    failed = sum(1 for r in results if r["error"])
+    return {"count": len(results), "success": len(results) - failed, "failed": failed,
+            **page_info(start, len(page), len(locations)), "results": results}
+
+
 @mcp.tool()
 async def driving_route_v1(
         origin: str,
@@ -183,4 +518,155 @@ async def riding_route_v1(
         strategy: 路线策略，默认为 S(完全合规)
         multipath: 返回路径数量，默认为 1
     """
-    return await route_planning("riding", origin, destination, way
+    return await route_planning("riding", origin, destination, waypoints, strategy, multipath, "distance|duration")
+
+@mcp.tool()
+async def route_matrix_v1(
+        origins: List[str],
+        destinations: List[str],
+        mode: str = "riding",
+        max_straight_distance: float = 10000,
+        symmetric: bool = None,
+        max_concurrency: int = 10,
+        cursor: str = None,
+        page_size: int = MATRIX_PAGE_SIZE,
+        ctx: Context = None,
+) -> dict:
+    """
+    Name:
+        路线矩阵服务
+
+    Description:
+        计算多个起点到多个终点之间的路线距离和时长。直线距离超过 max_straight_distance 的点对不请求路线规划，
+        相同点对只请求一次，结果缓存一天。每次调用只计算 page_size 个起点的行，返回 next_cursor 时用相同参数和该游标继续。
+
+    Args:
+        origins: 起点经纬度坐标列表，每条格式为 "lng,lat"
+        destinations: 终点经纬度坐标列表，每条格式为 "lng,lat"
+        mode: 出行方式，riding（骑行，默认）或 driving（驾车）
+        max_straight_distance: 直线距离上限（米），超过的点对标记为 pruned，<=0 表示不限制
+        symmetric: 是否视 A→B 与 B→A 为同一条路线并共用结果；默认骑行为是，驾车为否（单行道、掉头等使两个方向不同）。
+                   无论是否开启，路线都按调用方给出的 起点→终点 方向请求
+        max_concurrency: 同时进行的请求数上限，默认为 10（总请求速率另受服务器QPS限制）
+        cursor: 上一页返回的 next_cursor，第一页不传
+        page_size: 每页起点数，默认为 50
+
+    Returns:
+        rows[i][j] 为 origins[cursor + i] 到 destinations[j] 的 {status, distance, duration, straight_distance, error}，
+        status 为 ok / pruned / error；distance 单位米，duration 单位秒
+    """
+    if mode not in ROUTE_STRATEGIES:
+        raise Exception(f"Unsupported mode: {mode} (driving/riding)")
+    if symmetric is None:
+        symmetric = mode != "driving"
+    start = parse_cursor(cursor, page_size)
+    page = origins[start:start + page_size]
+    if len(page) * len(destinations) > MAX_MATRIX_PAIRS:
+        raise Exception(f"Too many pairs per page: {len(page) * len(destinations)} > {MAX_MATRIX_PAIRS}, "
+                        f"reduce page_size")
+
+    def share_key(key: tuple) -> tuple:
+        # 对称时 A→B 与 B→A 共用一个结果
+        return tuple(sorted(key)) if symmetric else key
+
+    # 先算直线距离，剪掉过远的点对
+    rows = []
+    pending = []
+    for origin in page:
+        row = []
+        for destination in destinations:
+            try:
+                straight = round(straight_distance(origin, destination), 1)
+            except ValueError:
+                row.append({"status": "error", "error": "Invalid location (expected \"lng,lat\")"})
+                continue
+            cell = {"status": "pruned", "straight_distance": straight}
+            if max_straight_distance <= 0 or straight <= max_straight_distance:
+                cell["key"] = (round_location(origin), round_location(destination))
+                pending.append(cell["key"])
+            row.append(cell)
+        rows.append(row)
+
+    async def route(key: tuple) -> dict:
+        if key[0] == key[1]:
+            return {"distance": 0, "duration": 0}
+        shared = share_key(key)
+        cache_key = f"route|{mode}|{'sym' if symmetric else 'dir'}|{shared[0]}|{shared[1]}"
+        cached = geo_cache.get("route", cache_key)
+        if cached is not None:
+            return cached
+        summary = route_summary(await route_planning(mode, key[0], key[1], strategy=ROUTE_STRATEGIES[mode]))
+        geo_cache.set("route", cache_key, summary, ROUTE_TTL)
+        return summary
+
+    # 每组共用结果的点对只请求一次，按该组第一次出现的 起点→终点 方向请求
+    unique_keys = {}
+    for key in pending:
+        unique_keys.setdefault(share_key(key), key)
+    outcomes = dict(zip(unique_keys, await gather_unique(list(unique_keys.values()), route, max_concurrency, ctx)))
+    for row in rows:
+        for cell in row:
+            key = cell.pop("key", None)
+            if key is None:
+                continue
+            outcome = outcomes[share_key(key)]
+            if outcome["error"]:
+                cell.update(status="error", error=outcome["error"])
+            else:
+                cell.update(status="ok", **outcome["result"])
+
+    statuses = [cell["status"] for row in rows for cell in row]
+    return {
+        "origins": page,
+        "destinations": destinations,
+        "mode": mode,
+        **page_info(start, len(page), len(origins)),
+        "routes_requested": len(unique_keys),
+        "pruned": statuses.count("pruned"),
+        "failed": statuses.count("error"),
+        "rows": rows,
+    }
+
+
+async def route_planning(
+        mode: str,
+        origin: str,
+        destination: str,
+        waypoints: str = None,
+        strategy: str = None,
+        multipath: int = 1,
+        show_fields: str = "distance|duration",
+) -> dict:
+    """路线规划公共逻辑，mode 为 driving / riding"""
+    try:
+        if not api_key:
+            raise Exception("API key is not set")
+
+        params = {
+            "key": api_key,
+            "origin": origin,
+            "destination": destination,
+            "multipath": multipath,
+            "show_fields": show_fields,
+            "from": "py_mcp"
+        }
+        if waypoints:
+            params["waypoints"] = waypoints
+        if strategy:
+            params["strategy"] = strategy
+
+        result = await request_api(f"/v1/direction/{mode}", params)
+
+        if result.get("status") != 200:
+            error_msg = result.get("msg", "unknown error")
+            raise Exception(f"API response error: {error_msg}")
+        return result
+
+    except httpx.HTTPError as e:
+        raise Exception(f"HTTP request failed: {str(e)}") from e
+    except KeyError as e:
+        raise Exception(f"Failed to parse response: {str(e)}") from e
+
+
+if __name__ == "__main__":
+    mcp.run(transport='stdio')
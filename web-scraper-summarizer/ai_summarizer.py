@@ -10,16 +10,24 @@ import argparse
 import sys
 import os
 from datetime import datetime
-import requests
-import openai
 from typing import Dict, Any, Optional
 try:
     from friday_config import FRIDAY_CONFIG
 except ImportError:
     FRIDAY_CONFIG = None
 
+# 大模型响应缓存模块位于 AI文章智能总结 目录
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI文章智能总结'))
+
+from llm_cache import LLMCache, make_cache_key
+from llm_stream import StreamMetrics, consume_stream
+from llm_client import LLMRequestError, get_llm_client, message_content
+
+# 提示词模板版本号，修改 create_summary_prompt 的模板后需要提升，使旧的缓存结果失效
+PROMPT_TEMPLATE_VERSION = "web-summary-v1"
+
 class AISummarizer:
-    def __init__(self, api_type="friday", api_key=None, base_url=None):
+    def __init__(self, api_type="friday", api_key=None, base_url=None, llm_cache=None):
         """
         初始化AI总结器
 
@@ -27,8 +35,12 @@ class AISummarizer:
             api_type: API类型 ("friday", "openai", "local")
             api_key: API密钥（Friday使用AppId）
             base_url: API基础URL
+            llm_cache: 大模型响应缓存（LLMCache），为None时不使用缓存
         """
         self.api_type = api_type
+        self.llm_cache = llm_cache
+        # 最近一次流式调用的延迟指标（首字延迟、生成速度）
+        self.last_stream_metrics = None
 
         if api_type == "friday":
             self.api_key = api_key or os.getenv('FRIDAY_APP_ID') or (FRIDAY_CONFIG['app_id'] if FRIDAY_CONFIG else None)
@@ -37,11 +49,6 @@ class AISummarizer:
             self.api_key = api_key or os.getenv('OPENAI_API_KEY')
             self.base_url = base_url or os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
 
-        if api_type == "openai" and self.api_key:
-            openai.api_key = self.api_key
-            if base_url:
-                openai.api_base = base_url
-
     def load_content(self, file_path):
         """
         从文件加载爬取的内容
@@ -115,103 +122,138 @@ class AISummarizer:
 
         return prompts.get(summary_type, prompts["comprehensive"])
 
+    def _cache_lookup(self, model, prompt, temperature=None, **params):
+        """
+        查询响应缓存，返回 (缓存键, 缓存内容)；未启用缓存时缓存键为None
+        """
+        if self.llm_cache is None:
+            return None, None
+        key = make_cache_key(model, prompt, PROMPT_TEMPLATE_VERSION, temperature,
+                             api_type=self.api_type, **params)
+        cached = self.llm_cache.get(key)
+        if cached is not None:
+            print("💾 命中大模型响应缓存")
+        return key, cached
+
+    def _cache_store(self, key, response, model):
+        """保存模型输出到响应缓存"""
+        if key is not None and response:
+            self.llm_cache.set(key, response, model)
+
+    def _llm_client(self, with_key=True):
+        """当前端点的共享连接池客户端"""
+        return get_llm_client(self.base_url, self.api_key if with_key else None, timeout=60)
+
+    def _stream_completion(self, messages, model, on_token=None, with_key=True, **params):
+        """
+        流式调用OpenAI兼容的 /chat/completions 接口，逐段回调并返回完整文本
+        """
+        metrics = StreamMetrics(model)
+        self.last_stream_metrics = metrics
+        chunks = self._llm_client(with_key).stream_complete(messages, model, metrics=metrics, **params)
+        return consume_stream(chunks, on_token) or None
+
+    def _replay_cached(self, cached, stream, on_token):
+        """缓存命中时，流式模式下把完整结果一次性回调"""
+        self.last_stream_metrics = None
+        if stream and on_token:
+            on_token(cached)
+        return cached
+
     def summarize_with_openai(self, prompt, model="gpt-3.5-turbo"):
         """
         使用OpenAI API进行总结
         """
+        system_prompt = "你是一个专业的内容总结助手，擅长提取关键信息并进行结构化总结。"
+        cache_key, cached = self._cache_lookup(model, prompt, 0.3, system=system_prompt, max_tokens=2000)
+        if cached is not None:
+            return cached
+
         try:
-            response = openai.ChatCompletion.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的内容总结助手，擅长提取关键信息并进行结构化总结。"},
+            result = self._llm_client().complete(
+                [
+                    {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
+                model,
                 max_tokens=2000,
                 temperature=0.3
             )
-            return response.choices[0].message.content
+            summary = message_content(result)
+            self._cache_store(cache_key, summary, model)
+            return summary
         except Exception as e:
             print(f"❌ OpenAI API调用失败: {e}")
             return None
 
-    def summarize_with_friday(self, prompt, model="LongCat-8B-128K-Chat"):
+    def summarize_with_friday(self, prompt, model="LongCat-8B-128K-Chat", stream=False, on_token=None):
         """
         使用美团Friday大模型API进行总结
-        """
-        try:
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json',
-            }
-
-            data = {
-                "model": model,
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "stream": False  # 不使用流式输出，便于处理结果
-            }
 
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=60
-            )
+        stream为True时以SSE流式输出，每收到一段内容调用 on_token
+        """
+        cache_key, cached = self._cache_lookup(model, prompt)
+        if cached is not None:
+            return self._replay_cached(cached, stream, on_token)
 
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
+        messages = [{"role": "user", "content": prompt}]
+        try:
+            if stream:
+                summary = self._stream_completion(messages, model, on_token)
             else:
-                print(f"❌ Friday API请求失败: {response.status_code}")
-                print(f"响应内容: {response.text}")
-                return None
+                # 默认不使用流式输出，便于处理结果
+                summary = message_content(self._llm_client().complete(messages, model))
+            self._cache_store(cache_key, summary, model)
+            return summary
 
+        except LLMRequestError as e:
+            print(f"❌ Friday API请求失败: {e}")
+            return None
         except Exception as e:
             print(f"❌ Friday API调用失败: {e}")
             return None
 
-    def summarize_with_local_api(self, prompt, model="chatglm"):
+    def summarize_with_local_api(self, prompt, model="chatglm", stream=False, on_token=None):
         """
         使用本地部署的大模型API进行总结
+
+        stream为True时以SSE流式输出，每收到一段内容调用 on_token
         """
+        system_prompt = "你是一个专业的内容总结助手。"
+        cache_key, cached = self._cache_lookup(model, prompt, 0.3, system=system_prompt, max_tokens=2000,
+                                               base_url=self.base_url)
+        if cached is not None:
+            return self._replay_cached(cached, stream, on_token)
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
         try:
-            headers = {
-                'Content-Type': 'application/json',
-            }
-
-            data = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": "你是一个专业的内容总结助手。"},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 2000,
-                "temperature": 0.3
-            }
-
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=60
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
+            if stream:
+                summary = self._stream_completion(messages, model, on_token, with_key=False,
+                                                  max_tokens=2000, temperature=0.3)
             else:
-                print(f"❌ API请求失败: {response.status_code}")
-                return None
+                result = self._llm_client(with_key=False).complete(messages, model, max_tokens=2000, temperature=0.3)
+                summary = message_content(result)
+            self._cache_store(cache_key, summary, model)
+            return summary
 
+        except LLMRequestError as e:
+            print(f"❌ API请求失败: {e}")
+            return None
         except Exception as e:
             print(f"❌ 本地API调用失败: {e}")
             return None
 
-    def summarize(self, content_data, summary_type="comprehensive", model=None):
+    def summarize(self, content_data, summary_type="comprehensive", model=None, stream=False, on_token=None):
         """
         对内容进行总结
+
+        stream为True时（friday/local）流式输出，每收到一段内容调用 on_token，
+        结果中附带首字延迟和生成速度
         """
+        self.last_stream_metrics = None
         prompt = self.create_summary_prompt(content_data, summary_type)
 
         print(f"🤖 正在使用 {self.api_type} 进行内容总结...")
@@ -219,19 +261,21 @@ class AISummarizer:
 
         if self.api_type == "friday":
             model = model or "LongCat-8B-128K-Chat"
-            summary = self.summarize_with_friday(prompt, model)
+            summary = self.summarize_with_friday(prompt, model, stream, on_token)
         elif self.api_type == "openai":
             model = model or "gpt-3.5-turbo"
+            if stream:
+                print("⚠️ OpenAI接口暂不支持流式输出，使用普通模式")
             summary = self.summarize_with_openai(prompt, model)
         elif self.api_type == "local":
             model = model or "chatglm"
-            summary = self.summarize_with_local_api(prompt, model)
+            summary = self.summarize_with_local_api(prompt, model, stream, on_token)
         else:
             print(f"❌ 不支持的API类型: {self.api_type}")
             return None
 
         if summary:
-            return {
+            summary_data = {
                 'original_title': content_data.get('title', ''),
                 'original_url': content_data.get('url', ''),
                 'summary_type': summary_type,
@@ -241,6 +285,9 @@ class AISummarizer:
                 'summary_length': len(summary),
                 'timestamp': datetime.now().isoformat()
             }
+            if self.last_stream_metrics is not None:
+                summary_data['stream_metrics'] = self.last_stream_metrics.to_dict()
+            return summary_data
 
         return None
 
@@ -271,6 +318,9 @@ def main():
     parser.add_argument('--api-type', choices=['friday', 'openai', 'local'], default='friday', help='API类型')
     parser.add_argument('--api-key', help='API密钥（Friday使用AppId）')
     parser.add_argument('--base-url', help='API基础URL')
+    parser.add_argument('--no-cache', action='store_true', help='不使用大模型响应缓存')
+    parser.add_argument('--refresh', action='store_true', help='忽略已有缓存重新生成，并覆盖缓存')
+    parser.add_argument('--stream', action='store_true', help='流式输出总结，并统计首字延迟和生成速度')
 
     args = parser.parse_args()
 
@@ -278,7 +328,8 @@ def main():
     summarizer = AISummarizer(
         api_type=args.api_type,
         api_key=args.api_key,
-        base_url=args.base_url
+        base_url=args.base_url,
+        llm_cache=None if args.no_cache else LLMCache(refresh=args.refresh)
     )
 
     # 加载内容
@@ -289,17 +340,28 @@ def main():
     print(f"📄 原文标题: {content_data.get('title', '未知')}")
     print(f"📊 原文长度: {content_data.get('length', 0)} 字符")
 
-    # 进行总结
-    summary_data = summarizer.summarize(content_data, args.type, args.model)
+    # 进行总结（流式模式下边生成边显示）
+    if args.stream:
+        print("\n" + "="*60)
+        print("📋 AI总结结果（流式输出）")
+        print("="*60)
+        summary_data = summarizer.summarize(content_data, args.type, args.model, stream=True,
+                                            on_token=lambda token: print(token, end='', flush=True))
+        print("\n" + "="*60)
+    else:
+        summary_data = summarizer.summarize(content_data, args.type, args.model)
     if not summary_data:
         sys.exit(1)
 
     # 显示总结结果
-    print("\n" + "="*60)
-    print("📋 AI总结结果")
-    print("="*60)
-    print(summary_data['summary'])
-    print("="*60)
+    if not args.stream:
+        print("\n" + "="*60)
+        print("📋 AI总结结果")
+        print("="*60)
+        print(summary_data['summary'])
+        print("="*60)
+    elif summarizer.last_stream_metrics is not None:
+        print(f"⏱️ {summarizer.last_stream_metrics.summary()}")
 
     print(f"\n📈 压缩比: {content_data.get('length', 0)} → {summary_data['summary_length']} 字符")
     print(f"🤖 使用模型: {summary_data['model_used']}")
@@ -9,8 +9,8 @@ import argparse
 import sys
 import os
 import tempfile
-from web_scraper import WebScraper
-from ai_summarizer import AISummarizer
+from web_scraper import WebScraper, HTTPCache
+from ai_summarizer import AISummarizer, LLMCache
 from friday_config import FRIDAY_CONFIG, setup_friday_env
 
 def main():
@@ -19,6 +19,7 @@ def main():
 
     # 爬虫参数
     parser.add_argument('-t', '--timeout', type=int, default=10, help='请求超时时间（秒）')
+    parser.add_argument('--no-http-cache', action='store_true', help='不使用HTTP条件请求缓存')
 
     # 总结参数
     parser.add_argument('--summary-type', choices=['comprehensive', 'brief', 'technical', 'academic'],
@@ -27,6 +28,9 @@ def main():
     parser.add_argument('--api-type', choices=['friday', 'openai', 'local'], default='friday', help='API类型')
     parser.add_argument('--api-key', help='API密钥（Friday使用AppId）')
     parser.add_argument('--base-url', help='API基础URL')
+    parser.add_argument('--no-cache', action='store_true', help='不使用大模型响应缓存')
+    parser.add_argument('--refresh', action='store_true', help='忽略已有缓存重新生成，并覆盖缓存')
+    parser.add_argument('--stream', action='store_true', help='流式输出总结，并统计首字延迟和生成速度')
 
     # 输出参数
     parser.add_argument('-o', '--output', help='输出文件前缀')
@@ -57,7 +61,7 @@ def main():
     if not args.url.startswith(('http://', 'https://')):
         args.url = 'https://' + args.url
 
-    scraper = WebScraper()
+    scraper = WebScraper(http_cache=None if args.no_http_cache else HTTPCache())
 
     # 爬取内容
     html_content = scraper.fetch_content(args.url, args.timeout)
@@ -95,11 +99,20 @@ def main():
     summarizer = AISummarizer(
         api_type=args.api_type,
         api_key=args.api_key,
-        base_url=args.base_url
+        base_url=args.base_url,
+        llm_cache=None if args.no_cache else LLMCache(refresh=args.refresh)
     )
 
-    # 进行总结
-    summary_data = summarizer.summarize(content_data, args.summary_type, args.model)
+    # 进行总结（流式模式下边生成边显示）
+    if args.stream:
+        print("\n" + "="*60)
+        print("📋 AI总结结果（流式输出）")
+        print("="*60)
+        summary_data = summarizer.summarize(content_data, args.summary_type, args.model, stream=True,
+                                            on_token=lambda token: print(token, end='', flush=True))
+        print("\n" + "="*60)
+    else:
+        summary_data = summarizer.summarize(content_data, args.summary_type, args.model)
     if not summary_data:
         print("❌ AI总结失败，程序退出")
         # 清理临时文件
@@ -110,11 +123,14 @@ def main():
     print("✅ 总结完成！")
 
     # 显示总结结果
-    print("\n" + "="*60)
-    print("📋 AI总结结果")
-    print("="*60)
-    print(summary_data['summary'])
-    print("="*60)
+    if not args.stream:
+        print("\n" + "="*60)
+        print("📋 AI总结结果")
+        print("="*60)
+        print(summary_data['summary'])
+        print("="*60)
+    elif summarizer.last_stream_metrics is not None:
+        print(f"⏱️ {summarizer.last_stream_metrics.summary()}")
 
     print(f"\n📈 内容压缩: {content_data['length']} → {summary_data['summary_length']} 字符")
     print(f"🤖 使用模型: {summary_data['model_used']}")
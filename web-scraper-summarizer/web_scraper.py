@@ -6,17 +6,23 @@
 """
 
 import requests
-from bs4 import BeautifulSoup
 import re
 import sys
 import argparse
 from urllib.parse import urljoin, urlparse
 import time
 import json
+import os
 from datetime import datetime
 
+# 复用爬虫目录下的HTTP缓存模块
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '爬取AI咨询'))
+from http_cache import HTTPCache
+from html_backend import make_soup, find_first_matches
+
 class WebScraper:
-    def __init__(self):
+    def __init__(self, http_cache=None):
+        self.http_cache = http_cache  # 可选的HTTPCache，开启后使用条件请求
         self.session = requests.Session()
         # 设置请求头，模拟浏览器访问
         self.session.headers.update({
@@ -34,7 +40,10 @@ class WebScraper:
         """
         try:
             print(f"🌐 正在访问: {url}")
-            response = self.session.get(url, timeout=timeout)
+            if self.http_cache:
+                response = self.http_cache.fetch(self.session, url, timeout=timeout)
+            else:
+                response = self.session.get(url, timeout=timeout)
             response.raise_for_status()
             response.encoding = response.apparent_encoding or 'utf-8'
             return response.text
@@ -47,7 +56,7 @@ class WebScraper:
         从HTML中提取主要文本内容
         """
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            soup = make_soup(html_content)
 
             # 移除不需要的标签
             for tag in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 'advertisement']):
@@ -69,9 +78,10 @@ class WebScraper:
                 '.main-content', '.article-body'
             ]
 
-            for selector in content_selectors:
-                main_content = soup.select_one(selector)
-                if main_content:
+            # 一次遍历找出所有选择器的第一个匹配，按优先级取第一个命中的
+            for candidate in find_first_matches(soup, content_selectors):
+                if candidate is not None:
+                    main_content = candidate
                     break
 
             # 如果没找到主要内容区域，使用body
@@ -125,6 +135,7 @@ def main():
     parser.add_argument('url', help='要爬取的网页URL')
     parser.add_argument('-o', '--output', help='输出文件名')
     parser.add_argument('-t', '--timeout', type=int, default=10, help='请求超时时间（秒）')
+    parser.add_argument('--no-http-cache', action='store_true', help='不使用HTTP条件请求缓存')
 
     args = parser.parse_args()
 
@@ -132,7 +143,7 @@ def main():
     if not args.url.startswith(('http://', 'https://')):
         args.url = 'https://' + args.url
 
-    scraper = WebScraper()
+    scraper = WebScraper(http_cache=None if args.no_http_cache else HTTPCache())
 
     # 爬取内容
     html_content = scraper.fetch_content(args.url, args.timeout)
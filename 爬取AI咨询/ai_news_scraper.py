@@ -7,7 +7,6 @@ AI工具集网站爬虫
 """
 
 import requests
-from bs4 import BeautifulSoup
 import json
 import csv
 import time
@@ -17,8 +16,28 @@ import logging
 from urllib.parse import urljoin
 import re
 
+from crawl_state import CrawlStateStore
+from http_cache import HTTPCache
+from html_backend import make_soup, extract_main_content
+
 class AINewsScraper:
-    def __init__(self):
+    # 查找文章内容 - 针对AI工具集网站的结构优化（按优先级排列，一次遍历同时匹配）
+    CONTENT_SELECTORS = [
+        '.entry-content',           # WordPress标准内容区域
+        '.post-content',            # 文章内容区域
+        '.article-content',         # 文章内容
+        '.content',                 # 通用内容区域
+        'article .content',         # 文章标签内的内容
+        '.main-content',            # 主要内容区域
+        '.post-body',               # 文章主体
+        '.single-content',          # 单页内容
+        '[class*="content"]',       # 包含content的类名
+        'main article',             # 主要文章区域
+        '.wp-content'               # WordPress内容
+    ]
+
+    def __init__(self, http_cache=None):
+        self.http_cache = http_cache  # 可选的HTTPCache，开启后使用条件请求复用已下载页面
         self.base_url = "https://ai-bot.cn"
         self.target_url = "https://ai-bot.cn/the-latest-ai-projects/"
         self.session = requests.Session()
@@ -47,7 +66,10 @@ class AINewsScraper:
         """获取页面内容"""
         for attempt in range(max_retries):
             try:
-                response = self.session.get(url, timeout=15)
+                if self.http_cache:
+                    response = self.http_cache.fetch(self.session, url, timeout=15)
+                else:
+                    response = self.session.get(url, timeout=15)
                 response.raise_for_status()
                 response.encoding = 'utf-8'
                 return response.text
@@ -61,7 +83,7 @@ class AINewsScraper:
 
     def parse_article_list(self, html_content):
         """解析文章列表 - 基于实际HTML结构"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = make_soup(html_content)
         articles = []
 
         # 查找所有文章容器 - 基于提供的HTML结构
@@ -145,57 +167,17 @@ class AINewsScraper:
         if not html_content:
             return None
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # 查找文章内容 - 针对AI工具集网站的结构优化
-        content_selectors = [
-            '.entry-content',           # WordPress标准内容区域
-            '.post-content',            # 文章内容区域
-            '.article-content',         # 文章内容
-            '.content',                 # 通用内容区域
-            'article .content',         # 文章标签内的内容
-            '.main-content',            # 主要内容区域
-            '.post-body',               # 文章主体
-            '.single-content',          # 单页内容
-            '[class*="content"]',       # 包含content的类名
-            'main article',             # 主要文章区域
-            '.wp-content'               # WordPress内容
-        ]
-
-        content = ''
-        for selector in content_selectors:
-            content_elem = soup.select_one(selector)
-            if content_elem:
-                # 移除不需要的元素
-                for unwanted in content_elem(["script", "style", "nav", "footer", "header", ".sidebar", ".related", ".comments"]):
-                    unwanted.decompose()
-
-                # 提取文本内容
-                content = content_elem.get_text(separator='\n', strip=True)
-
-                # 清理多余的空行
-                content = '\n'.join(line.strip() for line in content.split('\n') if line.strip())
-
-                if len(content) > 200:  # 确保内容有足够长度
-                    break
-
-        # 如果没有找到合适的内容，尝试从整个页面提取
-        if not content or len(content) < 100:
-            # 移除不需要的标签
-            for unwanted in soup(["script", "style", "nav", "footer", "header", ".sidebar", ".menu", ".navigation"]):
-                unwanted.decompose()
-
-            # 尝试从body或main标签提取
-            body_content = soup.find('body') or soup.find('main')
-            if body_content:
-                content = body_content.get_text(separator='\n', strip=True)
-                content = '\n'.join(line.strip() for line in content.split('\n') if line.strip())
-
-        # 限制内容长度，避免过长
-        if len(content) > 3000:
-            content = content[:3000] + "...[内容已截断]"
-
-        return content if content else "无法获取文章详细内容"
+        return self.extract_article_detail(html_content)
+
+    def extract_article_detail(self, html_content):
+        """从文章详情页HTML中提取正文内容"""
+        return extract_main_content(
+            html_content,
+            content_selectors=self.CONTENT_SELECTORS,
+            unwanted_tags=["script", "style", "nav", "footer", "header", ".sidebar", ".related", ".comments"],
+            fallback_unwanted_tags=["script", "style", "nav", "footer", "header", ".sidebar", ".menu", ".navigation"],
+            max_length=3000,
+        )
 
     def scrape_articles(self, max_pages=5, include_content=False):
         """爬取文章"""
@@ -235,6 +217,63 @@ class AINewsScraper:
 
         return all_articles
 
+    def scrape_articles_incremental(self, state_store, max_pages=5, include_content=False):
+        """增量爬取：遇到整页都是已见文章时停止翻页，只为新增或变化的文章抓取详情"""
+        new_articles = []
+
+        for page in range(1, max_pages + 1):
+            if page == 1:
+                url = self.target_url
+            else:
+                url = f"{self.target_url}page/{page}/"
+
+            self.logger.info(f"[增量] 正在爬取第 {page} 页: {url}")
+
+            html_content = self.get_page_content(url)
+            if not html_content:
+                self.logger.warning(f"跳过第 {page} 页")
+                continue
+
+            articles = self.parse_article_list(html_content)
+
+            if not articles:
+                self.logger.warning(f"第 {page} 页没有找到文章")
+                break
+
+            page_new = []
+            for article in articles:
+                status = state_store.classify(article)
+                needs_content = include_content and not state_store.has_content(article['url'])
+                if status == 'seen' and not needs_content:
+                    continue
+
+                if include_content:
+                    self.logger.info(f"获取文章详细内容 ({status}): {article['title']}")
+                    detail_content = self.get_article_detail(article['url'])
+                    article['content'] = detail_content or ''
+                    # 列表信息变了但正文哈希与上次相同：只是标题/摘要等列表信息的变化
+                    if (status == 'changed' and detail_content
+                            and not state_store.content_changed(article['url'], detail_content)):
+                        status = 'list_changed'
+                    time.sleep(1)  # 避免请求过快
+
+                article['crawl_status'] = status
+
+                state_store.record(article, article.get('content'))
+                page_new.append(article)
+
+            state_store.commit()
+            self.logger.info(f"第 {page} 页共 {len(articles)} 篇，其中新增/变化 {len(page_new)} 篇")
+            new_articles.extend(page_new)
+
+            if not page_new:
+                self.logger.info(f"第 {page} 页全部为已抓取文章，停止翻页")
+                break
+
+            time.sleep(2)  # 页面间延迟
+
+        return new_articles
+
     def save_to_json(self, articles, filename='ai_articles.json'):
         """保存为JSON格式"""
         with open(filename, 'w', encoding='utf-8') as f:
@@ -249,6 +288,8 @@ class AINewsScraper:
         fieldnames = ['title', 'url', 'description', 'category', 'publish_time', 'image_url', 'is_new', 'scraped_at']
         if 'content' in articles[0]:
             fieldnames.append('content')
+        if any('crawl_status' in article for article in articles):
+            fieldnames.append('crawl_status')  # 增量模式：new / changed / list_changed
 
         with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames)
@@ -290,15 +331,30 @@ class AINewsScraper:
                 desc = article['description'][:100] + "..." if len(article['description']) > 100 else article['description']
                 print(f"   描述: {desc}")
 
-    def run(self, max_pages=3, include_content=False, save_formats=['json', 'csv']):
+    def run(self, max_pages=3, include_content=False, save_formats=['json', 'csv'],
+            incremental=False, state_db='crawl_state.db'):
         """运行爬虫"""
         self.logger.info("开始爬取AI工具集网站...")
 
-        articles = self.scrape_articles(max_pages=max_pages, include_content=include_content)
+        if incremental:
+            state_store = CrawlStateStore(state_db)
+            try:
+                self.logger.info(f"增量模式，已记录 {state_store.count()} 篇文章 ({state_db})")
+                articles = self.scrape_articles_incremental(
+                    state_store, max_pages=max_pages, include_content=include_content
+                )
+            finally:
+                state_store.close()
+
+            if not articles:
+                self.logger.info("没有新增或变化的文章")
+                return []
+        else:
+            articles = self.scrape_articles(max_pages=max_pages, include_content=include_content)
 
-        if not articles:
-            self.logger.error("没有爬取到任何文章")
-            return []
+            if not articles:
+                self.logger.error("没有爬取到任何文章")
+                return []
 
         self.logger.info(f"总共爬取到 {len(articles)} 篇文章")
 
@@ -318,18 +374,20 @@ class AINewsScraper:
 
 def main():
     """主函数"""
-    scraper = AINewsScraper()
+    scraper = AINewsScraper(http_cache=HTTPCache())  # 与AI总结工具共用HTTP缓存
 
     # 配置参数
     MAX_PAGES = 3  # 爬取页数
     INCLUDE_CONTENT = True  # 是否包含文章详细内容（会显著增加爬取时间，但AI总结需要）
     SAVE_FORMATS = ['json', 'csv']  # 保存格式
+    INCREMENTAL = False  # 增量模式：只抓取新增或变化的文章（状态保存在 crawl_state.db）
 
     try:
         articles = scraper.run(
             max_pages=MAX_PAGES,
             include_content=INCLUDE_CONTENT,
-            save_formats=SAVE_FORMATS
+            save_formats=SAVE_FORMATS,
+            incremental=INCREMENTAL
         )
 
         if articles:
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步并发AI文章爬虫
+基于asyncio + httpx，列表页与详情页并发抓取（遇到空页后不再抓取后续页的详情），
+使用按域名的并发上限和令牌桶限速替代固定的sleep延迟
+"""
+
+import sys
+sys.path.append('.')
+
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from ai_news_scraper import AINewsScraper
+from rate_limiter import TokenBucket
+
+
+class AsyncAINewsScraper(AINewsScraper):
+    """异步并发AI文章爬虫"""
+
+    def __init__(self, max_concurrency_per_host: int = 4, requests_per_second: float = 2.0, burst: int = 4):
+        """
+        初始化异步爬虫
+
+        Args:
+            max_concurrency_per_host: 每个域名同时进行的最大请求数
+            requests_per_second: 令牌桶平均速率（所有请求共享）
+            burst: 令牌桶容量，允许的瞬时突发请求数
+        """
+        super().__init__()
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.logger.info(
+            f"初始化异步爬虫: 每域名并发 {max_concurrency_per_host}, 限速 {requests_per_second} 次/秒"
+        )
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """获取URL所属域名的并发信号量"""
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_concurrency_per_host)
+        return self._host_semaphores[host]
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """创建复用连接的异步HTTP客户端"""
+        headers = dict(self.session.headers)
+        # httpx 只有安装 brotli 时才能解码 br，这里只声明 gzip/deflate
+        headers['Accept-Encoding'] = 'gzip, deflate'
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency_per_host * 2,
+            max_keepalive_connections=self.max_concurrency_per_host,
+        )
+        return httpx.AsyncClient(headers=headers, limits=limits, timeout=15, follow_redirects=True)
+
+    async def fetch_page_async(self, client: httpx.AsyncClient, url: str, max_retries: int = 3) -> Optional[str]:
+        """异步获取页面内容"""
+        for attempt in range(max_retries):
+            await self.rate_limiter.acquire_async()
+            try:
+                async with self._host_semaphore(url):
+                    response = await client.get(url)
+                    response.raise_for_status()
+                    return response.content.decode('utf-8', errors='replace')
+            except httpx.HTTPError as e:
+                self.logger.warning(f"获取页面失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(2 ** attempt)  # 指数退避
+                else:
+                    self.logger.error(f"获取页面最终失败: {url}")
+        return None
+
+    async def fetch_article_detail_async(self, client: httpx.AsyncClient, article: Dict) -> None:
+        """异步获取文章详细内容并写回article"""
+        html_content = await self.fetch_page_async(client, article['url'])
+        if not html_content:
+            article['content'] = ''
+            return
+        # 解析是CPU操作，放到线程中执行，避免阻塞其它请求的收发
+        detail_content = await asyncio.to_thread(self.extract_article_detail, html_content)
+        article['content'] = detail_content or ''
+
+    async def scrape_list_page_async(self, client: httpx.AsyncClient, page: int) -> Optional[List[Dict]]:
+        """抓取并解析单个列表页"""
+        url = self.target_url if page == 1 else f"{self.target_url}page/{page}/"
+        self.logger.info(f"正在爬取第 {page} 页: {url}")
+
+        html_content = await self.fetch_page_async(client, url)
+        if not html_content:
+            self.logger.warning(f"跳过第 {page} 页")
+            return None
+
+        articles = await asyncio.to_thread(self.parse_article_list, html_content)
+        self.logger.info(f"第 {page} 页找到 {len(articles)} 篇文章")
+        return articles
+
+    async def scrape_articles_async(self, max_pages: int = 5, include_content: bool = False) -> List[Dict]:
+        """
+        异步并发爬取文章，结果按页码和页内顺序返回
+
+        列表页并发抓取，按页码顺序处理：前面的页都确认非空后才调度该页的详情抓取；
+        遇到空页即视为已到末页，取消后续列表页的抓取，不再为其抓取详情
+        """
+        all_articles = []
+        detail_tasks: List[asyncio.Task] = []
+
+        async with self._create_client() as client:
+            list_tasks = [asyncio.create_task(self.scrape_list_page_async(client, page))
+                          for page in range(1, max_pages + 1)]
+            try:
+                for page, list_task in enumerate(list_tasks, 1):
+                    articles = await list_task
+                    if articles is None:
+                        continue
+                    if not articles:
+                        # 与同步版本一致：遇到空页即视为已到末页
+                        self.logger.warning(f"第 {page} 页没有找到文章")
+                        for later_task in list_tasks[page:]:
+                            later_task.cancel()
+                        break
+                    all_articles.extend(articles)
+                    if include_content:
+                        detail_tasks.extend(asyncio.create_task(self.fetch_article_detail_async(client, article))
+                                            for article in articles)
+
+                if detail_tasks:
+                    self.logger.info(f"等待 {len(detail_tasks)} 篇文章详情抓取完成...")
+                    await asyncio.gather(*detail_tasks)
+            finally:
+                # 出错或被中断时取消尚未完成的请求，避免在客户端关闭后继续运行
+                pending = [task for task in list_tasks + detail_tasks if not task.done()]
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        return all_articles
+
+    def scrape_articles(self, max_pages=5, include_content=False):
+        """爬取文章（异步并发实现，保持与父类相同的同步接口）"""
+        return asyncio.run(self.scrape_articles_async(max_pages=max_pages, include_content=include_content))
+
+
+def main():
+    """主函数"""
+    scraper = AsyncAINewsScraper(
+        max_concurrency_per_host=4,  # 每域名并发数
+        requests_per_second=2.0,     # 平均请求速率
+        burst=4                      # 突发请求数
+    )
+
+    # 配置参数
+    MAX_PAGES = 3  # 爬取页数
+    INCLUDE_CONTENT = True  # 是否包含文章详细内容
+    SAVE_FORMATS = ['json', 'csv']  # 保存格式
+
+    try:
+        articles = scraper.run(
+            max_pages=MAX_PAGES,
+            include_content=INCLUDE_CONTENT,
+            save_formats=SAVE_FORMATS
+        )
+
+        if articles:
+            print(f"\n✅ 爬取完成！共获取 {len(articles)} 篇文章")
+            print("📁 文件已保存到当前目录")
+
+    except KeyboardInterrupt:
+        print("\n❌ 用户中断爬取")
+    except Exception as e:
+        print(f"❌ 爬取过程中出现错误: {e}")
+        logging.exception("详细错误信息:")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML解析后端基准测试
+对保存下来的ai-bot.cn页面，比较各解析后端的列表解析和正文提取耗时，
+并与原先"html.parser + 逐个select_one"的实现对比
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup
+
+from ai_news_scraper import AINewsScraper
+from html_backend import available_backends, clean_lines, extract_main_content
+
+DEFAULT_PAGES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 'view-source_https___ai-bot.cn_the-latest-ai-projects_.html')
+]
+
+
+def load_page(path):
+    """读取页面；浏览器"查看源代码"另存的文件会还原为原始HTML"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        html_content = f.read()
+    if 'line-content' in html_content[:5000]:
+        soup = BeautifulSoup(html_content, 'html.parser')
+        lines = [td.get_text() for td in soup.find_all('td', class_='line-content')]
+        html_content = '\n'.join(lines)
+    return html_content
+
+
+def legacy_extract(html_content):
+    """原实现：html.parser建树后按顺序逐个select_one"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    content = ''
+    for selector in AINewsScraper.CONTENT_SELECTORS:
+        content_elem = soup.select_one(selector)
+        if content_elem:
+            for unwanted in content_elem(["script", "style", "nav", "footer", "header"]):
+                unwanted.decompose()
+            content = clean_lines(content_elem.get_text(separator='\n', strip=True))
+            if len(content) > 200:
+                break
+    if not content or len(content) < 100:
+        for unwanted in soup(["script", "style", "nav", "footer", "header"]):
+            unwanted.decompose()
+        body_content = soup.find('body') or soup.find('main')
+        if body_content:
+            content = clean_lines(body_content.get_text(separator='\n', strip=True))
+    return content[:3000]
+
+
+def time_call(func, repeat):
+    """重复执行并返回每次耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML解析后端基准测试')
+    parser.add_argument('paths', nargs='*', help='HTML文件或目录（默认使用仓库中保存的列表页）')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='每项重复次数')
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths or DEFAULT_PAGES:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.html'))))
+        else:
+            files.append(path)
+
+    pages = [load_page(f) for f in files]
+    total_kb = sum(len(p.encode('utf-8')) for p in pages) / 1024
+    print(f"📄 共 {len(pages)} 个页面，{total_kb:.0f} KB，每项重复 {args.repeat} 次")
+    print(f"🔧 可用后端: {', '.join(available_backends())}\n")
+
+    scraper = AINewsScraper()
+    scraper.logger.disabled = True
+
+    rows = [('legacy html.parser+select_one', '-',
+             time_call(lambda: [legacy_extract(p) for p in pages], args.repeat))]
+
+    for backend in available_backends():
+        # parse_article_list 通过 make_soup 使用默认后端，这里用环境变量切换
+        os.environ['HTML_PARSER_BACKEND'] = backend
+        if backend != 'selectolax':
+            list_timings = time_call(lambda: [scraper.parse_article_list(p) for p in pages], args.repeat)
+            list_ms = f"{statistics.median(list_timings):.1f}"
+        else:
+            list_ms = '-'  # selectolax 没有BeautifulSoup接口，列表解析退回lxml
+        extract_timings = time_call(
+            lambda: [extract_main_content(p, AINewsScraper.CONTENT_SELECTORS,
+                                          ["script", "style", "nav", "footer", "header"],
+                                          ["script", "style", "nav", "footer", "header"],
+                                          max_length=3000, backend=backend) for p in pages],
+            args.repeat,
+        )
+        rows.append((backend, list_ms, extract_timings))
+
+    print(f"{'后端':<32}{'列表解析(ms)':>14}{'正文提取(ms)':>14}")
+    print('-' * 60)
+    for name, list_ms, timings in rows:
+        print(f"{name:<32}{list_ms:>14}{statistics.median(timings):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
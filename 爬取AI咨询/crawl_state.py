@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量爬取状态存储
+基于SQLite记录已抓取文章的URL、发布时间、内容哈希和抓取时间
+"""
+
+import hashlib
+import sqlite3
+from datetime import datetime
+from typing import Dict, Optional
+
+
+def hash_text(text: str) -> str:
+    """计算文本的SHA-256哈希"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def article_list_hash(article: Dict) -> str:
+    """
+    计算列表页文章信息的哈希，用于判断文章是否有变化
+
+    publish_time 在列表页是"4小时前"这类相对时间，每次运行都会变化，因此不参与哈希
+    """
+    parts = [article.get('title', ''), article.get('description', ''), article.get('category', '')]
+    return hash_text('\x1f'.join(parts))
+
+
+class CrawlStateStore:
+    """增量爬取状态存储（URL frontier + 已见集合）"""
+
+    def __init__(self, db_path: str = 'crawl_state.db'):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                title TEXT,
+                publish_time TEXT,
+                list_hash TEXT NOT NULL,
+                content_hash TEXT,
+                first_seen_at TEXT NOT NULL,
+                fetched_at TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, url: str) -> Optional[sqlite3.Row]:
+        """查询URL对应的状态记录"""
+        return self.conn.execute("SELECT * FROM articles WHERE url = ?", (url,)).fetchone()
+
+    def classify(self, article: Dict) -> str:
+        """
+        判断文章状态
+
+        Returns:
+            'new': 从未见过
+            'changed': 列表信息发生变化
+            'seen': 已见且未变化
+        """
+        row = self.get(article['url'])
+        if row is None:
+            return 'new'
+        if row['list_hash'] != article_list_hash(article):
+            return 'changed'
+        return 'seen'
+
+    def has_content(self, url: str) -> bool:
+        """是否已抓取过该文章的详情内容"""
+        row = self.get(url)
+        return bool(row and row['content_hash'])
+
+    def content_changed(self, url: str, content: str) -> bool:
+        """详情内容与上次记录的内容哈希是否不同（没有记录过内容时视为变化）"""
+        row = self.get(url)
+        return not (row and row['content_hash']) or row['content_hash'] != hash_text(content)
+
+    def record(self, article: Dict, content: Optional[str] = None):
+        """记录（或更新）文章状态；content为None时保留已有的内容哈希"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        content_hash = hash_text(content) if content else None
+        self.conn.execute("""
+            INSERT INTO articles (url, title, publish_time, list_hash, content_hash, first_seen_at, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                title = excluded.title,
+                publish_time = excluded.publish_time,
+                list_hash = excluded.list_hash,
+                content_hash = COALESCE(excluded.content_hash, articles.content_hash),
+                fetched_at = excluded.fetched_at
+        """, (
+            article['url'],
+            article.get('title', ''),
+            article.get('publish_time', ''),
+            article_list_hash(article),
+            content_hash,
+            now,
+            now,
+        ))
+
+    def commit(self):
+        """提交写入"""
+        self.conn.commit()
+
+    def count(self) -> int:
+        """已记录的文章数"""
+        return self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.commit()
+        self.conn.close()
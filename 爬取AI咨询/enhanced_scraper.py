@@ -17,8 +17,8 @@ from datetime import datetime
 class EnhancedAIScraper(AINewsScraper):
     """增强版AI文章爬虫"""
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, http_cache=None):
+        super().__init__(http_cache)
         self.logger.info("初始化增强版AI文章爬虫...")
 
     def scrape_with_full_content(self, max_pages=2, delay_between_articles=2):
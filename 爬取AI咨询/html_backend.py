@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML解析后端
+按可用性选择 selectolax / lxml / html.parser，
+并用一次树遍历同时找出所有正文候选选择器的第一个匹配元素，
+替代逐个 select_one 反复遍历整棵树的做法
+"""
+
+import os
+import re
+from typing import Callable, Iterable, List, Optional, Sequence
+
+from bs4 import BeautifulSoup, Tag
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    try:
+        # selectolax 1.0 之前的版本只有 Modest 后端
+        from selectolax.parser import HTMLParser as SelectolaxParser
+        HAS_SELECTOLAX = True
+    except ImportError:
+        SelectolaxParser = None
+        HAS_SELECTOLAX = False
+
+# 正文提取失败时的占位文本（与原实现保持一致）
+EMPTY_CONTENT = "无法获取文章详细内容"
+
+
+def available_backends() -> List[str]:
+    """返回当前环境可用的解析后端，按速度从快到慢排列"""
+    backends = []
+    if HAS_SELECTOLAX:
+        backends.append('selectolax')
+    if HAS_LXML:
+        backends.append('lxml')
+    backends.append('html.parser')
+    return backends
+
+
+def default_backend() -> str:
+    """默认解析后端，可通过环境变量 HTML_PARSER_BACKEND 指定"""
+    preferred = os.environ.get('HTML_PARSER_BACKEND')
+    backends = available_backends()
+    if preferred in backends:
+        return preferred
+    return backends[0]
+
+
+def make_soup(html_content: str, backend: Optional[str] = None) -> BeautifulSoup:
+    """
+    构建BeautifulSoup树
+
+    selectolax 不提供BeautifulSoup接口，需要BeautifulSoup树的场景下退回 lxml / html.parser
+    """
+    backend = backend or default_backend()
+    if backend in ('selectolax', 'lxml'):
+        features = 'lxml' if HAS_LXML else 'html.parser'
+    else:
+        features = 'html.parser'
+    return BeautifulSoup(html_content, features)
+
+
+class SimpleSelector:
+    """
+    简单CSS选择器
+
+    只支持本项目用到的写法：tag、.class、#id、[class*="x"]，以及用空格连接的后代组合（如 'main article'）
+    """
+
+    _PART_PATTERNS = (
+        ('class', re.compile(r'^\.([\w-]+)$')),
+        ('id', re.compile(r'^#([\w-]+)$')),
+        ('class_contains', re.compile(r'^\[class\*=["\']([^"\']+)["\']\]$')),
+        ('tag', re.compile(r'^([a-zA-Z][\w-]*)$')),
+    )
+
+    def __init__(self, selector: str):
+        self.selector = selector
+        self.parts = [self._parse_part(part) for part in selector.split()]
+
+    def _parse_part(self, part: str):
+        for kind, pattern in self._PART_PATTERNS:
+            match = pattern.match(part)
+            if match:
+                value = match.group(1)
+                return kind, value.lower() if kind == 'tag' else value
+        raise ValueError(f"不支持的选择器: {self.selector}")
+
+    @staticmethod
+    def part_matches(part, tag: str, class_attr: str, id_attr: str) -> bool:
+        kind, value = part
+        if kind == 'tag':
+            return tag == value
+        if kind == 'class':
+            return value in class_attr.split()
+        if kind == 'id':
+            return id_attr == value
+        return value in class_attr
+
+    def matches(self, features, ancestor_features) -> bool:
+        """features为(tag, class, id)三元组，ancestor_features为从根到父节点的特征列表"""
+        if not self.part_matches(self.parts[-1], *features):
+            return False
+        # 后代组合：从最近的祖先向上依次匹配前面的部分
+        remaining = len(self.parts) - 2
+        for ancestor in reversed(ancestor_features):
+            if remaining < 0:
+                break
+            if self.part_matches(self.parts[remaining], *ancestor):
+                remaining -= 1
+        return remaining < 0
+
+
+class _Adapter:
+    """屏蔽不同解析库节点接口差异"""
+
+    def __init__(self, children: Callable, features: Callable):
+        self.children = children
+        self.features = features
+
+
+def _bs4_children(node) -> Iterable:
+    return (child for child in node.children if isinstance(child, Tag))
+
+
+def _bs4_features(node):
+    class_attr = node.get('class') or ''
+    if isinstance(class_attr, list):
+        class_attr = ' '.join(class_attr)
+    return (node.name or '').lower(), class_attr, node.get('id') or ''
+
+
+def _selectolax_children(node) -> Iterable:
+    return node.iter(include_text=False)
+
+
+def _selectolax_features(node):
+    attributes = node.attributes
+    return (node.tag or '').lower(), attributes.get('class') or '', attributes.get('id') or ''
+
+
+BS4_ADAPTER = _Adapter(_bs4_children, _bs4_features)
+SELECTOLAX_ADAPTER = _Adapter(_selectolax_children, _selectolax_features)
+
+
+def find_first_matches(root, selectors: Sequence[str], adapter: _Adapter = BS4_ADAPTER) -> List:
+    """
+    一次前序遍历，返回每个选择器在文档顺序中的第一个匹配元素（未匹配为None）
+
+    结果与对每个选择器分别调用 select_one 相同，但整棵树只遍历一次
+    """
+    compiled = [SimpleSelector(s) if isinstance(s, str) else s for s in selectors]
+    results = [None] * len(compiled)
+    pending = set(range(len(compiled)))
+
+    ancestor_features = []
+    stack = [iter(adapter.children(root))]
+    while stack and pending:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            if ancestor_features:
+                ancestor_features.pop()
+            continue
+
+        features = adapter.features(node)
+        for index in list(pending):
+            if compiled[index].matches(features, ancestor_features):
+                results[index] = node
+                pending.discard(index)
+
+        ancestor_features.append(features)
+        stack.append(iter(adapter.children(node)))
+
+    return results
+
+
+def clean_lines(text: str) -> str:
+    """去除每行首尾空白并删除空行"""
+    return '\n'.join(line.strip() for line in text.split('\n') if line.strip())
+
+
+def _tag_names(tags: Sequence[str]) -> List[str]:
+    """只保留标签名；'.sidebar' 这类写法在 find_all 中按标签名匹配，本来就不会命中"""
+    return [t for t in tags if re.match(r'^[a-zA-Z][\w-]*$', t)]
+
+
+def _extract_with_bs4(html_content, content_selectors, unwanted_tags, fallback_unwanted_tags,
+                      min_length, fallback_min_length, backend):
+    soup = make_soup(html_content, backend)
+    candidates = find_first_matches(soup, content_selectors)
+
+    content = ''
+    for content_elem in candidates:
+        # 前面候选清理时可能已经删除了该元素
+        if content_elem is None or getattr(content_elem, 'decomposed', False):
+            continue
+        for unwanted in content_elem(unwanted_tags):
+            unwanted.decompose()
+        content = clean_lines(content_elem.get_text(separator='\n', strip=True))
+        if len(content) > min_length:
+            break
+
+    if not content or len(content) < fallback_min_length:
+        for unwanted in soup(fallback_unwanted_tags):
+            unwanted.decompose()
+        body_content = soup.find('body') or soup.find('main')
+        if body_content:
+            content = clean_lines(body_content.get_text(separator='\n', strip=True))
+
+    return content
+
+
+def _extract_with_selectolax(html_content, content_selectors, unwanted_tags, fallback_unwanted_tags,
+                             min_length, fallback_min_length):
+    tree = SelectolaxParser(html_content)
+    root = tree.root
+    candidates = find_first_matches(root, content_selectors, SELECTOLAX_ADAPTER) if root else []
+
+    unwanted_css = ','.join(_tag_names(unwanted_tags))
+    content = ''
+    removed = set()
+    for content_elem in candidates:
+        if content_elem is None or content_elem.mem_id in removed:
+            continue
+        if unwanted_css:
+            for unwanted in content_elem.css(unwanted_css):
+                removed.update(n.mem_id for n in unwanted.traverse())
+                unwanted.decompose()
+        content = clean_lines(content_elem.text(separator='\n', strip=True))
+        if len(content) > min_length:
+            break
+
+    if not content or len(content) < fallback_min_length:
+        fallback_css = ','.join(_tag_names(fallback_unwanted_tags))
+        if fallback_css:
+            for unwanted in tree.css(fallback_css):
+                unwanted.decompose()
+        body_content = tree.body or tree.css_first('main')
+        if body_content:
+            content = clean_lines(body_content.text(separator='\n', strip=True))
+
+    return content
+
+
+def extract_main_content(html_content: str,
+                         content_selectors: Sequence[str],
+                         unwanted_tags: Sequence[str],
+                         fallback_unwanted_tags: Sequence[str],
+                         max_length: int,
+                         min_length: int = 200,
+                         fallback_min_length: int = 100,
+                         backend: Optional[str] = None) -> str:
+    """
+    提取页面正文
+
+    按选择器优先级依次尝试候选容器，正文长度超过 min_length 即采用；
+    都不满足且正文不足 fallback_min_length 时退回 body/main 全文。
+    所有候选容器由一次树遍历同时找出。
+
+    Args:
+        html_content: 页面HTML
+        content_selectors: 按优先级排列的正文选择器
+        unwanted_tags: 从候选容器中移除的标签
+        fallback_unwanted_tags: 退回全文时从整页移除的标签
+        max_length: 正文最大长度，超出截断
+        min_length: 候选容器被采用所需的最小长度
+        fallback_min_length: 低于该长度时退回全文提取
+        backend: 解析后端，默认见 default_backend()
+    """
+    backend = backend or default_backend()
+    if backend == 'selectolax' and HAS_SELECTOLAX:
+        content = _extract_with_selectolax(html_content, content_selectors, unwanted_tags,
+                                           fallback_unwanted_tags, min_length, fallback_min_length)
+    else:
+        content = _extract_with_bs4(html_content, content_selectors, unwanted_tags,
+                                    fallback_unwanted_tags, min_length, fallback_min_length, backend)
+
+    # 限制内容长度，避免过长
+    if len(content) > max_length:
+        content = content[:max_length] + "...[内容已截断]"
+
+    return content if content else EMPTY_CONTENT
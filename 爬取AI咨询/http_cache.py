@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP条件请求缓存
+基于SQLite保存压缩后的响应体，使用 If-None-Match / If-Modified-Since 重新验证，
+支持TTL过期和按总大小的LRU淘汰。爬虫和总结工具共用同一个缓存文件，
+同一篇文章被再次读取时只需要一次304校验请求。
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+import requests
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    'AI_NEWS_HTTP_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'myworkspace', 'http_cache.db')
+)
+
+# 重新生成响应时保留的响应头
+_KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HTTPCache:
+    """基于ETag/Last-Modified的磁盘HTTP缓存"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttl: float = 7 * 24 * 3600,
+                 max_size_bytes: int = 200 * 1024 * 1024, compress_level: int = 6):
+        """
+        初始化HTTP缓存
+
+        Args:
+            db_path: SQLite缓存文件路径（默认可通过环境变量 AI_NEWS_HTTP_CACHE 指定）
+            ttl: 缓存条目自上次验证起的最长保留时间（秒），过期后重新完整下载
+            max_size_bytes: 压缩后响应体的总大小上限，超出时按最近访问时间淘汰
+            compress_level: zlib压缩级别
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_size_bytes = max_size_bytes
+        self.compress_level = compress_level
+        self.logger = logging.getLogger(__name__)
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                headers TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                validated_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        self.conn.commit()
+
+    def _lookup(self, url: str) -> Optional[sqlite3.Row]:
+        """查询未过期的缓存条目，过期条目直接删除"""
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and time.time() - row['validated_at'] > self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self.conn.commit()
+                return None
+            return row
+
+    @staticmethod
+    def _conditional_headers(row: sqlite3.Row) -> Dict[str, str]:
+        """根据缓存条目构造条件请求头"""
+        headers = {}
+        if row['etag']:
+            headers['If-None-Match'] = row['etag']
+        if row['last_modified']:
+            headers['If-Modified-Since'] = row['last_modified']
+        return headers
+
+    def _store(self, url: str, response: requests.Response):
+        """保存响应；没有校验字段的响应无法重新验证，不缓存"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        body = zlib.compress(response.content, self.compress_level)
+        headers = '\n'.join(f"{k}: {response.headers[k]}" for k in _KEPT_HEADERS if k in response.headers)
+        now = time.time()
+        with self._lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO responses
+                    (url, body, headers, etag, last_modified, size, validated_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (url, body, headers, etag, last_modified, len(body), now, now))
+            self.conn.commit()
+        self.stats['stores'] += 1
+        self.evict()
+
+    def _touch(self, url: str):
+        """304命中后刷新验证时间和访问时间"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "UPDATE responses SET validated_at = ?, last_access = ? WHERE url = ?", (now, now, url)
+            )
+            self.conn.commit()
+
+    @staticmethod
+    def _build_response(url: str, row: sqlite3.Row) -> requests.Response:
+        """用缓存内容构造一个 requests.Response，调用方无需区分是否来自缓存"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = zlib.decompress(row['body'])
+        for line in row['headers'].split('\n'):
+            if ': ' in line:
+                key, value = line.split(': ', 1)
+                response.headers[key] = value
+        response.from_cache = True
+        return response
+
+    def fetch(self, session: requests.Session, url: str, timeout: float = 15, **kwargs) -> requests.Response:
+        """
+        通过缓存发起GET请求
+
+        有缓存时带条件请求头访问，服务器返回304则直接使用缓存内容；
+        其它状态码原样返回，由调用方决定如何处理。
+        """
+        row = self._lookup(url)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if row is not None:
+            headers.update(self._conditional_headers(row))
+
+        response = session.get(url, timeout=timeout, headers=headers, **kwargs)
+
+        if response.status_code == 304 and row is not None:
+            self.stats['hits'] += 1
+            self._touch(url)
+            self.logger.debug(f"HTTP缓存命中(304): {url}")
+            return self._build_response(url, row)
+
+        self.stats['misses'] += 1
+        if response.status_code == 200:
+            self._store(url, response)
+        return response
+
+    def total_size(self) -> int:
+        """缓存中压缩响应体的总字节数"""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def evict(self):
+        """按最近访问时间淘汰条目，直到总大小不超过上限"""
+        if not self.max_size_bytes:
+            return
+        with self._lock:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_size_bytes:
+                return
+            victims = []
+            for row in self.conn.execute("SELECT url, size FROM responses ORDER BY last_access ASC"):
+                if total <= self.max_size_bytes:
+                    break
+                victims.append((row['url'],))
+                total -= row['size']
+            self.conn.executemany("DELETE FROM responses WHERE url = ?", victims)
+            self.conn.commit()
+        self.stats['evictions'] += len(victims)
+        self.logger.info(f"HTTP缓存淘汰 {len(victims)} 个条目")
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self.conn.close()
@@ -17,8 +17,8 @@ from datetime import datetime
 class InteractiveScraper(AINewsScraper):
     """交互式AI文章爬虫"""
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, http_cache=None):
+        super().__init__(http_cache)
         self.logger.info("初始化交互式AI文章爬虫...")
 
     def preview_articles(self, max_pages=5):
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+令牌桶限速器
+同时支持线程（同步）和asyncio（异步）两种等待方式，用于替代固定的time.sleep延迟
+"""
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数（即平均请求速率）
+            capacity: 桶容量（允许的最大突发请求数）
+        """
+        if rate <= 0:
+            raise ValueError("rate 必须大于0")
+        self.rate = float(rate)
+        self.capacity = max(float(capacity), 1.0)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, capacity: float = 1.0) -> "TokenBucket":
+        """按每分钟请求数创建令牌桶"""
+        return cls(requests_per_minute / 60.0, capacity)
+
+    def _reserve(self, tokens: float = 1.0) -> float:
+        """预占令牌，返回需要等待的秒数（令牌可以预支为负数，保证先到先得）"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_refill
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        """同步获取令牌（阻塞当前线程直到可用）"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """异步获取令牌（不阻塞事件循环）"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)